@@ -1,13 +1,29 @@
-import os
-import asyncio
 import json
+import threading
 import time
+from concurrent.futures import Future
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import groq
-import streamlit as st
-from dotenv import load_dotenv
+from config import settings
 from prompt_manager import prompt_manager
+from background_loop import research_loop
+from text_similarity import NoveltyTracker, cluster_near_duplicates
+from passage_ranking import format_passages, rank_passages
+from source_store import source_store
+from report_archive import report_archive
+from metrics import STAGE_DURATION, SUB_QUESTIONS, record_research, search_with_metrics
+from tracing import span
+from profiling import profile_run, profiled_to_thread
+from cassettes import wrap_llm_client, wrap_search_client
+from llm_router import LLMRouter, summarize_calls, track_calls
+from data_driven import generate_data_driven_report
+from research_cache import STALE, cache_ttl_hours, research_cache, source_fingerprint
+from prompt_layout import build_messages
+from structured_output import (
+    EXECUTION_SCHEMA, PLANNER_SCHEMA, json_instructions, parse_question_list,
+    parse_structured, render_execution_markdown, repair_messages, salvage_questions
+)
 
 # Optional DeepSeek import
 try:
@@ -25,8 +41,6 @@ except ImportError:
     TAVILY_AVAILABLE = False
     TavilyClient = None
 
-# Load environment variables
-load_dotenv()
 
 class AdvancedPMMResearcher:
     def __init__(self):
@@ -37,14 +51,14 @@ class AdvancedPMMResearcher:
         if DEEPSEEK_AVAILABLE:
             deepseek_api_key = self._get_api_key("DEEPSEEK_API_KEY")
             if deepseek_api_key:
-                self.deepseek_client = OpenAI(api_key=deepseek_api_key, base_url="https://api.deepseek.com")
+                self.deepseek_client = OpenAI(api_key=deepseek_api_key, base_url=settings.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com"))
                 self.deepseek_enabled = True
                 print("✅ DeepSeek initialized as primary backend for advanced research")
         
         # Initialize Groq as secondary
         groq_api_key = self._get_api_key("GROQ_API_KEY")
         if groq_api_key:
-            self.groq_client = groq.Groq(api_key=groq_api_key)
+            self.groq_client = groq.Groq(api_key=groq_api_key, base_url=settings.get("GROQ_BASE_URL"))
             print("✅ Groq initialized as secondary backend for advanced research")
         else:
             self.groq_client = None
@@ -53,119 +67,107 @@ class AdvancedPMMResearcher:
         # Initialize Tavily client
         tavily_api_key = self._get_api_key("TAVILY_API_KEY")
         if tavily_api_key and TAVILY_AVAILABLE:
-            self.tavily_client = TavilyClient(api_key=tavily_api_key)
+            # TAVILY_BASE_URL points search at a compatible server (e.g. the offline benchmark)
+            tavily_base_url = settings.get("TAVILY_BASE_URL")
+            self.tavily_client = TavilyClient(api_key=tavily_api_key, **({"api_base_url": tavily_base_url} if tavily_base_url else {}))
             self.tavily_enabled = True
         else:
             self.tavily_client = None
             self.tavily_enabled = False
+        
+        # Record or replay API traffic (PMM_CASSETTE_MODE)
+        self.deepseek_client = wrap_llm_client(self.deepseek_client, "deepseek")
+        self.groq_client = wrap_llm_client(self.groq_client, "groq")
+        self.tavily_client = wrap_search_client(self.tavily_client)
+        self.deepseek_enabled = self.deepseek_client is not None
+        self.tavily_enabled = self.tavily_client is not None
+        
+        # Per-stage model tiers with fallback chains
+        self.router = LLMRouter(self.deepseek_client, self.groq_client)
+        
+        # JSON outputs for planner and execution (PMM_STRUCTURED_OUTPUT=0 for free text)
+        self.structured_output = settings.get("PMM_STRUCTURED_OUTPUT", "1") != "0"
+        
+        # Long-lived event loop shared by every request in this process
+        self.loop = research_loop
+        
+        # Local full-text store of previously fetched sources
+        self.source_store = source_store if settings.get("PMM_SOURCE_STORE", "1") != "0" else None
     
     def _get_api_key(self, key_name: str) -> Optional[str]:
-        """Get API key from Streamlit secrets or environment"""
-        try:
-            return st.secrets.get(key_name)
-        except:
-            pass
-        return os.getenv(key_name)
+        """Get API key from Streamlit secrets, environment or .env"""
+        return settings.get(key_name)
+    
+    def _fallback_questions(self, query: str) -> List[str]:
+        """Generic research questions used when planning fails"""
+        return [f"Research the competitive landscape for {query}", 
+               f"Analyze market trends in {query}",
+               f"Identify key players in {query}",
+               f"Examine pricing strategies for {query}",
+               f"Investigate customer segments for {query}"]
     
     async def research_planner(self, query: str, prompt_name: str = "testprompt3") -> List[str]:
         """Stage 1: Generate detailed research questions"""
         # Get system and user prompts from specified prompt
         system_prompt = prompt_manager.get_system_prompt(prompt_name, "planner")
         user_prompt = prompt_manager.get_user_prompt(prompt_name, "planner")
-        user_prompt = user_prompt.replace("<user query>", query)
-
-        # Try DeepSeek first (primary)
-        if self.deepseek_enabled:
+        messages = build_messages(system_prompt, user_prompt, [("<user query>", "Research query", query)])
+        try:
+            if self.structured_output:
+                data, completion = await self._complete_structured("planner", messages, PLANNER_SCHEMA)
+                questions = data["questions"] if data else salvage_questions(completion["content"])
+            else:
+                completion = await profiled_to_thread(self.router.complete, "planner", messages)
+                questions = parse_question_list(completion["content"])
+        except Exception as e:
+            print(f"⚠️ Research planning failed: {str(e)}")
+            return self._fallback_questions(query)
+        
+        questions = [q.strip() for q in questions if q.strip()]
+        if not questions:
+            print("⚠️ Planner returned no usable questions, using defaults")
+            return self._fallback_questions(query)
+        
+        return questions[:10]  # Limit to 10 questions
+    
+    async def _complete_structured(self, stage: str, messages: List[Dict], schema: Dict) -> Tuple[Optional[Dict], Dict]:
+        """Completion in JSON mode with local validation and at most one cheap repair pass"""
+        messages = [dict(messages[0], content=messages[0]["content"] + json_instructions(stage))] + messages[1:]
+        completion = await profiled_to_thread(self.router.complete, stage, messages, json_mode=True)
+        data, errors = parse_structured(completion["content"], schema)
+        if data is None:
+            print(f"🩹 Repairing invalid {stage} output ({errors[0]})")
             try:
-                print("🔍 Using DeepSeek (primary) for research planning...")
-                completion = self.deepseek_client.chat.completions.create(
-                    model="deepseek-reasoner",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.7,
-                    # Let LLM decide appropriate length
-                    stream=False
+                repaired = await profiled_to_thread(
+                    self.router.complete, "repair",
+                    repair_messages(completion["content"], stage, errors),
+                    json_mode=True
                 )
-                
-                questions = completion.choices[0].message.content.strip().split('\n')
-                # Clean up questions (remove numbering, empty lines, etc.)
-                questions = [q.strip() for q in questions if q.strip() and not q.strip().startswith(('1.', '2.', '3.', '4.', '5.', '6.', '7.', '8.', '9.', '10.'))]
-                
-                return questions[:10]  # Limit to 10 questions
-                
-            except Exception as e:
-                print(f"⚠️ DeepSeek failed in planner: {str(e)}")
-                if self.groq_client:
-                    print("🔄 Falling back to Groq for planning...")
-                else:
-                    return [f"Research the competitive landscape for {query}", 
-                           f"Analyze market trends in {query}",
-                           f"Identify key players in {query}",
-                           f"Examine pricing strategies for {query}",
-                           f"Investigate customer segments for {query}"]
-
-        # Fallback to Groq (secondary)
-        if self.groq_client:
-            try:
-                print("🔍 Using Groq (secondary) for research planning...")
-                # Add retry logic for rate limiting
-                max_retries = 3
-                retry_delay = 5  # Start with 5 seconds
-                
-                for attempt in range(max_retries):
-                    try:
-                        completion = self.groq_client.chat.completions.create(
-                            model="compound-beta",
-                            messages=[
-                                {"role": "system", "content": system_prompt},
-                                {"role": "user", "content": user_prompt}
-                            ],
-                            temperature=0.7,
-                            top_p=1,
-                            stream=False,
-                            stop=None
-                        )
-                        break  # Success, exit retry loop
-                        
-                    except Exception as e:
-                        if "rate_limit" in str(e).lower() and attempt < max_retries - 1:
-                            print(f"Rate limit hit, waiting {retry_delay} seconds...")
-                            time.sleep(retry_delay)
-                            retry_delay *= 2  # Exponential backoff
-                            continue
-                        else:
-                            raise e
-                
-                questions = completion.choices[0].message.content.strip().split('\n')
-                # Clean up questions (remove numbering, empty lines, etc.)
-                questions = [q.strip() for q in questions if q.strip() and not q.strip().startswith(('1.', '2.', '3.', '4.', '5.', '6.', '7.', '8.', '9.', '10.'))]
-                
-                return questions[:10]  # Limit to 10 questions
-                
+                data, errors = parse_structured(repaired["content"], schema)
             except Exception as e:
-                print(f"⚠️ Groq failed in planner: {str(e)}")
-                return [f"Research the competitive landscape for {query}", 
-                       f"Analyze market trends in {query}",
-                       f"Identify key players in {query}",
-                       f"Examine pricing strategies for {query}",
-                       f"Investigate customer segments for {query}"]
-        
-        return [f"Research the competitive landscape for {query}", 
-               f"Analyze market trends in {query}",
-               f"Identify key players in {query}",
-               f"Examine pricing strategies for {query}",
-               f"Investigate customer segments for {query}"]
+                print(f"⚠️ Repair pass failed: {str(e)}")
+        return data, completion
     
-    async def execution_agent(self, sub_question: str, prompt_name: str = "testprompt3") -> Dict:
-        """Stage 2: Research individual sub-question with sources"""
-        
-        # Get web sources if Tavily is available
+    async def gather_sources(self, sub_question: str) -> List[Dict]:
+        """Sources for a sub-question: the local source store first, then Tavily"""
+        # Consult the local source store first, then Tavily if coverage is insufficient or stale
+        if self.source_store:
+            local_sources = await profiled_to_thread(
+                self.source_store.lookup, sub_question,
+                max_age_hours=float(settings.get("PMM_SOURCE_MAX_AGE_HOURS", "168"))
+            )
+            if local_sources:
+                print(f"📚 Using {len(local_sources)} locally stored sources for: {sub_question[:50]}...")
+                return local_sources
+        return await self.search_sources(sub_question)
+    
+    async def search_sources(self, sub_question: str) -> List[Dict]:
+        """Fresh Tavily results for a sub-question (added to the local source store)"""
         sources = []
         if self.tavily_enabled:
             try:
-                search_result = self.tavily_client.search(
+                search_result = await profiled_to_thread(
+                    search_with_metrics, self.tavily_client.search,
                     query=sub_question,
                     search_depth="advanced",
                     max_results=5,
@@ -176,384 +178,420 @@ class AdvancedPMMResearcher:
                     ]
                 )
                 sources = search_result.get("results", [])
+                if self.source_store:
+                    await profiled_to_thread(self.source_store.ingest, sources)
             except Exception as e:
                 print(f"Tavily search failed: {e}")
+        return sources
+    
+    async def execution_agent(self, sub_question: str, prompt_name: str = "testprompt3",
+                              sources: Optional[List[Dict]] = None) -> Dict:
+        """Stage 2: Research individual sub-question with sources (gathered unless given)"""
+        if sources is None:
+            sources = await self.gather_sources(sub_question)
         
-        # Create source summaries
-        source_summaries = []
-        for source in sources[:5]:
-            summary = f"Source: {source.get('title', 'Unknown')}\n"
-            summary += f"URL: {source.get('url', 'N/A')}\n"
-            summary += f"Content: {source.get('content', '')[:200]}...\n"
-            source_summaries.append(summary)
+        # Rank passages from all sources against the sub-question and keep the best
+        passages = rank_passages(sub_question, sources[:5], top_k=int(settings.get("PMM_TOP_PASSAGES", "6")))
+        source_summaries = format_passages(passages)
         
         # Get system and user prompts from specified prompt
         system_prompt = prompt_manager.get_system_prompt(prompt_name, "execution")
         user_prompt = prompt_manager.get_user_prompt(prompt_name, "execution")
-        user_prompt = user_prompt.replace("<sub-question>", sub_question)
-        user_prompt = user_prompt.replace("<source_summaries>", 
-            f"Sources found:\n{chr(10).join(source_summaries)}" if source_summaries else "No web sources available. Use your knowledge to provide insights.")
-
-        # Try DeepSeek first (primary)
-        if self.deepseek_enabled:
-            try:
-                print(f"🔍 Using DeepSeek (primary) for execution: {sub_question[:50]}...")
-                completion = self.deepseek_client.chat.completions.create(
-                    model="deepseek-reasoner",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.7,
-                    # Let LLM decide appropriate length
-                    stream=False
-                )
-                
-                return {
-                    "question": sub_question,
-                    "summary": completion.choices[0].message.content,
-                    "sources": sources,
-                    "source_count": len(sources)
-                }
-                
-            except Exception as e:
-                print(f"⚠️ DeepSeek failed in execution: {str(e)}")
-                if self.groq_client:
-                    print("🔄 Falling back to Groq for execution...")
-                else:
-                    return {
-                        "question": sub_question,
-                        "summary": f"Research failed: {str(e)}",
-                        "sources": [],
-                        "source_count": 0
-                    }
-
-        # Fallback to Groq (secondary)
-        if self.groq_client:
-            try:
-                print(f"🔍 Using Groq (secondary) for execution: {sub_question[:50]}...")
-                # Add retry logic for rate limiting
-                max_retries = 3
-                retry_delay = 5  # Start with 5 seconds
-                
-                for attempt in range(max_retries):
-                    try:
-                        completion = self.groq_client.chat.completions.create(
-                            model="compound-beta",
-                            messages=[
-                                {"role": "system", "content": system_prompt},
-                                {"role": "user", "content": user_prompt}
-                            ],
-                            temperature=0.7,
-                            top_p=1,
-                            stream=False,
-                            stop=None
-                        )
-                        break  # Success, exit retry loop
-                        
-                    except Exception as e:
-                        if "rate_limit" in str(e).lower() and attempt < max_retries - 1:
-                            print(f"Rate limit hit, waiting {retry_delay} seconds...")
-                            time.sleep(retry_delay)
-                            retry_delay *= 2  # Exponential backoff
-                            continue
-                        else:
-                            raise e
-                
-                return {
-                    "question": sub_question,
-                    "summary": completion.choices[0].message.content,
-                    "sources": sources,
-                    "source_count": len(sources)
-                }
-                
-            except Exception as e:
-                print(f"⚠️ Groq failed in execution: {str(e)}")
-                return {
-                    "question": sub_question,
-                    "summary": f"Research failed: {str(e)}",
-                    "sources": [],
-                    "source_count": 0
-                }
+        sources_text = f"Sources found:\n{chr(10).join(source_summaries)}" if source_summaries else "No web sources available. Use your knowledge to provide insights."
+        messages = build_messages(system_prompt, user_prompt, [
+            ("<sub-question>", "Sub-question", sub_question),
+            ("<source_summaries>", "Source summaries", sources_text)
+        ])
+        structured = None
+        try:
+            if self.structured_output:
+                structured, completion = await self._complete_structured("execution", messages, EXECUTION_SCHEMA)
+            else:
+                completion = await profiled_to_thread(self.router.complete, "execution", messages)
+        except Exception as e:
+            print(f"⚠️ Execution failed for: {sub_question[:50]}...")
+            return {
+                "question": sub_question,
+                "summary": f"Research failed: {str(e)}",
+                "sources": [],
+                "source_count": 0
+            }
         
-        return {
+        result = {
             "question": sub_question,
-            "summary": f"Research failed: No available backends",
-            "sources": [],
-            "source_count": 0
+            "summary": render_execution_markdown(structured) if structured else completion["content"],
+            "sources": sources,
+            "source_count": len(sources),
+            "model": completion["label"]
         }
+        if structured:
+            result["structured"] = structured
+        return result
     
     async def research_publisher(self, query: str, research_results: List[Dict], prompt_name: str = "testprompt3") -> Dict:
         """Stage 3: Synthesize research into cohesive report"""
         
         # Prepare research data for synthesis
         research_text = f"Original Query: {query}\n\n"
-        research_text += "Research Results:\n\n"
         
-        for i, result in enumerate(research_results, 1):
-            research_text += f"Question {i}: {result['question']}\n"
-            research_text += f"Summary: {result['summary']}\n"
-            if result.get('sources'):
-                research_text += f"Sources: {result['source_count']} found\n"
+        if any(r.get("structured") for r in research_results):
+            # Compact structured data instead of verbose markdown summaries
+            research_data = []
+            for result in research_results:
+                structured = result.get("structured") or {"summary": result["summary"]}
+                entry = {
+                    "question": result["question"],
+                    "summary_text": structured.get("summary", ""),
+                    "data_points": structured.get("data_points", []),
+                    "contradictions": structured.get("contradictions", []),
+                    "citations": [f"{c.get('title', '')} {c.get('url', '')}".strip() for c in structured.get("citations", [])]
+                }
+                also_covers = [q for q in result.get('covers_questions', []) if q != result['question']]
+                if also_covers:
+                    entry["also_answers"] = also_covers
+                research_data.append({k: v for k, v in entry.items() if v})
+            research_text += "Research Results (JSON):\n"
+            research_text += json.dumps(research_data, ensure_ascii=False, separators=(",", ":"))
             research_text += "\n"
+        else:
+            research_text += "Research Results:\n\n"
+            for i, result in enumerate(research_results, 1):
+                research_text += f"Question {i}: {result['question']}\n"
+                also_covers = [q for q in result.get('covers_questions', []) if q != result['question']]
+                if also_covers:
+                    research_text += f"Also answers: {'; '.join(also_covers)}\n"
+                research_text += f"Summary: {result['summary']}\n"
+                if result.get('sources'):
+                    research_text += f"Sources: {result['source_count']} found\n"
+                research_text += "\n"
         
         # Get system and user prompts from specified prompt
         system_prompt = prompt_manager.get_system_prompt(prompt_name, "publisher")
         user_prompt = prompt_manager.get_user_prompt(prompt_name, "publisher")
-        user_prompt = user_prompt.replace("<research_data>", research_text)
-
-        # Try DeepSeek first (primary)
-        if self.deepseek_enabled:
-            try:
-                print("🔍 Using DeepSeek (primary) for research synthesis...")
-                completion = self.deepseek_client.chat.completions.create(
-                    model="deepseek-reasoner",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=4000,
-                    stream=False
-                )
-                
-                return {
-                    "query": query,
-                    "content": completion.choices[0].message.content,
-                    "timestamp": datetime.now().isoformat(),
-                    "model": "deepseek-reasoner-advanced",
-                    "sub_questions_researched": len(research_results),
-                    "total_sources": sum(r.get('source_count', 0) for r in research_results),
-                    "tavily_enabled": self.tavily_enabled
-                }
-                
-            except Exception as e:
-                print(f"⚠️ DeepSeek failed in synthesis: {str(e)}")
-                if self.groq_client:
-                    print("🔄 Falling back to Groq for synthesis...")
-                else:
-                    return {
-                        "error": f"Research synthesis failed: {str(e)}",
-                        "query": query,
-                        "timestamp": datetime.now().isoformat()
-                    }
+        messages = build_messages(system_prompt, user_prompt, [
+            ("<user query>", "Research query", query),
+            ("<research_data>", "Research data", research_text)
+        ])
 
-        # Fallback to Groq (secondary)
-        if self.groq_client:
-            try:
-                print("🔍 Using Groq (secondary) for research synthesis...")
-                # Add retry logic for rate limiting
-                max_retries = 3
-                retry_delay = 5  # Start with 5 seconds
-                
-                for attempt in range(max_retries):
-                    try:
-                        completion = self.groq_client.chat.completions.create(
-                            model="compound-beta",
-                            messages=[
-                                {"role": "system", "content": system_prompt},
-                                {"role": "user", "content": user_prompt}
-                            ],
-                            temperature=0.7,
-                            top_p=1,
-                            stream=False,
-                            stop=None
-                        )
-                        break  # Success, exit retry loop
-                        
-                    except Exception as e:
-                        if "rate_limit" in str(e).lower() and attempt < max_retries - 1:
-                            print(f"Rate limit hit, waiting {retry_delay} seconds...")
-                            time.sleep(retry_delay)
-                            retry_delay *= 2  # Exponential backoff
-                            continue
-                        else:
-                            raise e
-                
-                return {
-                    "query": query,
-                    "content": completion.choices[0].message.content,
-                    "timestamp": datetime.now().isoformat(),
-                    "model": "groq-compound-beta-advanced",
-                    "sub_questions_researched": len(research_results),
-                    "total_sources": sum(r.get('source_count', 0) for r in research_results),
-                    "tavily_enabled": self.tavily_enabled
-                }
-                
-            except Exception as e:
-                print(f"⚠️ Groq failed in synthesis: {str(e)}")
-                return {
-                    "error": f"Research synthesis failed: {str(e)}",
-                    "query": query,
-                    "timestamp": datetime.now().isoformat()
-                }
+        try:
+            completion = await profiled_to_thread(self.router.complete, "publisher", messages)
+        except Exception as e:
+            return {
+                "error": f"Research synthesis failed: {str(e)}",
+                "query": query,
+                "timestamp": datetime.now().isoformat()
+            }
         
         return {
-            "error": "Research synthesis failed: No available backends",
             "query": query,
-            "timestamp": datetime.now().isoformat()
+            "content": completion["content"],
+            "timestamp": datetime.now().isoformat(),
+            "model": f"{completion['label']}-advanced",
+            "sub_questions_researched": len(research_results),
+            "total_sources": sum(r.get('source_count', 0) for r in research_results),
+            "tavily_enabled": self.tavily_enabled
         }
     
-    async def conduct_advanced_research(self, query: str, prompt_name: str = "testprompt3") -> Dict:
-        """Conduct advanced research using the 3-stage pipeline"""
+    async def conduct_advanced_research(self, query: str, prompt_name: str = "testprompt3", novelty_threshold: Optional[float] = None, dedup_threshold: Optional[float] = None, compress_target_chars: Optional[int] = None, profile: Optional[bool] = None,
+                                        use_cache: bool = True, cache_ttl_hours: Optional[float] = None, refresh: bool = False) -> Dict:
+        """Conduct advanced research using the 3-stage pipeline
+        
+        Near-duplicate planned questions are collapsed before execution (threshold
+        from the argument or PMM_DEDUP_THRESHOLD, 0 disables); each executed answer
+        keeps the list of original questions it covers.
         
-        # Special handling for testprompt4 (data-driven approach)
-        if prompt_name == "testprompt4":
-            return await self._conduct_data_driven_research(query)
+        When a novelty threshold is set (argument or PMM_NOVELTY_THRESHOLD), execution
+        stops once completed sub-questions keep contributing less new content than
+        the threshold, and the skipped questions are reported in the metadata.
+        
+        With a compression target (argument or PMM_SUMMARY_TARGET_CHARS), execution
+        summaries are extractively trimmed before synthesis to keep the publisher
+        prompt small; the compression ratio is recorded in the metadata.
+        
+        Every LLM call is recorded in `llm_calls` with its token usage and the
+        provider-reported prompt cache hits, totalled in `llm_usage`. The run is
+        traced stage by stage; the trace id is returned as `run_id`. With `profile`
+        (or PMM_PROFILE=1) a CPU profile and memory snapshot are saved under that id.
+        
+        Reports are cached for `cache_ttl_hours` (default PMM_CACHE_TTL_HOURS) and
+        served with `stale=True` during the grace window while a background run with
+        `refresh=True` regenerates them. Planner and execution results are cached per
+        query and sub-question with their own TTLs (PMM_STAGE_TTL_HOURS_PLANNER,
+        PMM_STAGE_TTL_HOURS_EXECUTION), so a refresh only re-runs stages whose results
+        are stale, plus the publisher. Stale stage results whose search returns the
+        same sources (by fingerprint) are kept with a renewed TTL instead of re-running
+        the LLM, and the publisher is skipped when no executed sub-question's sources
+        changed. `use_cache=False` bypasses every cache; PMM_STAGE_CACHE=0 keeps only
+        the report cache.
+        """
+        start_time = time.time()
+        mode = "data_driven" if prompt_name == "testprompt4" else "advanced"
+        with span("research.advanced", mode=mode, prompt=prompt_name, query=query) as run_span, \
+                profile_run(run_span.trace_id, profile) as run_profile:
+            # Background refresh of this report with the same options
+            def revalidate():
+                return self.conduct_advanced_research(query, prompt_name, novelty_threshold, dedup_threshold,
+                                                      compress_target_chars, cache_ttl_hours=cache_ttl_hours, refresh=True)
+            
+            with track_calls() as calls:
+                # Special handling for testprompt4 (data-driven approach)
+                if prompt_name == "testprompt4":
+                    report = await self._conduct_data_driven_research(query, use_cache, cache_ttl_hours, refresh, revalidate)
+                else:
+                    namespace = (f"advanced:{prompt_name}:{prompt_manager.prompt_version(prompt_name)}:"
+                                 f"{novelty_threshold}:{dedup_threshold}:{compress_target_chars}")
+                    report, state = (None, None)
+                    if use_cache and not refresh:
+                        report, state = await profiled_to_thread(research_cache.lookup, query, namespace, cache_ttl_hours)
+                    if report:
+                        report["cached"] = True
+                        if state == STALE:
+                            report["stale"] = True
+                            research_cache.revalidate(query, namespace, revalidate)
+                    else:
+                        report = await self._conduct_three_stage_research(
+                            query, prompt_name, novelty_threshold, dedup_threshold, compress_target_chars,
+                            use_cache, cache_ttl_hours, namespace if use_cache else None
+                        )
+                        fingerprint = report.pop("source_fingerprint", None)
+                        if not report.get("cached"):
+                            report["cached"] = False
+                            if use_cache and "error" not in report:
+                                await profiled_to_thread(research_cache.set, query, report, namespace, fingerprint)
+            
+            record_research(mode, prompt_name, report, time.time() - start_time)
+            report["run_id"] = run_span.trace_id
+            report["profiled"] = run_profile is not None
+            run_span.set_attribute("cached", bool(report.get("cached")))
+            if "error" in report:
+                run_span.set_attribute("error", report["error"])
+            if calls and "error" not in report:
+                report["llm_calls"] = calls
+                report["llm_usage"] = summarize_calls(calls)
+            if not report.get("cached") and "error" not in report:
+                await self._archive_report(report, prompt_name)
+        return report
+    
+    def _stage_ttl_hours(self, stage: str, default: float) -> float:
+        """Cache TTL of a pipeline stage's results (PMM_STAGE_TTL_HOURS_<STAGE>)"""
+        return float(settings.get(f"PMM_STAGE_TTL_HOURS_{stage.upper()}", str(default)))
+    
+    async def _cached_planner(self, query: str, prompt_name: str, use_cache: bool) -> Tuple[List[str], bool]:
+        """Planned sub-questions, reused while fresh (planning rarely changes between refreshes)"""
+        namespace = f"stage:planner:{prompt_name}:{prompt_manager.prompt_version(prompt_name)}"
+        if use_cache:
+            cached = await profiled_to_thread(research_cache.get, query, namespace, self._stage_ttl_hours("planner", 168))
+            if cached:
+                return cached["questions"], True
+        questions = await self.research_planner(query, prompt_name)
+        if use_cache and questions != self._fallback_questions(query):
+            await profiled_to_thread(research_cache.set, query, {"questions": questions}, namespace)
+        return questions, False
+    
+    async def _cached_execution(self, sub_question: str, prompt_name: str, use_cache: bool,
+                                max_age_hours: Optional[float]) -> Dict:
+        """Execution result for a sub-question, reused across reports while fresh
+        or while its sources are unchanged"""
+        namespace = (f"stage:execution:{prompt_name}:{prompt_manager.prompt_version(prompt_name)}:"
+                     f"{'json' if self.structured_output else 'text'}")
+        if use_cache:
+            ttl = self._stage_ttl_hours("execution", max_age_hours or cache_ttl_hours())
+            cached = await profiled_to_thread(research_cache.get, sub_question, namespace, ttl)
+            if cached:
+                cached["cached"] = True
+                return cached
+        # Revalidating an expired answer needs fresh results: the source store
+        # still holds what that answer was generated from
+        sources = []
+        expired = use_cache and await profiled_to_thread(research_cache.stored_fingerprint, sub_question, namespace)
+        if expired:
+            sources = await self.search_sources(sub_question)
+            unchanged = await profiled_to_thread(research_cache.extend_if_unchanged, sub_question, namespace,
+                                                 source_fingerprint(sources[:5]))
+            if unchanged:
+                unchanged["cached"] = True
+                return unchanged
+        if not sources:
+            sources = await self.gather_sources(sub_question)
+        fingerprint = source_fingerprint(sources[:5])
+        result = await self.execution_agent(sub_question, prompt_name, sources)
+        if use_cache and not result["summary"].startswith("Research failed"):
+            await profiled_to_thread(research_cache.set, sub_question, result, namespace, fingerprint)
+        return result
+    
+    async def _conduct_three_stage_research(self, query: str, prompt_name: str, novelty_threshold: Optional[float],
+                                            dedup_threshold: Optional[float], compress_target_chars: Optional[int],
+                                            use_cache: bool = True, cache_ttl_hours: Optional[float] = None,
+                                            report_namespace: Optional[str] = None) -> Dict:
+        """Planning, execution and publishing stages of the advanced pipeline.
+
+        With a `report_namespace`, publishing is skipped when the executed
+        sub-questions used the same sources as the cached report, whose TTL is
+        extended instead. The report's `source_fingerprint` is returned for caching.
+        """
+        if novelty_threshold is None and settings.get("PMM_NOVELTY_THRESHOLD"):
+            novelty_threshold = float(settings.get("PMM_NOVELTY_THRESHOLD"))
+        if dedup_threshold is None:
+            dedup_threshold = float(settings.get("PMM_DEDUP_THRESHOLD", "0.6"))
+        if compress_target_chars is None and settings.get("PMM_SUMMARY_TARGET_CHARS"):
+            compress_target_chars = int(settings.get("PMM_SUMMARY_TARGET_CHARS"))
+        # Planner and execution results are shared between reports unless PMM_STAGE_CACHE=0
+        stage_cache = use_cache and settings.get("PMM_STAGE_CACHE", "1") != "0"
         
         print(f"🚀 Starting advanced research with {prompt_name}")
         start_time = time.time()
         
         # Stage 1: Research Planning
         print("📋 Stage 1: Research Planning...")
-        sub_questions = await self.research_planner(query, prompt_name)
+        with STAGE_DURATION.time(stage="planner"), span("stage.planner") as planner_span:
+            sub_questions, planner_cached = await self._cached_planner(query, prompt_name, stage_cache)
+            planner_span.set_attributes({"questions": len(sub_questions), "cached": planner_cached})
         print(f"✅ Generated {len(sub_questions)} research questions")
         
+        # Collapse paraphrased questions so each cluster is researched once
+        planned_questions = sub_questions
+        if dedup_threshold:
+            clusters = cluster_near_duplicates(planned_questions, dedup_threshold)
+        else:
+            clusters = [[i] for i in range(len(planned_questions))]
+        sub_questions = [planned_questions[cluster[0]] for cluster in clusters]
+        if len(sub_questions) < len(planned_questions):
+            print(f"🧹 Collapsed {len(planned_questions)} planned questions into {len(sub_questions)} distinct ones")
+        
         # Stage 2: Execution
         print("🔍 Stage 2: Research Execution...")
         research_results = []
-        for i, question in enumerate(sub_questions, 1):
+        tracker = NoveltyTracker(novelty_threshold) if novelty_threshold else None
+        skipped_questions = []
+        for i, (question, cluster) in enumerate(zip(sub_questions, clusters), 1):
             print(f"  📝 Researching question {i}/{len(sub_questions)}: {question[:50]}...")
-            result = await self.execution_agent(question, prompt_name)
+            with STAGE_DURATION.time(stage="execution"), span("stage.execution", index=i, question=question) as execution_span:
+                result = await self._cached_execution(question, prompt_name, stage_cache, cache_ttl_hours)
+                execution_span.set_attributes({
+                    "sources": result.get("source_count", 0),
+                    "failed": result["summary"].startswith("Research failed"),
+                    "cached": bool(result.get("cached"))
+                })
+            result["covers_questions"] = [planned_questions[j] for j in cluster]
             research_results.append(result)
+            
+            if tracker and not result["summary"].startswith("Research failed"):
+                score = tracker.add(result["summary"])
+                print(f"  🧮 Novelty of question {i}: {score:.2f}")
+                if tracker.should_stop() and i < len(sub_questions):
+                    skipped_questions = sub_questions[i:]
+                    print(f"  ⏹️ Novelty below {novelty_threshold}, skipping {len(skipped_questions)} remaining questions")
+                    break
+        
+        # Optional local compression of summaries before synthesis
+        compression_stats = None
+        publisher_inputs = research_results
+        if compress_target_chars:
+            # Imported here: the compressor loads NumPy, which most requests never need
+            from summary_compression import compress_summaries
+            # Structured answers keep their data points and citations; only the prose is trimmed
+            texts = [r["structured"]["summary"] if r.get("structured") else r["summary"] for r in research_results]
+            summaries, compression_stats = compress_summaries(texts, target_chars=compress_target_chars)
+            publisher_inputs = [
+                dict(r, structured=dict(r["structured"], summary=summary)) if r.get("structured") else dict(r, summary=summary)
+                for r, summary in zip(research_results, summaries)
+            ]
+            print(f"🗜️ Compressed summaries to {compression_stats['ratio']:.0%} of original size")
+        
+        # Unchanged evidence: keep the cached report instead of synthesizing it again
+        fingerprint = source_fingerprint([s for r in research_results for s in r.get("sources", [])[:5]])
+        if report_namespace:
+            unchanged = await profiled_to_thread(research_cache.extend_if_unchanged, query, report_namespace, fingerprint)
+            if unchanged:
+                unchanged["cached"] = True
+                return unchanged
         
         # Stage 3: Publishing
         print("📊 Stage 3: Research Publishing...")
-        final_report = await self.research_publisher(query, research_results, prompt_name)
+        publisher_start = time.time()
+        with span("stage.publisher", inputs=len(publisher_inputs)):
+            final_report = await self.research_publisher(query, publisher_inputs, prompt_name)
+        publisher_seconds = time.time() - publisher_start
+        STAGE_DURATION.observe(publisher_seconds, stage="publisher")
+        SUB_QUESTIONS.observe(len(planned_questions), phase="planned")
+        SUB_QUESTIONS.observe(len(research_results), phase="executed")
+        
+        if "error" not in final_report:
+            final_report["source_fingerprint"] = fingerprint
+            final_report["planned_sub_questions"] = len(planned_questions)
+            final_report["duplicate_questions_collapsed"] = len(planned_questions) - len(sub_questions)
+            final_report["publisher_seconds"] = round(publisher_seconds, 2)
+            final_report["execution_models"] = sorted({r["model"] for r in research_results if r.get("model")})
+            if compression_stats:
+                final_report["summary_compression"] = compression_stats
+        
+        if tracker and "error" not in final_report:
+            final_report["novelty_threshold"] = novelty_threshold
+            final_report["novelty_scores"] = tracker.scores
+            final_report["early_stopped"] = bool(skipped_questions)
+            final_report["skipped_sub_questions"] = skipped_questions
+            final_report["execution_calls_saved"] = len(skipped_questions)
         
         end_time = time.time()
         print(f"✅ Advanced research completed in {end_time - start_time:.2f} seconds")
         
         return final_report
     
-    async def _conduct_data_driven_research(self, query: str) -> Dict:
+    async def _archive_report(self, report: Dict, prompt_name: str):
+        """Keep a searchable copy of every successful report"""
+        try:
+            with span("report.archive"):
+                await profiled_to_thread(report_archive.archive, report, prompt_name)
+        except Exception as e:
+            print(f"⚠️ Failed to archive report: {e}")
+    
+    def submit_advanced_research(self, query: str, prompt_name: str = "testprompt3", **kwargs) -> Future:
+        """Schedule advanced research on the background loop (thread-safe)"""
+        return self.loop.submit(self.conduct_advanced_research(query, prompt_name, **kwargs))
+    
+    def run_advanced_research(self, query: str, prompt_name: str = "testprompt3", timeout: Optional[float] = None, **kwargs) -> Dict:
+        """Run advanced research on the background loop and wait for the report"""
+        return self.submit_advanced_research(query, prompt_name, **kwargs).result(timeout)
+    
+    async def _conduct_data_driven_research(self, query: str, use_cache: bool = True, cache_ttl_hours: Optional[float] = None,
+                                            refresh: bool = False, revalidate=None) -> Dict:
         """Conduct data-driven research using testprompt4 approach"""
-        print(f"📊 Starting data-driven research for: {query}")
         start_time = time.time()
-        
-        # Get web sources using Tavily
-        sources = []
-        if self.tavily_enabled:
-            try:
-                print("🔍 Gathering web sources via Tavily...")
-                search_result = self.tavily_client.search(
-                    query=query,
-                    search_depth="advanced",
-                    max_results=10,  # More results for data-driven analysis
-                    include_domains=[
-                        "g2.com", "capterra.com", "trustradius.com",
-                        "producthunt.com", "techcrunch.com", "venturebeat.com",
-                        "linkedin.com", "medium.com", "forbes.com",
-                        "bloomberg.com", "reuters.com", "wsj.com"
-                    ]
-                )
-                sources = search_result.get("results", [])
-                print(f"✅ Found {len(sources)} web sources")
-            except Exception as e:
-                print(f"⚠️ Tavily search failed: {e}")
-                sources = []
-        
-        # Prepare JSON data for testprompt4
-        results_data = []
-        for source in sources:
-            results_data.append({
-                "title": source.get('title', 'Unknown'),
-                "url": source.get('url', 'N/A'),
-                "snippet": source.get('content', '')[:300] + "..." if len(source.get('content', '')) > 300 else source.get('content', ''),
-                "date": source.get('published_date', 'Unknown'),
-                "annotation": "Web search result"
-            })
-        
-        # Prepare the JSON input for testprompt4
-        json_input = {
-            "query": query,
-            "num_results": len(results_data),
-            "results": results_data
-        }
-        
-        # Get testprompt4
-        prompt4_content = prompt_manager.get_prompt("testprompt4")
-        
-        # Create the full prompt with JSON data
-        full_prompt = f"{prompt4_content}\n\n**Input JSON Schema:**\n```json\n{json.dumps(json_input, indent=2)}\n```"
-        
-        # Try DeepSeek first (primary)
-        if self.deepseek_enabled:
-            try:
-                print("🔍 Using DeepSeek (primary) for data-driven analysis...")
-                completion = self.deepseek_client.chat.completions.create(
-                    model="deepseek-reasoner",
-                    messages=[
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=4000,
-                    stream=False
-                )
-                
-                content = completion.choices[0].message.content
-                
-            except Exception as e:
-                print(f"⚠️ DeepSeek failed in data-driven research: {str(e)}")
-                if self.groq_client:
-                    print("🔄 Falling back to Groq for data-driven research...")
-                    content = await self._fallback_data_driven_research(full_prompt)
-                else:
-                    content = f"Research failed: {str(e)}"
-        
-        # Fallback to Groq (secondary)
-        elif self.groq_client:
-            content = await self._fallback_data_driven_research(full_prompt)
-        else:
-            content = "No AI backend available for data-driven research"
-        
+        with span("stage.data_driven"):
+            report = await profiled_to_thread(
+                generate_data_driven_report,
+                self.router,
+                self.tavily_client if self.tavily_enabled else None,
+                query,
+                on_sources=self.source_store.ingest if self.source_store else None,
+                use_cache=use_cache,
+                max_age_hours=cache_ttl_hours,
+                refresh=refresh,
+                revalidate=revalidate
+            )
         end_time = time.time()
+        if not report.get("cached"):
+            STAGE_DURATION.observe(end_time - start_time, stage="data_driven")
         print(f"✅ Data-driven research completed in {end_time - start_time:.2f} seconds")
-        
-        return {
-            "query": query,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "model": "deepseek-reasoner" if self.deepseek_enabled else "groq-compound-beta",
-            "total_sources": len(sources),
-            "research_type": "data_driven",
-            "prompt_used": "testprompt4"
-        }
-    
-    async def _fallback_data_driven_research(self, full_prompt: str) -> str:
-        """Fallback method for data-driven research using Groq"""
-        try:
-            print("🔍 Using Groq (secondary) for data-driven analysis...")
-            # Add retry logic for rate limiting
-            max_retries = 3
-            retry_delay = 5
-            
-            for attempt in range(max_retries):
-                try:
-                    completion = self.groq_client.chat.completions.create(
-                        model="compound-beta",
-                        messages=[
-                            {"role": "user", "content": full_prompt}
-                        ],
-                        temperature=0.7,
-                        top_p=1,
-                        stream=False,
-                        stop=None
-                    )
-                    return completion.choices[0].message.content
-                    
-                except Exception as e:
-                    if "rate_limit" in str(e).lower() and attempt < max_retries - 1:
-                        print(f"Rate limit hit, waiting {retry_delay} seconds...")
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2
-                        continue
-                    else:
-                        raise e
-                        
-        except Exception as e:
-            print(f"⚠️ Groq failed in data-driven research: {str(e)}")
-            return f"Data-driven research failed: {str(e)}"
+        return report
+
+# Export for use in Streamlit app. The researcher is built on first use (not
+# at import) so importing this module does not create API clients.
+_advanced_researcher: Optional[AdvancedPMMResearcher] = None
+_advanced_researcher_lock = threading.Lock()
+
+def get_advanced_researcher() -> AdvancedPMMResearcher:
+    """Process-wide advanced researcher, constructed once on first call"""
+    global _advanced_researcher
+    if _advanced_researcher is None:
+        with _advanced_researcher_lock:
+            if _advanced_researcher is None:
+                _advanced_researcher = AdvancedPMMResearcher()
+    return _advanced_researcher
 
-# Export for use in Streamlit app
-advanced_researcher = AdvancedPMMResearcher() 
\ No newline at end of file
+def __getattr__(name: str):
+    # `from advanced_research import advanced_researcher` keeps working and builds it lazily
+    if name == "advanced_researcher":
+        return get_advanced_researcher()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+ 
\ No newline at end of file
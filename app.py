@@ -1,11 +1,17 @@
 import streamlit as st
 import os
 import json
-import asyncio
+import time
+import uuid
 from datetime import datetime
-from deep_research import research_agent
-from advanced_research import advanced_researcher
+from cache_warmer import EXAMPLE_QUERIES, start_from_settings as start_cache_warmer, user_request
+from config import settings
+from experiments import assign_variant, experiment_log, experiment_name, parse_split
+from metrics import serve_from_settings
+from profiling import profile_run, profiling_enabled
 from prompt_manager import prompt_manager
+from report_archive import report_archive
+from research_cache import cache_grace_hours, cache_ttl_hours, research_cache
 import markdown
 
 # Page configuration
@@ -16,6 +22,29 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource(show_spinner="Connecting to research backends...")
+def load_research_agent():
+    """Basic research agent, built on first research request and shared across sessions"""
+    # Imported here so the LLM/search SDKs load after first paint, not before it
+    from deep_research import get_research_agent
+    return get_research_agent()
+
+@st.cache_resource(show_spinner="Connecting to research backends...")
+def load_advanced_researcher():
+    """3-stage researcher, built on first research request and shared across sessions"""
+    from advanced_research import get_advanced_researcher
+    return get_advanced_researcher()
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Prometheus scrape endpoint (PMM_METRICS_PORT), started once per process"""
+    return serve_from_settings()
+
+@st.cache_resource
+def start_background_cache_warmer():
+    """Cache warmer for the example queries (PMM_WARM_ON_STARTUP), started once per process"""
+    return start_cache_warmer()
+
 # Custom CSS for better styling
 st.markdown("""
 <style>
@@ -62,7 +91,71 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def display_result(result: dict, prompt_name: str):
+    """Render a research result (fresh or archived) with its metadata"""
+    if "error" in result:
+        st.markdown('<div class="error-box">', unsafe_allow_html=True)
+        st.error(f"Research failed: {result['error']}")
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
+    
+    # Display results
+    st.markdown('<div class="result-box">', unsafe_allow_html=True)
+    
+    # Stale cached report served while a fresh one is generated
+    if result.get("stale"):
+        st.info(f"⏳ Showing a cached report from {result.get('cache_age_hours', '?')} hours ago while a fresh one "
+                "is generated in the background. Ask again shortly for the updated report.")
+    
+    # Research method indicator based on prompt
+    if result.get("from_archive"):
+        st.markdown(f'<div class="cache-indicator">📚 Archived report #{result["archive_id"]}</div>', unsafe_allow_html=True)
+    elif prompt_manager.is_staged(prompt_name):
+        st.markdown('<div class="cache-indicator">🚀 Advanced 3-stage research</div>', unsafe_allow_html=True)
+    elif prompt_name == "testprompt4":
+        st.markdown('<div class="cache-indicator">📊 Data-driven executive report</div>', unsafe_allow_html=True)
+    else:
+        st.markdown('<div class="cache-indicator">📋 Basic research mode</div>', unsafe_allow_html=True)
+    
+    # Display the markdown content
+    st.markdown(result["content"])
+    
+    # Enhanced metadata
+    st.markdown("---")
+    col_meta1, col_meta2, col_meta3, col_meta4 = st.columns(4)
+    with col_meta1:
+        st.caption(f"📅 Generated: {datetime.fromisoformat(result['timestamp']).strftime('%Y-%m-%d %H:%M')}")
+    with col_meta2:
+        st.caption(f"🤖 Model: {result.get('model', 'Unknown')}")
+    with col_meta3:
+        st.caption(f"📊 Query: {result['query'][:50]}...")
+    with col_meta4:
+        if result.get("sources_used"):
+            st.caption(f"🔗 Sources: {result.get('sources_used', 0)}")
+        elif result.get("total_sources"):
+            st.caption(f"🔗 Sources: {result.get('total_sources', 0)}")
+        elif result.get("sub_questions_researched"):
+            st.caption(f"🔬 Questions: {result.get('sub_questions_researched', 0)}")
+    
+    if result.get("execution_calls_saved"):
+        st.caption(f"⏹️ Stopped early: {result['execution_calls_saved']} sub-questions skipped (low novelty)")
+    if result.get("summary_compression"):
+        st.caption(f"🗜️ Summaries compressed to {result['summary_compression']['ratio']:.0%} of original size")
+    if result.get("llm_usage"):
+        usage = result["llm_usage"]
+        st.caption(f"💾 Prompt cache: {usage['cached_tokens']}/{usage['prompt_tokens']} prompt tokens cached ({usage['cache_hit_rate']:.0%}) across {usage['calls']} LLM calls")
+    if result.get("payload_encoding"):
+        stats = result["payload_encoding"]
+        st.caption(f"🧾 {stats['encoding']} payload: {stats['payload_tokens']} tokens ({stats['savings_pct']}% saved vs pretty JSON)")
+    if result.get("run_id"):
+        st.caption(f"🧭 Run id: `{result['run_id']}` (see the Traces page)")
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
 def main():
+    start_metrics_endpoint()
+    start_background_cache_warmer()
+    
     # Header
     st.markdown('<h1 class="main-header">🧠 PMM Research Agent</h1>', unsafe_allow_html=True)
     st.markdown('<p class="subtitle">Strategic research assistant for Product Marketing Managers</p>', unsafe_allow_html=True)
@@ -72,7 +165,7 @@ def main():
         st.header("⚙️ Configuration")
         
         # API Key status
-        groq_key = os.getenv("GROQ_API_KEY")
+        groq_key = settings.get("GROQ_API_KEY")
         if groq_key and groq_key != "your_groq_api_key_here":
             st.success("✅ Groq API Key configured")
         else:
@@ -80,7 +173,7 @@ def main():
             st.info("Set GROQ_API_KEY in your environment or .env file")
         
         # Tavily API Key status
-        tavily_key = os.getenv("TAVILY_API_KEY")
+        tavily_key = settings.get("TAVILY_API_KEY")
         if tavily_key and tavily_key != "your_tavily_api_key_here":
             st.success("✅ Tavily API Key configured")
         else:
@@ -99,30 +192,88 @@ def main():
             help="Choose different prompt versions for A/B testing"
         )
         
+        # Experiment mode: the variant comes from the traffic split and every request is logged
+        default_split = settings.get("PMM_EXPERIMENT_SPLIT", "")
+        experiment_mode = st.checkbox(
+            "🧪 Experiment mode",
+            value=bool(default_split),
+            help="Assign the prompt variant by traffic split (sticky per session) and log per-variant "
+                 "latency, tokens, fallbacks and cache hits (see the Experiments page)"
+        )
+        experiment_split = None
+        if experiment_mode:
+            split_text = st.text_input(
+                "Traffic split",
+                value=default_split or ",".join(f"{name}=1" for name in available_prompts),
+                help="variant=weight pairs, e.g. testprompt1=50,testprompt3=50"
+            )
+            try:
+                experiment_split = parse_split(split_text)
+                unknown = [name for name in experiment_split if name not in available_prompts]
+                if unknown:
+                    st.error(f"Unknown prompt variants: {', '.join(unknown)}")
+                    experiment_split = None
+            except ValueError as e:
+                st.error(str(e))
+            if experiment_split:
+                experiment_unit = st.session_state.setdefault("experiment_unit", uuid.uuid4().hex)
+                selected_prompt = assign_variant(experiment_unit, experiment_split)
+                st.caption(f"This session is assigned **{selected_prompt}** in experiment `{experiment_name()}`")
+        
         # Reload prompts button
         if st.button("🔄 Reload Prompts"):
             prompt_manager.reload_prompts()
             st.success("Prompts reloaded! Refresh the page to see updates.")
         
+        # Early termination for the 3-stage pipeline
+        novelty_threshold = st.slider(
+            "Early stop novelty threshold",
+            0.0, 0.5, 0.0, 0.05,
+            help="Stop researching sub-questions once new answers add less novel content than this (0 disables)"
+        )
+        
+        compress_summaries = st.checkbox(
+            "Compress sub-question summaries before synthesis",
+            value=False,
+            help="Trim each execution summary locally (TF-IDF, keeps figures and citations) for a faster final synthesis"
+        )
+        
         # Cache settings
         st.subheader("💾 Cache Settings")
         cache_enabled = st.checkbox("Enable caching", value=True)
-        cache_duration = st.slider("Cache duration (hours)", 1, 72, 24)
+        cache_duration = st.slider(
+            "Cache duration (hours)", 1, 72, min(72, max(1, int(cache_ttl_hours()))),
+            help=f"Older reports are still shown for up to {cache_grace_hours():g} more hours (PMM_CACHE_GRACE_HOURS), "
+                 "marked as stale, while a fresh one is generated in the background"
+        )
+        cache_options = {"use_cache": cache_enabled, "cache_ttl_hours": cache_duration}
+        
+        # Opt-in profiling of the next request (see the Profiles page)
+        st.subheader("🔬 Profiling")
+        profile_request = st.checkbox(
+            "Profile research requests",
+            value=profiling_enabled(),
+            help="Save a CPU profile and memory snapshot of each request and of rendering its report"
+        )
         
         # Example queries
         st.subheader("💡 Example Queries")
-        example_queries = [
-            "Compare ClickUp and Asana's onboarding for technical users",
-            "What are the key trends in B2B SaaS pricing strategies?",
-            "How do Slack and Microsoft Teams approach enterprise sales?",
-            "What's the competitive landscape for project management tools?",
-            "Analyze the go-to-market strategies of Notion vs Airtable"
-        ]
-        
-        for query in example_queries:
+        for query in EXAMPLE_QUERIES:
             if st.button(query, key=f"example_{hash(query)}"):
                 st.session_state.user_query = query
                 st.rerun()
+        
+        # Report archive search
+        st.subheader("📚 Report Archive")
+        archive_query = st.text_input("Search past reports", placeholder="e.g., ClickUp onboarding")
+        if archive_query.strip():
+            matches = report_archive.search(archive_query)
+            if not matches:
+                st.caption("No archived reports match your search")
+            for match in matches:
+                label = f"{match['query'][:60]} ({match['prompt_name']}, {match['created_at'][:10]})"
+                if st.button(label, key=f"archive_{match['id']}", help=match['snippet']):
+                    st.session_state.archived_report_id = match['id']
     
     # Main content area
     col1, col2 = st.columns([3, 1])
@@ -148,62 +299,44 @@ def main():
         
         # Process research request
         if research_button and user_query.strip():
-            with st.spinner("🧠 Analyzing your question..."):
+            st.session_state.pop("archived_report_id", None)
+            # Marked in flight so background cache warming waits for it
+            with st.spinner("🧠 Analyzing your question..."), user_request():
                 try:
+                    request_start = time.time()
                     # Choose research method based on selected prompt
-                    if selected_prompt == "testprompt3":
+                    if prompt_manager.is_staged(selected_prompt):
                         # Use advanced 3-stage research pipeline
-                        result = asyncio.run(advanced_researcher.conduct_advanced_research(user_query, selected_prompt))
+                        result = load_advanced_researcher().run_advanced_research(user_query, selected_prompt, novelty_threshold=novelty_threshold or None, compress_target_chars=800 if compress_summaries else None, profile=profile_request, **cache_options)
                     elif selected_prompt == "testprompt4":
                         # Use data-driven research (executive reports) - handled by basic research agent
-                        result = research_agent.generate_research_report(user_query, selected_prompt)
+                        result = load_research_agent().generate_research_report(user_query, selected_prompt, profile=profile_request, **cache_options)
                     else:
                         # Use basic research (Groq/DeepSeek only)
-                        result = research_agent.generate_research_report(user_query, selected_prompt)
+                        result = load_research_agent().generate_research_report(user_query, selected_prompt, profile=profile_request, **cache_options)
                     
-                    if "error" in result:
-                        st.markdown('<div class="error-box">', unsafe_allow_html=True)
-                        st.error(f"Research failed: {result['error']}")
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    else:
-                        # Display results
-                        st.markdown('<div class="result-box">', unsafe_allow_html=True)
-                        
-                        # Research method indicator based on prompt
-                        if selected_prompt == "testprompt3":
-                            st.markdown('<div class="cache-indicator">🚀 Advanced 3-stage research</div>', unsafe_allow_html=True)
-                        elif selected_prompt == "testprompt4":
-                            st.markdown('<div class="cache-indicator">📊 Data-driven executive report</div>', unsafe_allow_html=True)
-                        else:
-                            st.markdown('<div class="cache-indicator">📋 Basic research mode</div>', unsafe_allow_html=True)
-                        
-                        # Display the markdown content
-                        st.markdown(result["content"])
-                        
-                        # Enhanced metadata
-                        st.markdown("---")
-                        col_meta1, col_meta2, col_meta3, col_meta4 = st.columns(4)
-                        with col_meta1:
-                            st.caption(f"📅 Generated: {datetime.fromisoformat(result['timestamp']).strftime('%Y-%m-%d %H:%M')}")
-                        with col_meta2:
-                            st.caption(f"🤖 Model: {result.get('model', 'Unknown')}")
-                        with col_meta3:
-                            st.caption(f"📊 Query: {result['query'][:50]}...")
-                        with col_meta4:
-                            if result.get("sources_used"):
-                                st.caption(f"🔗 Sources: {result.get('sources_used', 0)}")
-                            elif result.get("total_sources"):
-                                st.caption(f"🔗 Sources: {result.get('total_sources', 0)}")
-                            elif result.get("sub_questions_researched"):
-                                st.caption(f"🔬 Questions: {result.get('sub_questions_researched', 0)}")
-                        
-                        st.markdown('</div>', unsafe_allow_html=True)
-                        
+                    if experiment_split:
+                        try:
+                            experiment_log.record(experiment_name(), selected_prompt, result, time.time() - request_start,
+                                                  unit=st.session_state.experiment_unit)
+                        except Exception as e:
+                            print(f"⚠️ Failed to log experiment run: {e}")
+                    
+                    with profile_run(result.get("run_id", "unknown"), profile_request, label="render"):
+                        display_result(result, selected_prompt)
+                    if "error" not in result:
                         # Store result in session state for export
                         st.session_state.last_result = result
                         
                 except Exception as e:
                     st.error(f"An error occurred: {str(e)}")
+        
+        # Open a report from the archive without regenerating it
+        elif st.session_state.get("archived_report_id"):
+            archived = report_archive.get(st.session_state.archived_report_id)
+            if archived:
+                display_result(archived, archived.get("prompt_used", "default"))
+                st.session_state.last_result = archived
     
     with col2:
         st.subheader("📤 Export Options")
@@ -237,12 +370,7 @@ def main():
         st.subheader("🗄️ Cache Management")
         if st.button("🗑️ Clear Cache"):
             try:
-                import sqlite3
-                conn = sqlite3.connect("pmm_research_cache.db")
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM research_cache")
-                conn.commit()
-                conn.close()
+                research_cache.clear()
                 st.success("Cache cleared successfully!")
             except Exception as e:
                 st.error(f"Failed to clear cache: {str(e)}")
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+
+class BackgroundEventLoop:
+    """Long-lived asyncio event loop running in a dedicated daemon thread.
+
+    Streamlit reruns the script on every click and the CLI scripts are plain
+    synchronous code, so neither owns an event loop that outlives a single
+    request. Coroutines submitted here all run on the same loop, which lets
+    async connection pools, caches and background tasks stay warm.
+    """
+
+    def __init__(self, name: str = "pmm-research-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self._loop is not None
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if it is not running yet (idempotent, thread-safe)"""
+        with self._lock:
+            if not self.is_running:
+                self._ready.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                self._ready.wait()
+        return self._loop
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+            self._loop = None
+
+    def in_loop_thread(self) -> bool:
+        """True when called from the loop's own thread"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the background loop from any thread"""
+        loop = self.start()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Submit a coroutine and block until its result is available"""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("BackgroundEventLoop.run() called from the loop thread; await the coroutine instead")
+        return self.submit(coro).result(timeout)
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Stop the loop and join its thread"""
+        with self._lock:
+            if not self.is_running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if not self.in_loop_thread():
+                self._thread.join(timeout)
+            self._thread = None
+
+
+# Shared loop owned by the research layer
+research_loop = BackgroundEventLoop()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: how long the Streamlit app's imports take before first
+paint, versus the one-off cost of loading the research modules and building
+the agents on the first research request.
+
+Each measurement runs in a fresh interpreter so module caches do not leak
+between runs. Usage:
+
+    python benchmarks/cold_start.py --runs 5 --json cold_start.json
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def app_imports(path: str = os.path.join(ROOT, "app.py")) -> str:
+    """Import statement for the modules app.py imports at the top of the script (before first
+    paint), read from its source so the probe follows the app; Streamlit is timed separately"""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    modules = [m for m in dict.fromkeys(modules) if m.split(".")[0] != "streamlit"]
+    return f"import {', '.join(modules)}"
+
+
+APP_IMPORTS = app_imports()
+
+PROBE = f"""
+import json, time
+start = time.perf_counter()
+import streamlit
+streamlit_loaded = time.perf_counter()
+{APP_IMPORTS}
+imported = time.perf_counter()
+from deep_research import get_research_agent
+from advanced_research import get_advanced_researcher
+get_research_agent()
+get_advanced_researcher()
+constructed = time.perf_counter()
+print("COLD_START " + json.dumps({{
+    "streamlit_seconds": streamlit_loaded - start,
+    "import_seconds": imported - streamlit_loaded,
+    "first_request_seconds": constructed - imported
+}}))
+"""
+
+
+def run_probe() -> dict:
+    """Run one cold start in a fresh interpreter"""
+    env = dict(os.environ)
+    # Agents only need keys to construct clients; no request is made
+    for key in ("DEEPSEEK_API_KEY", "GROQ_API_KEY", "TAVILY_API_KEY"):
+        env.setdefault(key, "benchmark-placeholder")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    line = next(l for l in output.splitlines() if l.startswith("COLD_START "))
+    return json.loads(line[len("COLD_START "):])
+
+
+def summarize(samples: list) -> dict:
+    return {
+        "median": round(statistics.median(samples), 4),
+        "min": round(min(samples), 4),
+        "max": round(max(samples), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app import time vs lazy agent construction")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to start")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    runs = [run_probe() for _ in range(args.runs)]
+    results = {"runs": args.runs}
+    for phase in ("streamlit_seconds", "import_seconds", "first_request_seconds"):
+        results[phase] = summarize([r[phase] for r in runs])
+
+    print(f"⏱️ Cold start over {args.runs} runs (median):")
+    print(f"   Streamlit import: {results['streamlit_seconds']['median'] * 1000:.0f} ms")
+    print(f"   App imports before first paint: {results['import_seconds']['median'] * 1000:.0f} ms")
+    print(f"   Research modules + agents on first request: {results['first_request_seconds']['median'] * 1000:.0f} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
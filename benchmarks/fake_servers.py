@@ -0,0 +1,272 @@
+"""
+Local stand-ins for the DeepSeek/Groq (OpenAI-compatible) and Tavily APIs.
+
+Both servers answer with deterministic, schema-valid payloads after a delay
+drawn from a configurable latency distribution, and can inject server errors,
+enforce a request-rate limit (HTTP 429) or simulate an outage (HTTP 503); all
+of these can be changed while the server runs. Point the research agents at
+them with DEEPSEEK_BASE_URL, GROQ_BASE_URL and TAVILY_BASE_URL.
+"""
+
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+class LatencyModel:
+    """Response delay distribution, parsed from "fixed:S", "uniform:MIN,MAX"
+    or "lognormal:MEDIAN,SIGMA" (seconds)"""
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()] if params else []
+        if self.kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution '{spec}'")
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            low, high = self.params
+            return rng.uniform(low, high)
+        median, sigma = self.params
+        return median * math.exp(rng.gauss(0, sigma)) if median > 0 else 0.0
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second (0 disables)"""
+
+    def __init__(self, rate: float = 0, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if not self.rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class FakeServer:
+    """Threaded HTTP server with latency, error and rate-limit injection"""
+
+    name = "fake"
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, rate_limit: float = 0,
+                 seed: int = 0, port: int = 0, addr: str = "127.0.0.1"):
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.limiter = RateLimiter(rate_limit)
+        self.outage = False  # When set, every request gets HTTP 503
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.counts: Counter = Counter()
+        self._counts_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((addr, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True, name=f"{self.name}-server").start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def set_latency(self, spec: str):
+        self.latency = LatencyModel(spec)
+
+    def set_rate_limit(self, rate: float):
+        self.limiter = RateLimiter(rate)
+
+    def reset_counts(self):
+        with self._counts_lock:
+            self.counts.clear()
+
+    def count(self, key: str):
+        with self._counts_lock:
+            self.counts[key] += 1
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._rng_lock:
+            return self.latency.sample(self._rng), self._rng.random() < self.error_rate
+
+    def respond(self, path: str, request: Dict) -> Optional[Dict]:
+        """Response body for a request, or None for an unknown path"""
+        raise NotImplementedError
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, body: Dict, headers: Optional[Dict] = None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    request = {}
+                server.count("requests")
+                if server.outage:
+                    server.count("unavailable")
+                    self._send(503, {"error": {"message": "Service unavailable (injected outage)", "type": "server_error"}})
+                    return
+                if not server.limiter.allow():
+                    server.count("rate_limited")
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded",
+                                               "code": "rate_limit_exceeded"}}, {"retry-after-ms": "50"})
+                    return
+                delay, fail = server._draw()
+                time.sleep(delay)
+                if fail:
+                    server.count("errors")
+                    self._send(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                    return
+                body = server.respond(self.path.split("?")[0], request)
+                if body is None:
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                server.count("ok")
+                self._send(200, body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# Distinct enough that the planner's near-duplicate collapsing keeps all five
+PLANNER_QUESTIONS = [
+    "How do vendors structure pricing tiers and volume discounts?",
+    "Which onboarding steps make technical users abandon a trial?",
+    "What security certifications do enterprise buyers require before purchase?",
+    "Which partner channels generate the most qualified pipeline?",
+    "What product analytics signals predict expansion revenue?"
+]
+
+
+def _words(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeLLMServer(FakeServer):
+    """OpenAI-compatible /chat/completions (DeepSeek paths and Groq's /openai/v1 prefix).
+
+    JSON-mode requests get an object valid for both the planner and execution
+    schemas; other requests get a markdown report. Repeated system prompts are
+    reported as prompt cache hits, like DeepSeek's prefix cache.
+    """
+
+    name = "fake-llm"
+
+    def __init__(self, *args, completion_words: int = 200, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.completion_words = completion_words
+        self._seen_prefixes = set()
+        self._prefix_lock = threading.Lock()
+
+    def respond(self, path: str, request: Dict) -> Optional[Dict]:
+        if not path.endswith("/chat/completions"):
+            return None
+        messages = request.get("messages", [])
+        model = request.get("model", "fake-model")
+        self.count(f"model:{model}")
+        prompt_text = "".join(str(m.get("content", "")) for m in messages)
+        digest = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()[:8]
+
+        if request.get("response_format", {}).get("type") == "json_object":
+            content = json.dumps({
+                "questions": PLANNER_QUESTIONS,
+                "summary": f"Synthetic answer {digest}. " * 4,
+                "data_points": [f"{10 + i}% year-over-year growth (Source: Fake Analyst, 2025-01-0{i})" for i in range(1, 4)],
+                "contradictions": ["Sources disagree on enterprise pricing"],
+                "citations": [{"title": f"Fake source {i}", "url": f"https://example.com/{digest}/{i}"} for i in range(1, 3)]
+            })
+        else:
+            body = " ".join(["Synthetic", "analysis", "text"] * (self.completion_words // 3))
+            content = "\n".join([
+                f"## Executive Summary ({digest})", body,
+                "## Research Questions",
+                *[f"- How does segment {i} evaluate pricing ({digest})?" for i in range(1, 6)],
+                "## Recommendations", "- Lead with onboarding speed [1]", "- Publish pricing benchmarks [2]"
+            ])
+
+        system = messages[0].get("content", "") if messages and messages[0].get("role") == "system" else ""
+        with self._prefix_lock:
+            cached = _words(system) if system and system in self._seen_prefixes else 0
+            if system:
+                self._seen_prefixes.add(system)
+        prompt_tokens = _words(prompt_text)
+        completion_tokens = _words(content)
+        return {
+            "id": f"chatcmpl-{digest}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_cache_hit_tokens": cached,
+                "prompt_cache_miss_tokens": prompt_tokens - cached
+            }
+        }
+
+
+class FakeTavilyServer(FakeServer):
+    """Tavily-compatible POST /search returning deterministic results per query"""
+
+    name = "fake-tavily"
+
+    def respond(self, path: str, request: Dict) -> Optional[Dict]:
+        if not path.endswith("/search"):
+            return None
+        query = request.get("query", "")
+        domains = request.get("include_domains") or ["example.com"]
+        digest = hashlib.sha256(query.encode("utf-8")).hexdigest()[:8]
+        results = []
+        for i in range(int(request.get("max_results") or 5)):
+            domain = domains[i % len(domains)]
+            results.append({
+                "title": f"{query[:60]} - report {i + 1}",
+                "url": f"https://{domain}/{digest}/{i + 1}",
+                "content": f"{query}. Analysts report {20 + i}% growth in 2025 and pricing from ${10 + i} per seat. " * 3,
+                "score": round(1 - i * 0.05, 2),
+                "published_date": "2025-01-15"
+            })
+        return {"query": query, "results": results, "response_time": 0.0}
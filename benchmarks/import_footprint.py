@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Import-time and memory footprint of the research engine for headless use.
+
+Each module is imported in a fresh interpreter; the script reports wall time,
+resident memory added over a bare interpreter, and whether Streamlit got
+pulled in. Budgets turn it into a regression check:
+
+    python benchmarks/import_footprint.py --runs 3 --max-seconds 2 --max-rss-mb 150 --json footprint.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Headless entry points, plus streamlit itself for reference
+MODULES = ["config", "prompt_manager", "deep_research", "advanced_research"]
+REFERENCE_MODULES = ["streamlit"]
+
+PROBE = """
+import json, resource, sys, time
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss is in kB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+before = rss_kb()
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+print("FOOTPRINT " + json.dumps({
+    "seconds": elapsed,
+    "rss_mb": (rss_kb() - before) / 1024,
+    "streamlit_loaded": "streamlit" in sys.modules
+}))
+"""
+
+
+def measure(module: str) -> dict:
+    """Import `module` in a fresh interpreter and return its footprint"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, module], cwd=ROOT,
+        capture_output=True, text=True, check=True
+    ).stdout
+    line = next(l for l in output.splitlines() if l.startswith("FOOTPRINT "))
+    return json.loads(line[len("FOOTPRINT "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and RSS of the research modules")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module")
+    parser.add_argument("--max-seconds", type=float, help="Fail if a headless module imports slower than this")
+    parser.add_argument("--max-rss-mb", type=float, help="Fail if a headless module adds more memory than this")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    print(f"📦 Import footprint (median of {args.runs} runs):")
+    for module in MODULES + REFERENCE_MODULES:
+        runs = [measure(module) for _ in range(args.runs)]
+        results[module] = {
+            "seconds": round(statistics.median(r["seconds"] for r in runs), 4),
+            "rss_mb": round(statistics.median(r["rss_mb"] for r in runs), 1),
+            "streamlit_loaded": any(r["streamlit_loaded"] for r in runs)
+        }
+        entry = results[module]
+        note = " (reference)" if module in REFERENCE_MODULES else ""
+        print(f"   {module:<20} {entry['seconds'] * 1000:7.0f} ms  {entry['rss_mb']:6.1f} MB"
+              f"  streamlit={'yes' if entry['streamlit_loaded'] else 'no'}{note}")
+
+        if module in REFERENCE_MODULES:
+            continue
+        if entry["streamlit_loaded"]:
+            failures.append(f"{module} imports streamlit")
+        if args.max_seconds is not None and entry["seconds"] > args.max_seconds:
+            failures.append(f"{module} took {entry['seconds']:.2f}s (budget {args.max_seconds}s)")
+        if args.max_rss_mb is not None and entry["rss_mb"] > args.max_rss_mb:
+            failures.append(f"{module} added {entry['rss_mb']:.1f} MB (budget {args.max_rss_mb} MB)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Research modules import without Streamlit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Concurrent-user load test with fault injection against local stand-in backends.
+
+Simulates N users issuing a weighted mix of basic (testprompt1), advanced
+(testprompt3) and data-driven (testprompt4) queries for a fixed duration, with
+a configurable share of repeated (cacheable) queries. DeepSeek, Groq and
+Tavily are separate fake servers (benchmarks/fake_servers.py), so faults can
+hit one backend and exercise the fallback chain. Faults are scheduled as
+KIND:TARGET@START-END[=VALUE] (seconds from the start of the test):
+
+    slow:deepseek@10-20=lognormal:2,0.3   latency distribution during the window
+    ratelimit:llm@20-30=2                 requests/second before HTTP 429
+    errors:search@5-15=0.5                fraction of requests answered with HTTP 500
+    outage:deepseek@30-40                 every request answered with HTTP 503
+
+Targets are deepseek, groq, llm (both) and search. Example:
+
+    python benchmarks/load_test.py --users 8 --duration 60 --mix basic=5,advanced=2,data_driven=3 \\
+        --cache-hit-ratio 0.3 --fault outage:deepseek@20-35 --json load.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_servers import FakeLLMServer, FakeServer, FakeTavilyServer  # noqa: E402
+from offline_suite import MODES, QUERIES, git_commit, latency_summary, prepare_workdir, request_runner  # noqa: E402
+
+FAULT_KINDS = ("slow", "ratelimit", "errors", "outage")
+TARGETS = {"deepseek": ["deepseek"], "groq": ["groq"], "llm": ["deepseek", "groq"], "search": ["search"]}
+
+
+class Fault:
+    """A backend fault applied for a time window, then reverted"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        head, _, self.value = spec.partition("=")
+        kind_target, _, window = head.partition("@")
+        self.kind, _, target = kind_target.partition(":")
+        if self.kind not in FAULT_KINDS or target not in TARGETS or not window:
+            raise ValueError(f"Invalid fault '{spec}', expected KIND:TARGET@START-END[=VALUE]")
+        start, _, end = window.partition("-")
+        self.start, self.end = float(start), float(end)
+        self.targets = TARGETS[target]
+        if self.kind != "outage" and not self.value:
+            raise ValueError(f"Fault '{spec}' needs a value")
+        self._saved: Dict[str, object] = {}
+
+    def apply(self, server: FakeServer, name: str):
+        if self.kind == "slow":
+            self._saved[name] = server.latency
+            server.set_latency(self.value)
+        elif self.kind == "ratelimit":
+            self._saved[name] = server.limiter
+            server.set_rate_limit(float(self.value))
+        elif self.kind == "errors":
+            self._saved[name] = server.error_rate
+            server.error_rate = float(self.value)
+        else:
+            server.outage = True
+
+    def revert(self, server: FakeServer, name: str):
+        if self.kind == "slow":
+            server.latency = self._saved[name]
+        elif self.kind == "ratelimit":
+            server.limiter = self._saved[name]
+        elif self.kind == "errors":
+            server.error_rate = self._saved[name]
+        else:
+            server.outage = False
+
+
+def schedule_faults(faults: List[Fault], servers: Dict[str, FakeServer], started: float,
+                    stop: threading.Event) -> threading.Thread:
+    """Apply and revert faults at their offsets from `started`"""
+    events = sorted([(f.start, "apply", f) for f in faults] + [(f.end, "revert", f) for f in faults],
+                    key=lambda e: (e[0], e[1] == "apply"))
+
+    def run():
+        for offset, action, fault in events:
+            if stop.wait(max(0.0, started + offset - time.perf_counter())):
+                return
+            for name in fault.targets:
+                getattr(fault, action)(servers[name], name)
+            print(f"{'💥' if action == 'apply' else '🩹'} t={offset:.0f}s {action} {fault.spec}")
+
+    thread = threading.Thread(target=run, daemon=True, name="fault-schedule")
+    thread.start()
+    return thread
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        mode, _, weight = part.partition("=")
+        mode = mode.strip()
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}' in mix")
+        mix[mode] = float(weight or 1)
+    return mix
+
+
+class LoadTest:
+    """Simulated users sharing one process, agents, caches and SQLite stores"""
+
+    def __init__(self, args, runners: Dict):
+        self.args = args
+        self.runners = runners
+        self.mix = parse_mix(args.mix)
+        self.samples: List[Dict] = []
+        self.hot_queries: Dict[str, List[str]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def pick_query(self, mode: str, rng: random.Random) -> str:
+        """A repeated query with probability cache_hit_ratio, else a fresh one"""
+        with self._lock:
+            hot = self.hot_queries[mode]
+            if hot and rng.random() < self.args.cache_hit_ratio:
+                return rng.choice(hot)
+            self._counter += 1
+            query = f"{QUERIES[self._counter % len(QUERIES)]} (load {self._counter})"
+            hot.append(query)
+            return query
+
+    def user(self, user_id: int, started: float, deadline: float):
+        rng = random.Random(self.args.seed * 1000 + user_id)
+        modes, weights = list(self.mix), list(self.mix.values())
+        while time.perf_counter() < deadline:
+            mode = rng.choices(modes, weights)[0]
+            query = self.pick_query(mode, rng)
+            begin = time.perf_counter()
+            error = None
+            cached = False
+            try:
+                result = self.runners[mode](query)
+                error = result.get("error")
+                cached = bool(result.get("cached"))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            end = time.perf_counter()
+            with self._lock:
+                self.samples.append({"mode": mode, "user": user_id, "start": begin - started,
+                                     "seconds": end - begin, "error": error, "cached": cached})
+            if self.args.think_time:
+                time.sleep(rng.expovariate(1 / self.args.think_time))
+
+    def run(self) -> float:
+        started = time.perf_counter()
+        deadline = started + self.args.duration
+        users = [threading.Thread(target=self.user, args=(i, started, deadline), name=f"user-{i}")
+                 for i in range(self.args.users)]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+        return started
+
+
+def summarize(samples: List[Dict], elapsed: float) -> Dict:
+    ok = [s for s in samples if not s["error"]]
+    errors = defaultdict(int)
+    for s in samples:
+        if s["error"]:
+            errors[str(s["error"])[:120]] += 1
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "error_rate": round((len(samples) - len(ok)) / len(samples), 4) if samples else 0.0,
+        "cached": sum(1 for s in samples if s["cached"]),
+        "throughput_rps": round(len(ok) / elapsed, 4) if elapsed else 0.0,
+        "latency": latency_summary([s["seconds"] for s in ok]),
+        "top_errors": dict(sorted(errors.items(), key=lambda e: -e[1])[:5])
+    }
+
+
+def timeline(samples: List[Dict], window: float, elapsed: float) -> List[Dict]:
+    """Completions, errors and p95 per time window (by request start), to spot collapse during faults"""
+    rows = []
+    start = 0.0
+    while start < elapsed:
+        bucket = [s for s in samples if start <= s["start"] < start + window]
+        ok = [s["seconds"] for s in bucket if not s["error"]]
+        rows.append({"start": round(start, 1), "requests": len(bucket), "errors": len(bucket) - len(ok),
+                     "p95": latency_summary(ok)["p95"]})
+        start += window
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test with simulated users and injected backend faults")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds users keep issuing requests")
+    parser.add_argument("--mix", default="basic=5,advanced=2,data_driven=3", help="Mode weights, e.g. basic=5,advanced=2")
+    parser.add_argument("--cache-hit-ratio", type=float, default=0.3, help="Share of requests repeating an earlier query")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean pause between a user's requests (seconds)")
+    parser.add_argument("--llm-latency", default="lognormal:0.2,0.4", help="Baseline LLM latency distribution")
+    parser.add_argument("--search-latency", default="lognormal:0.1,0.3", help="Baseline search latency distribution")
+    parser.add_argument("--fault", action="append", default=[], help="KIND:TARGET@START-END[=VALUE] (repeatable)")
+    parser.add_argument("--retry-delay", type=float, default=0.5, help="Router backoff after a rate limit (production: 5s)")
+    parser.add_argument("--window", type=float, default=5, help="Timeline bucket size in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for users and backends")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--stage-cache", action="store_true",
+                        help="Also share planner/execution results and stored sources between different queries "
+                             "(off: only repeated queries are served from the cache)")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the temporary working directory")
+    args = parser.parse_args()
+    try:
+        faults = [Fault(spec) for spec in args.fault]
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    args.json = os.path.abspath(args.json) if args.json else None
+    original_cwd = os.getcwd()
+
+    servers = {
+        "deepseek": FakeLLMServer(args.llm_latency, seed=args.seed).start(),
+        "groq": FakeLLMServer(args.llm_latency, seed=args.seed + 1).start(),
+        "search": FakeTavilyServer(args.search_latency, seed=args.seed + 2).start()
+    }
+    os.environ.update({
+        "DEEPSEEK_API_KEY": "load-test", "GROQ_API_KEY": "load-test", "TAVILY_API_KEY": "load-test",
+        "DEEPSEEK_BASE_URL": servers["deepseek"].url, "GROQ_BASE_URL": servers["groq"].url,
+        "TAVILY_BASE_URL": servers["search"].url,
+        # The fake planner gives every query the same sub-questions, so shared stage
+        # results and sources would let fresh queries skip most of their work
+        "PMM_STAGE_CACHE": "1" if args.stage_cache else "0",
+        "PMM_SOURCE_STORE": "1" if args.stage_cache else "0"
+    })
+    workdir = prepare_workdir()
+    os.chdir(workdir)  # Fresh caches and stores shared by all simulated users
+    from prompt_manager import prompt_manager
+    prompt_manager.prompts_dir = workdir
+    prompt_manager.reload_prompts()
+
+    load_test = LoadTest(args, {mode: request_runner(mode, args.retry_delay, use_cache=True) for mode in parse_mix(args.mix)})
+    print(f"👥 {args.users} users for {args.duration:.0f}s, mix {args.mix}, "
+          f"cache hit ratio {args.cache_hit_ratio}, stage cache {'on' if args.stage_cache else 'off'}, {len(faults)} faults")
+    stop = threading.Event()
+    try:
+        started = time.perf_counter()
+        schedule_faults(faults, servers, started, stop)
+        load_test.run()
+        elapsed = time.perf_counter() - started
+    finally:
+        stop.set()
+        for server in servers.values():
+            server.stop()
+        os.chdir(original_cwd)
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    samples = load_test.samples
+    results = {
+        "created": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "keep_workdir")},
+        "elapsed_seconds": round(elapsed, 2),
+        "overall": summarize(samples, elapsed),
+        "modes": {mode: summarize([s for s in samples if s["mode"] == mode], elapsed) for mode in load_test.mix},
+        "timeline": timeline(samples, args.window, elapsed),
+        "servers": {name: dict(server.counts) for name, server in servers.items()}
+    }
+
+    print(f"\n📈 {results['overall']['requests']} requests in {elapsed:.1f}s")
+    print(f"   {'mode':<12} {'reqs':>5} {'err%':>6} {'rps':>6} {'p50':>7} {'p95':>7} {'p99':>7}")
+    for name, entry in [("overall", results["overall"])] + list(results["modes"].items()):
+        lat = entry["latency"]
+        print(f"   {name:<12} {entry['requests']:>5} {entry['error_rate']:>6.1%} {entry['throughput_rps']:>6.2f} "
+              f"{lat['p50']:>6.2f}s {lat['p95']:>6.2f}s {lat['p99']:>6.2f}s")
+    print("\n⏱️ Timeline (by request start):")
+    for row in results["timeline"]:
+        print(f"   t={row['start']:>5.0f}s  {row['requests']:>4} requests  {row['errors']:>3} errors  p95 {row['p95']:.2f}s")
+    print(f"\n🖥️ Backend counts: {json.dumps(results['servers'])}")
+    for error, count in results["overall"]["top_errors"].items():
+        print(f"   ❌ {count}× {error}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
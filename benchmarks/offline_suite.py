@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark for the basic, advanced and data-driven modes.
+
+The research agents run unmodified against local fake DeepSeek/Groq and
+Tavily servers (benchmarks/fake_servers.py) with configurable latency
+distributions, error rates and rate limits, in a throwaway working directory
+so caches start empty. Reports end-to-end latency percentiles, throughput and
+call counts per mode, and can compare against a previous run:
+
+    python benchmarks/offline_suite.py --requests 8 --concurrency 4 --json bench.json
+    python benchmarks/offline_suite.py --llm-latency lognormal:0.3,0.5 --llm-error-rate 0.05 \\
+        --compare bench.json --max-regression 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_servers import FakeLLMServer, FakeTavilyServer  # noqa: E402
+
+MODES = {"basic": "testprompt1", "advanced": "testprompt3", "data_driven": "testprompt4"}
+
+QUERIES = [
+    "Compare ClickUp and Asana's onboarding for technical users",
+    "What are the key trends in B2B SaaS pricing strategies?",
+    "How do Slack and Microsoft Teams approach enterprise sales?",
+    "What's the competitive landscape for project management tools?",
+    "Analyze the go-to-market strategies of Notion vs Airtable"
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linearly interpolated percentile (q in 0..100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(values: List[float]) -> Dict:
+    return {
+        "mean": round(sum(values) / len(values), 4) if values else 0.0,
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4) if values else 0.0
+    }
+
+
+def prepare_workdir() -> str:
+    """Temporary working directory holding copies of the prompt files"""
+    from prompt_manager import PromptManager
+    workdir = tempfile.mkdtemp(prefix="pmm-bench-")
+    for path in PromptManager(ROOT).discover_prompt_files().values():
+        shutil.copy(path, workdir)
+    return workdir
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def request_runner(mode: str, retry_delay: float, use_cache: bool = False) -> Callable[[str], Dict]:
+    """Function running one report for `mode` the way the app does (research cache off unless `use_cache`)"""
+    from deep_research import get_research_agent
+    from advanced_research import get_advanced_researcher
+    prompt_name = MODES[mode]
+    if mode == "advanced":
+        agent = get_advanced_researcher()
+        agent.router.retry_delay = retry_delay
+        return lambda query: agent.run_advanced_research(query, prompt_name, use_cache=use_cache)
+    agent = get_research_agent()
+    agent.router.retry_delay = retry_delay
+    return lambda query: agent.generate_research_report(query, prompt_name, use_cache=use_cache)
+
+
+def run_mode(mode: str, args, llm: FakeLLMServer, search: FakeTavilyServer, nonce: str) -> Dict:
+    """Run `args.requests` unique queries for one mode and collect measurements"""
+    run = request_runner(mode, args.retry_delay, args.cache)
+    llm.reset_counts()
+    search.reset_counts()
+    # Unique queries so every request does the full amount of work (the fake
+    # planner returns the same sub-questions for every query, so with --cache
+    # later requests reuse earlier requests' execution answers and sources)
+    queries = [f"{QUERIES[i % len(QUERIES)]} (run {nonce}-{i})" for i in range(args.requests)]
+
+    def timed(query: str):
+        start = time.perf_counter()
+        result = run(query)
+        return time.perf_counter() - start, result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(timed, queries))
+    wall = time.perf_counter() - started
+
+    latencies = [seconds for seconds, _ in outcomes]
+    results = [result for _, result in outcomes]
+    usage = [r.get("llm_usage", {}) for r in results]
+    return {
+        "prompt": MODES[mode],
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": sum(1 for r in results if "error" in r),
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(args.requests / wall, 4) if wall else 0.0,
+        "latency": latency_summary(latencies),
+        "llm_calls_per_request": round(sum(u.get("calls", 0) for u in usage) / len(results), 2),
+        "tokens": {
+            "prompt": sum(u.get("prompt_tokens", 0) for u in usage),
+            "cached": sum(u.get("cached_tokens", 0) for u in usage),
+            "completion": sum(u.get("completion_tokens", 0) for u in usage)
+        },
+        "server": {"llm": dict(llm.counts), "search": dict(search.counts)}
+    }
+
+
+def compare(current: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Regressions in latency or throughput beyond the allowed fraction"""
+    regressions = []
+    print(f"\n📊 Compared with baseline {baseline.get('git_commit', '?')} ({baseline.get('created', '?')}):")
+    for mode, now in current["modes"].items():
+        before = baseline.get("modes", {}).get(mode)
+        if not before:
+            print(f"   {mode:<12} no baseline")
+            continue
+        checks = [("p50", now["latency"]["p50"], before["latency"]["p50"], True),
+                  ("p95", now["latency"]["p95"], before["latency"]["p95"], True),
+                  ("throughput", now["throughput_rps"], before["throughput_rps"], False)]
+        for name, value, old, lower_is_better in checks:
+            change = (value - old) / old if old else 0.0
+            worse = change > max_regression if lower_is_better else change < -max_regression
+            flag = " ❌" if worse else ""
+            print(f"   {mode:<12} {name:<10} {old:8.3f} → {value:8.3f} ({change:+.0%}){flag}")
+            if worse:
+                regressions.append(f"{mode} {name} {change:+.0%}")
+        if now["llm_calls_per_request"] != before["llm_calls_per_request"]:
+            print(f"   {mode:<12} LLM calls/request {before['llm_calls_per_request']} → {now['llm_calls_per_request']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the research modes against fake API servers")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated modes (basic, advanced, data_driven)")
+    parser.add_argument("--requests", type=int, default=4, help="Requests per mode")
+    parser.add_argument("--concurrency", type=int, default=2, help="Concurrent requests")
+    parser.add_argument("--llm-latency", default="lognormal:0.05,0.3",
+                        help="LLM delay: fixed:S, uniform:MIN,MAX or lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument("--search-latency", default="fixed:0.02", help="Search delay distribution")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of LLM requests answered with HTTP 500")
+    parser.add_argument("--search-error-rate", type=float, default=0.0, help="Fraction of searches answered with HTTP 500")
+    parser.add_argument("--llm-rate-limit", type=float, default=0, help="LLM requests per second before HTTP 429 (0 = unlimited)")
+    parser.add_argument("--search-rate-limit", type=float, default=0, help="Searches per second before HTTP 429 (0 = unlimited)")
+    parser.add_argument("--retry-delay", type=float, default=0.1, help="Router backoff after a rate limit (production: 5s)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and error injection")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Fail when latency grows or throughput drops by more than this fraction")
+    parser.add_argument("--cache", action="store_true",
+                        help="Use the research cache and the local source store (off: every request does the full work)")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the temporary working directory")
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"Unknown mode '{mode}'")
+
+    args.json = os.path.abspath(args.json) if args.json else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+    original_cwd = os.getcwd()
+
+    llm = FakeLLMServer(args.llm_latency, args.llm_error_rate, args.llm_rate_limit, seed=args.seed).start()
+    search = FakeTavilyServer(args.search_latency, args.search_error_rate, args.search_rate_limit, seed=args.seed + 1).start()
+    os.environ.update({
+        "DEEPSEEK_API_KEY": "offline-benchmark", "GROQ_API_KEY": "offline-benchmark", "TAVILY_API_KEY": "offline-benchmark",
+        "DEEPSEEK_BASE_URL": llm.url, "GROQ_BASE_URL": llm.url, "TAVILY_BASE_URL": search.url,
+        "PMM_SOURCE_STORE": "1" if args.cache else "0"
+    })
+    workdir = prepare_workdir()
+    os.chdir(workdir)  # Fresh caches, stores and traces for this run
+    from prompt_manager import prompt_manager
+    prompt_manager.prompts_dir = workdir  # Not the caller's directory
+    prompt_manager.reload_prompts()
+    print(f"🧪 Fake LLM at {llm.url}, fake Tavily at {search.url}, workdir {workdir}")
+
+    results = {
+        "created": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "keep_workdir")},
+        "modes": {}
+    }
+    nonce = datetime.now().strftime("%H%M%S")
+    try:
+        for mode in modes:
+            print(f"🚀 Benchmarking {mode} ({args.requests} requests, concurrency {args.concurrency})...")
+            entry = run_mode(mode, args, llm, search, nonce)
+            results["modes"][mode] = entry
+            lat = entry["latency"]
+            print(f"✅ {mode}: p50 {lat['p50']:.3f}s  p95 {lat['p95']:.3f}s  p99 {lat['p99']:.3f}s  "
+                  f"{entry['throughput_rps']:.2f} req/s  {entry['llm_calls_per_request']} LLM calls/request  "
+                  f"{entry['errors']} errors")
+    finally:
+        llm.stop()
+        search.stop()
+        os.chdir(original_cwd)
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            for regression in regressions:
+                print(f"❌ Regression: {regression}")
+            sys.exit(1)
+        print("✅ No regressions beyond the allowed margin")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Background cache warming for the queries new users click first
+"""
+
+import argparse
+import contextlib
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import settings
+
+# Warms the report cache for the sidebar example queries and the concrete
+# queries in examples/query_templates.md (or PMM_WARM_QUERIES, separated by
+# "|"), for each prompt in PMM_WARM_PROMPTS (default: the app's default
+# prompt). Reports are generated one at a time, at most
+# PMM_WARM_RATE_PER_HOUR per hour, and only while no user request is running.
+# With PMM_WARM_INTERVAL_HOURS the pass repeats on that schedule, refreshing
+# reports that would expire before the next pass. Run a pass with
+# `python cache_warmer.py`, or set PMM_WARM_ON_STARTUP=1 to warm from the app.
+
+EXAMPLE_QUERIES = [
+    "Compare ClickUp and Asana's onboarding for technical users",
+    "What are the key trends in B2B SaaS pricing strategies?",
+    "How do Slack and Microsoft Teams approach enterprise sales?",
+    "What's the competitive landscape for project management tools?",
+    "Analyze the go-to-market strategies of Notion vs Airtable"
+]
+
+QUERY_TEMPLATES_PATH = "examples/query_templates.md"
+
+_active_requests = 0
+_active_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def user_request():
+    """Mark a user request in flight; the warmer waits until none are running"""
+    global _active_requests
+    with _active_lock:
+        _active_requests += 1
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active_requests -= 1
+
+
+def user_requests_in_flight() -> int:
+    with _active_lock:
+        return _active_requests
+
+
+def template_queries(path: str = QUERY_TEMPLATES_PATH) -> List[str]:
+    """Quoted queries from the templates file, skipping ones with [placeholders]"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return []
+    queries = re.findall(r'^\s*-\s*"([^"]+)"', text, re.MULTILINE)
+    return [query for query in queries if "[" not in query]
+
+
+def warm_queries() -> List[str]:
+    """PMM_WARM_QUERIES if set, else the example queries plus the concrete template queries"""
+    configured = settings.get("PMM_WARM_QUERIES", "")
+    if configured.strip():
+        queries = [query.strip() for query in configured.split("|")]
+    else:
+        queries = EXAMPLE_QUERIES + template_queries()
+    return list(dict.fromkeys(query for query in queries if query))
+
+
+def warm_prompts() -> List[str]:
+    """PMM_WARM_PROMPTS if set, else the prompt the app selects by default"""
+    configured = settings.get("PMM_WARM_PROMPTS", "")
+    if configured.strip():
+        return [name.strip() for name in configured.split(",") if name.strip()]
+    from prompt_manager import prompt_manager
+    return list(prompt_manager.get_available_prompts())[:1]
+
+
+def warm_rate_per_hour() -> float:
+    return float(settings.get("PMM_WARM_RATE_PER_HOUR", "12"))
+
+
+def warm_interval_hours() -> float:
+    return float(settings.get("PMM_WARM_INTERVAL_HOURS", "0"))
+
+
+class CacheWarmer:
+    """Precomputes reports for a list of queries and prompts at low priority"""
+
+    def __init__(self, queries: Optional[List[str]] = None, prompts: Optional[List[str]] = None,
+                 rate_per_hour: Optional[float] = None, interval_hours: Optional[float] = None):
+        self.queries = queries if queries is not None else warm_queries()
+        self.prompts = prompts if prompts is not None else warm_prompts()
+        self.rate_per_hour = rate_per_hour if rate_per_hour is not None else warm_rate_per_hour()
+        self.interval_hours = interval_hours if interval_hours is not None else warm_interval_hours()
+        self.stats: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def min_spacing(self) -> float:
+        """Seconds between generated reports allowed by the rate budget"""
+        return 3600 / self.rate_per_hour if self.rate_per_hour > 0 else 0.0
+
+    def refresh_ahead_hours(self) -> float:
+        """Cache TTL for warming lookups: reports expiring before the next pass count as stale"""
+        from research_cache import cache_ttl_hours
+        ttl = cache_ttl_hours()
+        return max(ttl - self.interval_hours, ttl / 2) if self.interval_hours else ttl
+
+    def _wait(self, seconds: float) -> bool:
+        """Sleep unless stopped; False once the warmer is stopped"""
+        return not self._stop.wait(seconds)
+
+    def _wait_for_idle(self) -> bool:
+        """Yield to user requests and to stale refreshes already running"""
+        from research_cache import research_cache
+        while user_requests_in_flight() or research_cache.refreshes_in_flight():
+            if not self._wait(1.0):
+                return False
+        return True
+
+    def warm_one(self, query: str, prompt_name: str) -> str:
+        """Serve one query from the cache or generate it; returns fresh, warmed or failed"""
+        from cli import run_query
+        result = run_query(query, prompt_name, cache_ttl_hours=self.refresh_ahead_hours())
+        if "error" in result:
+            print(f"⚠️ Cache warming failed for '{query[:50]}' ({prompt_name}): {result['error']}")
+            return "failed"
+        if result.get("cached") and not result.get("stale"):
+            return "fresh"
+        # Stale reports are regenerated by the cache's background refresh
+        return "warmed"
+
+    def run_pass(self) -> Dict[str, int]:
+        """Warm every query/prompt pair once within the rate budget"""
+        pairs = [(query, prompt_name) for prompt_name in self.prompts for query in self.queries]
+        budget = f"up to {self.rate_per_hour:g}/hour" if self.rate_per_hour > 0 else "no rate limit"
+        print(f"🔥 Warming {len(pairs)} reports ({len(self.queries)} queries x {len(self.prompts)} prompts, {budget})")
+        self.stats = {"fresh": 0, "warmed": 0, "failed": 0}
+        next_allowed = 0.0
+        for query, prompt_name in pairs:
+            if not self._wait(max(0.0, next_allowed - time.time())) or not self._wait_for_idle():
+                break
+            start = time.time()
+            try:
+                outcome = self.warm_one(query, prompt_name)
+            except Exception as e:
+                print(f"⚠️ Cache warming failed for '{query[:50]}' ({prompt_name}): {e}")
+                outcome = "failed"
+            self.stats[outcome] += 1
+            if outcome != "fresh":
+                # Only generated (or attempted) reports spend the rate budget
+                next_allowed = start + self.min_spacing
+                print(f"🔥 {outcome.capitalize()}: {query[:50]} ({prompt_name}) in {time.time() - start:.1f}s")
+        print(f"✅ Cache warming pass done: {self.stats['warmed']} warmed, {self.stats['fresh']} already fresh, "
+              f"{self.stats['failed']} failed")
+        return dict(self.stats)
+
+    def run(self):
+        """Warm once, then again every interval_hours if set, until stopped"""
+        while not self._stop.is_set():
+            self.run_pass()
+            if not self.interval_hours or not self._wait(self.interval_hours * 3600):
+                break
+
+    def start(self) -> threading.Thread:
+        """Run the warmer in a daemon thread (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="pmm-cache-warmer", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def start_from_settings() -> Optional[CacheWarmer]:
+    """Start a background warmer when PMM_WARM_ON_STARTUP is enabled"""
+    if settings.get("PMM_WARM_ON_STARTUP", "0").lower() not in ("1", "true", "yes"):
+        return None
+    warmer = CacheWarmer()
+    warmer.start()
+    return warmer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute cached reports for example and template queries")
+    parser.add_argument("--prompts", help="Comma-separated prompt versions (default: PMM_WARM_PROMPTS or the app default)")
+    parser.add_argument("--queries-file", help="File with one query per line (default: PMM_WARM_QUERIES or examples + templates)")
+    parser.add_argument("--rate", type=float, help="Max generated reports per hour (default: PMM_WARM_RATE_PER_HOUR or 12; 0 = unlimited)")
+    parser.add_argument("--interval-hours", type=float,
+                        help="Repeat the pass on this schedule (default: PMM_WARM_INTERVAL_HOURS; 0 = one pass)")
+    parser.add_argument("--list", action="store_true", help="Print the queries and prompts that would be warmed and exit")
+    args = parser.parse_args()
+
+    queries = None
+    if args.queries_file:
+        with open(args.queries_file, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    prompts = [name.strip() for name in args.prompts.split(",") if name.strip()] if args.prompts else None
+    warmer = CacheWarmer(queries, prompts, args.rate, args.interval_hours)
+
+    if args.list:
+        for prompt_name in warmer.prompts:
+            for query in warmer.queries:
+                print(f"{prompt_name}\t{query}")
+        return
+    try:
+        warmer.run()
+    except KeyboardInterrupt:
+        print("🛑 Cache warming stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import atexit
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+# Record-and-replay of DeepSeek/Groq/Tavily traffic for offline regression runs.
+#   PMM_CASSETTE_MODE=record  call the real APIs and append every request,
+#                             response (or error) and its latency to the cassette,
+#                             which is written on close() or at process exit
+#   PMM_CASSETTE_MODE=replay  serve responses from the cassette, sleeping for the
+#                             recorded latency times PMM_CASSETTE_LATENCY_SCALE
+#   PMM_CASSETTE=cassettes/default.json
+# Replay matches the exact request first. Unless PMM_CASSETTE_MATCH=exact it then
+# falls back to a recording of the same shape (service, model and static system
+# prompt, or search parameters), so pipeline changes such as dedup or
+# concurrency that alter the request stream still replay realistic responses.
+
+CASSETTE_VERSION = 1
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when no recorded interaction matches a request"""
+
+
+class RecordedError(Exception):
+    """An API error replayed from a cassette (message preserved, so rate limits retry)"""
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _to_plain(value: Any) -> Any:
+    """JSON-ready copy of an SDK response (pydantic models, namespaces, dicts)"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, SimpleNamespace):
+        value = vars(value)
+    if isinstance(value, dict):
+        return {k: _to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_plain(v) for v in value]
+    return value
+
+
+def _to_namespace(value: Any) -> Any:
+    """Attribute access over a recorded response (completion.choices[0].message.content)"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+def request_shape(service: str, request: Dict) -> str:
+    """Looser match key: what kind of call this is, ignoring per-request values"""
+    if service == "tavily":
+        return _digest([service, request.get("search_depth"), request.get("max_results"), request.get("include_domains")])
+    messages = request.get("messages") or []
+    system = messages[0].get("content", "") if messages and messages[0].get("role") == "system" else ""
+    return _digest([service, request.get("model"), system, request.get("response_format")])
+
+
+class Cassette:
+    """Recorded API interactions in a JSON file.
+
+    Recorded interactions are kept in memory and written once by `close()`
+    (also on leaving a `with` block and at process exit).
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 1.0, exact: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.exact = exact
+        self.interactions: List[Dict] = []
+        self._lock = threading.Lock()
+        self._next: Dict[str, int] = {}
+        self._dirty = False
+        self.stats = {"recorded": 0, "replayed": 0, "shape_matches": 0, "misses": 0}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.interactions = json.load(f).get("interactions", [])
+        elif mode == "replay":
+            raise FileNotFoundError(f"Cassette not found: {path}")
+        if mode == "record":
+            atexit.register(self.close)
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def services(self) -> List[str]:
+        return sorted({i["service"] for i in self.interactions})
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": CASSETTE_VERSION, "saved_at": datetime.now().isoformat(),
+                       "interactions": self.interactions}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        """Write interactions recorded since the last save"""
+        with self._lock:
+            if self._dirty:
+                self.save()
+                self._dirty = False
+
+    def record(self, service: str, request: Dict, response: Any = None,
+               error: Optional[BaseException] = None, seconds: float = 0.0):
+        interaction = {
+            "service": service,
+            "key": _digest([service, request]),
+            "shape": request_shape(service, request),
+            "request": request,
+            "seconds": round(seconds, 4),
+            "recorded_at": datetime.now().isoformat()
+        }
+        if error is not None:
+            interaction["error"] = {"type": type(error).__name__, "message": str(error)}
+        else:
+            interaction["response"] = _to_plain(response)
+        with self._lock:
+            self.interactions.append(interaction)
+            self.stats["recorded"] += 1
+            self._dirty = True
+
+    def _take(self, field: str, value: str) -> Optional[Dict]:
+        """Next matching interaction, cycling when a request repeats more often than recorded"""
+        matches = [i for i in self.interactions if i[field] == value]
+        if not matches:
+            return None
+        position = self._next.get(f"{field}:{value}", 0)
+        self._next[f"{field}:{value}"] = position + 1
+        return matches[position % len(matches)]
+
+    def match(self, service: str, request: Dict) -> Dict:
+        with self._lock:
+            interaction = self._take("key", _digest([service, request]))
+            if interaction is None and not self.exact:
+                interaction = self._take("shape", request_shape(service, request))
+                if interaction is not None:
+                    self.stats["shape_matches"] += 1
+            if interaction is None:
+                self.stats["misses"] += 1
+                raise CassetteMiss(f"No recorded {service} interaction matches this request ({self.path})")
+            self.stats["replayed"] += 1
+        return interaction
+
+    def call(self, service: str, request: Dict, real_call) -> Any:
+        """Run a request through the cassette: record the real call, or replay it"""
+        if self.mode == "record":
+            started = time.perf_counter()
+            try:
+                response = real_call()
+            except Exception as e:
+                self.record(service, request, error=e, seconds=time.perf_counter() - started)
+                raise
+            self.record(service, request, response, seconds=time.perf_counter() - started)
+            return response
+
+        interaction = self.match(service, request)
+        if self.latency_scale > 0:
+            time.sleep(interaction["seconds"] * self.latency_scale)
+        if "error" in interaction:
+            raise RecordedError(interaction["error"]["message"])
+        return copy.deepcopy(interaction["response"])
+
+
+class CassetteChatClient:
+    """OpenAI-style client (client.chat.completions.create) routed through a cassette"""
+
+    def __init__(self, cassette: Cassette, service: str, client: Any = None):
+        self.cassette = cassette
+        self.service = service
+        self.client = client
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        real_call = (lambda: self.client.chat.completions.create(**kwargs)) if self.client else None
+        response = self.cassette.call(self.service, kwargs, real_call)
+        return _to_namespace(response) if self.cassette.mode == "replay" else response
+
+
+class CassetteSearchClient:
+    """Tavily-style client (client.search) routed through a cassette"""
+
+    def __init__(self, cassette: Cassette, client: Any = None):
+        self.cassette = cassette
+        self.client = client
+
+    def search(self, **kwargs) -> Dict:
+        real_call = (lambda: self.client.search(**kwargs)) if self.client else None
+        return self.cassette.call("tavily", kwargs, real_call)
+
+
+def cassette_mode() -> str:
+    mode = (settings.get("PMM_CASSETTE_MODE") or "off").lower()
+    if mode not in MODES:
+        raise ValueError(f"PMM_CASSETTE_MODE must be one of {', '.join(MODES)}, got '{mode}'")
+    return mode
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def active_cassette() -> Optional[Cassette]:
+    """Process-wide cassette from settings, or None when record/replay is off"""
+    global _cassette
+    mode = cassette_mode()
+    if mode == "off":
+        return None
+    with _cassette_lock:
+        if _cassette is None or _cassette.mode != mode:
+            if _cassette is not None:
+                _cassette.close()
+            _cassette = Cassette(
+                settings.get("PMM_CASSETTE", os.path.join("cassettes", "default.json")),
+                mode,
+                latency_scale=float(settings.get("PMM_CASSETTE_LATENCY_SCALE", "1.0")),
+                exact=settings.get("PMM_CASSETTE_MATCH", "shape") == "exact"
+            )
+            print(f"📼 Cassette {mode} mode: {_cassette.path} ({len(_cassette.interactions)} interactions)")
+        return _cassette
+
+
+def wrap_llm_client(client: Any, service: str) -> Any:
+    """Route an LLM client through the active cassette.
+
+    In replay mode a client is provided even without an API key, as long as
+    the cassette holds interactions for the service.
+    """
+    cassette = active_cassette()
+    if cassette is None:
+        return client
+    if cassette.mode == "record":
+        return CassetteChatClient(cassette, service, client) if client else None
+    return CassetteChatClient(cassette, service) if service in cassette.services() else None
+
+
+def wrap_search_client(client: Any) -> Any:
+    """Route a Tavily client through the active cassette"""
+    cassette = active_cassette()
+    if cassette is None:
+        return client
+    if cassette.mode == "record":
+        return CassetteSearchClient(cassette, client) if client else None
+    return CassetteSearchClient(cassette) if "tavily" in cassette.services() else None
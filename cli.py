@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Command-line entry point for PMM research reports
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+
+def run_query(query: str, prompt_name: str, profile: bool = None, **options) -> dict:
+    """Route a query to the same research path the Streamlit app uses (options: cache settings)"""
+    from prompt_manager import prompt_manager
+    if prompt_manager.is_staged(prompt_name):
+        from advanced_research import advanced_researcher
+        return advanced_researcher.run_advanced_research(query, prompt_name, profile=profile, **options)
+
+    from deep_research import research_agent
+    return research_agent.generate_research_report(query, prompt_name, profile=profile, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a PMM research report")
+    parser.add_argument("query", help="Research question")
+    parser.add_argument("--prompt", default="testprompt1", help="Prompt version (testprompt1, testprompt3, testprompt4, ...)")
+    parser.add_argument("--output", help="Write the markdown report to this file instead of stdout")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="Save a CPU profile and memory snapshot of this request (also PMM_PROFILE=1)")
+    args = parser.parse_args()
+
+    result = run_query(args.query, args.prompt, profile=args.profile)
+    if "error" in result:
+        print(f"❌ Research failed: {result['error']}", file=sys.stderr)
+        sys.exit(1)
+    if result.get("profiled"):
+        from profiling import profile_dir
+        print(f"🔬 Profile files: {profile_dir()}/{result['run_id']}.research.*", file=sys.stderr)
+
+    report = f"""# PMM Research Report
+
+**Query:** {result['query']}
+**Generated:** {result.get('timestamp', datetime.now().isoformat())}
+**Model:** {result.get('model', 'Unknown')}
+
+{result['content']}
+"""
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+        print(f"✅ Report saved to: {args.output}")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
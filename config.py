@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+# Optional dotenv import
+try:
+    from dotenv import dotenv_values
+    DOTENV_AVAILABLE = True
+except ImportError:
+    DOTENV_AVAILABLE = False
+    dotenv_values = None
+
+
+class EnvSource:
+    """Settings from the process environment"""
+
+    name = "env"
+
+    def get(self, key: str) -> Optional[str]:
+        return os.environ.get(key)
+
+
+class DotenvSource:
+    """Settings from a .env file, parsed once without modifying os.environ"""
+
+    name = "dotenv"
+
+    def __init__(self, path: str = ".env"):
+        self.path = path
+        self._values: Optional[Dict[str, Optional[str]]] = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        if self._values is None:
+            with self._lock:
+                if self._values is None:
+                    self._values = dict(dotenv_values(self.path)) if DOTENV_AVAILABLE and os.path.exists(self.path) else {}
+        return self._values.get(key)
+
+
+class StreamlitSecretsSource:
+    """Settings from st.secrets, consulted only when Streamlit is already imported.
+
+    Checking sys.modules instead of importing keeps headless workers, tests and
+    the CLI from paying Streamlit's import time and memory.
+    """
+
+    name = "streamlit_secrets"
+
+    def get(self, key: str) -> Optional[str]:
+        streamlit = sys.modules.get("streamlit")
+        if streamlit is None:
+            return None
+        try:
+            value = streamlit.secrets.get(key)
+        except Exception:
+            return None  # No secrets.toml, or not running inside a Streamlit app
+        return str(value) if value is not None else None
+
+
+class Settings:
+    """Layered configuration lookup; the first source with a value wins.
+
+    Default order matches the previous behaviour: Streamlit secrets (when
+    running in the app), then the environment, then the .env file.
+    """
+
+    def __init__(self, sources: Optional[List[Any]] = None):
+        self.sources = sources if sources is not None else [StreamlitSecretsSource(), EnvSource(), DotenvSource()]
+
+    def add_source(self, source: Any, first: bool = False):
+        """Register another source (any object with a get(key) method)"""
+        if first:
+            self.sources.insert(0, source)
+        else:
+            self.sources.append(source)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Value of `key` from the first source that defines it"""
+        for source in self.sources:
+            value = source.get(key)
+            if value not in (None, ""):
+                return value
+        return default
+
+    def source_of(self, key: str) -> Optional[str]:
+        """Name of the source that provides `key` (for diagnostics)"""
+        for source in self.sources:
+            if source.get(key) not in (None, ""):
+                return getattr(source, "name", type(source).__name__)
+        return None
+
+
+# Global settings instance
+settings = Settings()
@@ -0,0 +1,239 @@
+import json
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+from metrics import search_with_metrics
+from tracing import span
+from prompt_manager import prompt_manager
+from prompt_layout import cache_friendly_enabled
+from research_cache import STALE, research_cache, source_fingerprint
+
+# Optional tiktoken import (falls back to a character-based estimate)
+try:
+    import tiktoken
+    _ENCODER = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODER = None
+
+DATA_DRIVEN_DOMAINS = [
+    "g2.com", "capterra.com", "trustradius.com",
+    "producthunt.com", "techcrunch.com", "venturebeat.com",
+    "linkedin.com", "medium.com", "forbes.com",
+    "bloomberg.com", "reuters.com", "wsj.com"
+]
+
+# pretty: the original indent=2 JSON with a per-result annotation
+# minified: compact JSON, numbered results, annotation stated once
+# tsv: one tab-separated row per numbered result
+PAYLOAD_ENCODINGS = ("pretty", "minified", "tsv")
+
+REFERENCE_INSTRUCTION = (
+    "All results are web search results. Each result has a numeric id; cite sources "
+    "inline as [id] (e.g., [3]) instead of repeating URLs."
+)
+
+_REFERENCE_RE = re.compile(r"\[(\d{1,2})\](?!\()")
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count via tiktoken when installed, else ~4 characters per token"""
+    if _ENCODER is not None:
+        return len(_ENCODER.encode(text))
+    return max(1, len(text) // 4)
+
+
+def build_results_data(sources: List[Dict], snippet_chars: int = 300) -> List[Dict]:
+    """Normalize Tavily results into numbered title/url/snippet/date records"""
+    results = []
+    for i, source in enumerate(sources, 1):
+        content = source.get('content', '') or ''
+        results.append({
+            "id": i,
+            "title": source.get('title', 'Unknown'),
+            "url": source.get('url', 'N/A'),
+            "snippet": content[:snippet_chars] + "..." if len(content) > snippet_chars else content,
+            "date": source.get('published_date', 'Unknown')
+        })
+    return results
+
+
+def _tsv_field(value) -> str:
+    return str(value).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+
+
+def encode_payload(query: str, results: List[Dict], encoding: str = "minified") -> str:
+    """Render the data-driven input payload in the selected encoding"""
+    if encoding == "pretty":
+        legacy = [{
+            "title": r["title"],
+            "url": r["url"],
+            "snippet": r["snippet"],
+            "date": r["date"],
+            "annotation": "Web search result"
+        } for r in results]
+        payload = {"query": query, "num_results": len(legacy), "results": legacy}
+        return f"**Input JSON Schema:**\n```json\n{json.dumps(payload, indent=2)}\n```"
+
+    if encoding == "tsv":
+        rows = ["id\ttitle\tdate\turl\tsnippet"]
+        rows.extend("\t".join(_tsv_field(r[k]) for k in ("id", "title", "date", "url", "snippet")) for r in results)
+        table = "\n".join(rows)
+        return f"**Query:** {query}\n\n**Input results (TSV):**\n```tsv\n{table}\n```"
+
+    if encoding == "minified":
+        payload = {"query": query, "results": results}
+        compact = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        return f"**Input JSON:**\n```json\n{compact}\n```"
+
+    raise ValueError(f"Unknown payload encoding '{encoding}', expected one of {PAYLOAD_ENCODINGS}")
+
+
+def payload_instructions(encoding: str) -> str:
+    """Static instructions that go with an encoding (part of the cacheable prefix)"""
+    return "" if encoding == "pretty" else REFERENCE_INSTRUCTION
+
+
+def payload_stats(query: str, results: List[Dict], payload: str, encoding: str) -> Dict:
+    """Measured token savings of the chosen encoding against the pretty baseline"""
+    tokens = estimate_tokens(payload)
+    baseline = tokens if encoding == "pretty" else estimate_tokens(encode_payload(query, results, "pretty"))
+    return {
+        "encoding": encoding,
+        "payload_tokens": tokens,
+        "baseline_tokens": baseline,
+        "tokens_saved": baseline - tokens,
+        "savings_pct": round(100 * (baseline - tokens) / baseline, 1) if baseline else 0.0,
+        "token_counter": "tiktoken" if _ENCODER is not None else "estimate"
+    }
+
+
+def expand_citations(content: str, results: List[Dict]) -> str:
+    """Turn [id] references in the report into links to the numbered sources"""
+    urls = {r["id"]: r["url"] for r in results}
+
+    def link(match):
+        ref = int(match.group(1))
+        return f"[[{ref}]]({urls[ref]})" if ref in urls else match.group(0)
+
+    return _REFERENCE_RE.sub(link, content)
+
+
+def search_data_driven_sources(tavily_client, query: str) -> List[Dict]:
+    """Broad Tavily search used by the data-driven (testprompt4) report"""
+    print("🔍 Gathering web sources via Tavily...")
+    search_result = search_with_metrics(
+        tavily_client.search,
+        query=query,
+        search_depth="advanced",
+        max_results=10,  # More results for data-driven analysis
+        include_domains=DATA_DRIVEN_DOMAINS
+    )
+    sources = search_result.get("results", [])
+    print(f"✅ Found {len(sources)} web sources")
+    return sources
+
+
+def data_driven_namespace(encoding: Optional[str] = None) -> str:
+    encoding = encoding or settings.get("PMM_PAYLOAD_ENCODING", "minified")
+    # Versioned by prompt content so edits to testprompt4 invalidate old reports
+    return f"testprompt4:{encoding}:{prompt_manager.prompt_version('testprompt4')}"
+
+
+def generate_data_driven_report(router, tavily_client, query: str, encoding: Optional[str] = None,
+                                on_sources: Optional[Callable[[List[Dict]], None]] = None,
+                                use_cache: bool = True, max_age_hours: Optional[float] = None,
+                                refresh: bool = False, revalidate: Optional[Callable] = None) -> Dict:
+    """Data-driven report shared by the basic and advanced research agents.
+
+    Searches once, encodes the results compactly (PMM_PAYLOAD_ENCODING, default
+    minified), runs the data_driven router stage and caches the report per
+    query, encoding and prompt version. A stale cached report is returned as is
+    when `revalidate` is given, which is then run in the background to refresh
+    it; `refresh` skips the cache read and overwrites the entry. Before the LLM
+    call, a cached report generated from the same sources has its TTL extended
+    and is returned instead.
+    """
+    encoding = encoding or settings.get("PMM_PAYLOAD_ENCODING", "minified")
+    namespace = data_driven_namespace(encoding)
+    if use_cache and not refresh:
+        cached, state = research_cache.lookup(query, namespace, max_age_hours, grace_hours=None if revalidate else 0)
+        if cached:
+            cached["cached"] = True
+            if state == STALE:
+                cached["stale"] = True
+                research_cache.revalidate(query, namespace, revalidate)
+            return cached
+
+    print(f"📊 Starting data-driven research for: {query}")
+    sources = []
+    if tavily_client is not None:
+        try:
+            sources = search_data_driven_sources(tavily_client, query)
+            if on_sources:
+                on_sources(sources)
+        except Exception as e:
+            print(f"⚠️ Tavily search failed: {e}")
+            sources = []
+
+    # Same evidence as the cached report: keep it instead of calling the LLM again
+    fingerprint = source_fingerprint(sources)
+    if use_cache:
+        unchanged = research_cache.extend_if_unchanged(query, namespace, fingerprint)
+        if unchanged:
+            unchanged["cached"] = True
+            return unchanged
+
+    with span("data_driven.payload", encoding=encoding) as payload_span:
+        results = build_results_data(sources)
+        payload = encode_payload(query, results, encoding)
+        stats = payload_stats(query, results, payload, encoding)
+        payload_span.set_attributes({
+            "results": len(results),
+            "payload_tokens": stats["payload_tokens"],
+            "bytes": len(payload.encode("utf-8"))
+        })
+    print(f"🧾 Payload: {stats['payload_tokens']} tokens ({encoding}, {stats['savings_pct']}% saved vs pretty JSON)")
+
+    prompt4_content = prompt_manager.get_prompt("testprompt4")
+    instructions = payload_instructions(encoding)
+    if cache_friendly_enabled():
+        # Prompt and encoding instructions form a static prefix; only the payload varies
+        static = "\n\n".join(part for part in (prompt4_content, instructions) if part)
+        messages = [
+            {"role": "system", "content": static},
+            {"role": "user", "content": payload}
+        ]
+    else:
+        full_prompt = "\n\n".join(part for part in (prompt4_content, instructions, payload) if part)
+        messages = [{"role": "user", "content": full_prompt}]
+
+    try:
+        completion = router.complete("data_driven", messages)
+        content = completion["content"]
+        if encoding != "pretty":
+            content = expand_citations(content, results)
+        model = completion["label"]
+    except Exception as e:
+        print(f"⚠️ Data-driven research failed: {str(e)}")
+        return {
+            "error": f"Data-driven research failed: {str(e)}",
+            "query": query,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    report = {
+        "query": query,
+        "content": content,
+        "timestamp": datetime.now().isoformat(),
+        "model": model,
+        "total_sources": len(sources),
+        "research_type": "data_driven",
+        "prompt_used": "testprompt4",
+        "payload_encoding": stats,
+        "cached": False
+    }
+    if use_cache:
+        research_cache.set(query, report, namespace, fingerprint)
+    return report
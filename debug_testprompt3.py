@@ -114,4 +114,4 @@ async def debug_testprompt3():
         return None
 
 if __name__ == "__main__":
-    asyncio.run(debug_testprompt3()) 
\ No newline at end of file
+    advanced_researcher.loop.run(debug_testprompt3()) 
\ No newline at end of file
@@ -1,14 +1,21 @@
-import os
-import hashlib
-import sqlite3
 import json
+import threading
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import groq
-import streamlit as st
-from dotenv import load_dotenv
+from config import settings
 from prompt_manager import prompt_manager
+from source_store import source_store
+from report_archive import report_archive
+from metrics import record_research, search_with_metrics
+from tracing import span
+from profiling import profile_run
+from cassettes import wrap_llm_client, wrap_search_client
+from llm_router import LLMRouter, summarize_calls, track_calls
+from research_cache import STALE, research_cache, source_fingerprint
+from data_driven import generate_data_driven_report
+from prompt_layout import cache_friendly_enabled, static_messages
 
 # Optional DeepSeek import
 try:
@@ -26,8 +33,12 @@ except ImportError:
     TAVILY_AVAILABLE = False
     TavilyClient = None
 
-# Load environment variables
-load_dotenv()
+
+BASIC_INSTRUCTIONS = (
+    "Research and analyze the query given at the end of this request. When web sources are "
+    "provided, use them to enhance your analysis. Provide a comprehensive PMM-focused analysis "
+    "with the exact structure specified above."
+)
 
 # --- Modular agent functions ---
 def trends_agent(query: str) -> str:
@@ -54,14 +65,14 @@ class PMMResearchAgent:
         if DEEPSEEK_AVAILABLE:
             deepseek_api_key = self._get_api_key("DEEPSEEK_API_KEY")
             if deepseek_api_key:
-                self.deepseek_client = OpenAI(api_key=deepseek_api_key, base_url="https://api.deepseek.com")
+                self.deepseek_client = OpenAI(api_key=deepseek_api_key, base_url=settings.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com"))
                 self.deepseek_enabled = True
                 print("✅ DeepSeek initialized as primary backend")
         
         # Initialize Groq as secondary
         groq_api_key = self._get_api_key("GROQ_API_KEY")
         if groq_api_key:
-            self.groq_client = groq.Groq(api_key=groq_api_key)
+            self.groq_client = groq.Groq(api_key=groq_api_key, base_url=settings.get("GROQ_BASE_URL"))
             print("✅ Groq initialized as secondary backend")
         else:
             self.groq_client = None
@@ -70,7 +81,9 @@ class PMMResearchAgent:
         # Initialize Tavily client
         tavily_api_key = self._get_api_key("TAVILY_API_KEY")
         if tavily_api_key and TAVILY_AVAILABLE:
-            self.tavily_client = TavilyClient(api_key=tavily_api_key)
+            # TAVILY_BASE_URL points search at a compatible server (e.g. the offline benchmark)
+            tavily_base_url = settings.get("TAVILY_BASE_URL")
+            self.tavily_client = TavilyClient(api_key=tavily_api_key, **({"api_base_url": tavily_base_url} if tavily_base_url else {}))
             self.tavily_enabled = True
             print("✅ Tavily initialized for web search")
         else:
@@ -78,77 +91,58 @@ class PMMResearchAgent:
             self.tavily_enabled = False
             print("⚠️ Tavily API key not found or package not available")
         
+        # Record or replay API traffic (PMM_CASSETTE_MODE)
+        self.deepseek_client = wrap_llm_client(self.deepseek_client, "deepseek")
+        self.groq_client = wrap_llm_client(self.groq_client, "groq")
+        self.tavily_client = wrap_search_client(self.tavily_client)
+        self.deepseek_enabled = self.deepseek_client is not None
+        self.tavily_enabled = self.tavily_client is not None
+        
         if not self.deepseek_enabled and not self.groq_client:
             raise ValueError("No API keys found for DeepSeek or Groq")
         
-        self.cache_db = "pmm_research_cache.db"
+        # Per-stage model tiers with fallback chains
+        self.router = LLMRouter(self.deepseek_client, self.groq_client)
+        
+        self.cache_db = research_cache.db_path
         self.init_cache()
     
     def _get_api_key(self, key_name: str) -> Optional[str]:
-        """Get API key from Streamlit secrets or environment"""
-        try:
-            return st.secrets.get(key_name)
-        except:
-            pass
-        return os.getenv(key_name)
+        """Get API key from Streamlit secrets, environment or .env"""
+        return settings.get(key_name)
         
     def init_cache(self):
         """Initialize SQLite cache database"""
-        conn = sqlite3.connect(self.cache_db)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS research_cache (
-                query_hash TEXT PRIMARY KEY,
-                response TEXT,
-                timestamp DATETIME,
-                model_used TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        research_cache.init_tables()
     
-    def get_cache_key(self, query: str) -> str:
+    def get_cache_key(self, query: str, namespace: str = "") -> str:
         """Generate hash-based cache key for query"""
-        return hashlib.md5(query.encode()).hexdigest()
+        return research_cache.get_cache_key(query, namespace)
     
-    def get_cached_response(self, query: str) -> Optional[Dict]:
+    def get_cached_response(self, query: str, namespace: str = "") -> Optional[Dict]:
         """Retrieve cached response if available and not expired"""
-        cache_key = self.get_cache_key(query)
-        conn = sqlite3.connect(self.cache_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT response, timestamp FROM research_cache 
-            WHERE query_hash = ? AND timestamp > datetime('now', '-24 hours')
-        ''', (cache_key,))
-        
-        result = cursor.fetchone()
-        conn.close()
-        
-        if result:
-            return json.loads(result[0])
-        return None
+        return research_cache.get(query, namespace)
     
-    def cache_response(self, query: str, response: Dict):
-        """Cache the response with timestamp"""
-        cache_key = self.get_cache_key(query)
-        conn = sqlite3.connect(self.cache_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO research_cache (query_hash, response, timestamp, model_used)
-            VALUES (?, ?, datetime('now'), ?)
-        ''', (cache_key, json.dumps(response), "groq-compound-beta"))
-        
-        conn.commit()
-        conn.close()
+    def cache_response(self, query: str, response: Dict, namespace: str = "", fingerprint: Optional[str] = None):
+        """Cache the response with timestamp and source fingerprint"""
+        research_cache.set(query, response, namespace, fingerprint)
+    
+    def _store_sources(self, sources: List[Dict]):
+        """Add search results to the local source store for later reuse"""
+        if settings.get("PMM_SOURCE_STORE", "1") == "0":
+            return
+        try:
+            source_store.ingest(sources)
+        except Exception as e:
+            print(f"⚠️ Failed to store sources locally: {e}")
     
     def get_web_sources(self, query: str) -> List[Dict]:
         """Get web sources using Tavily if available"""
         sources = []
         if self.tavily_enabled:
             try:
-                search_result = self.tavily_client.search(
+                search_result = search_with_metrics(
+                    self.tavily_client.search,
                     query=query,
                     search_depth="advanced",
                     max_results=5,
@@ -160,21 +154,69 @@ class PMMResearchAgent:
                 )
                 sources = search_result.get("results", [])
                 print(f"🔍 Found {len(sources)} web sources via Tavily")
+                self._store_sources(sources)
             except Exception as e:
                 print(f"Tavily search failed: {e}")
         return sources
     
-    def generate_research_report(self, query: str, prompt_name: str = "default", use_web_search: bool = True) -> Dict:
-        """Generate structured research report using DeepSeek (primary) or Groq (secondary)"""
+    def generate_research_report(self, query: str, prompt_name: str = "default", use_web_search: bool = True,
+                                 profile: Optional[bool] = None, use_cache: bool = True,
+                                 cache_ttl_hours: Optional[float] = None, refresh: bool = False) -> Dict:
+        """Generate structured research report using DeepSeek (primary) or Groq (secondary)
+
+        Each run is traced; the trace id is returned as `run_id`. With `profile`
+        (or PMM_PROFILE=1) a CPU profile and memory snapshot are saved under that id.
+        `use_cache=False` always generates a fresh report and leaves the cache untouched.
+        Cached reports older than `cache_ttl_hours` (default PMM_CACHE_TTL_HOURS) are
+        served with `stale=True` during the grace window while a background run with
+        `refresh=True` regenerates them. When a report would be regenerated but the web
+        search returns the same sources as the cached one, its TTL is extended instead.
+        """
+        start_time = time.time()
+        mode = "data_driven" if prompt_name == "testprompt4" else "basic"
+        with span("research.report", mode=mode, prompt=prompt_name, query=query) as run_span, \
+                profile_run(run_span.trace_id, profile) as run_profile:
+            with track_calls() as calls:
+                result = self._generate_research_report(query, prompt_name, use_web_search, use_cache,
+                                                        cache_ttl_hours, refresh)
+            record_research(mode, prompt_name, result, time.time() - start_time)
+            result["run_id"] = run_span.trace_id
+            result["profiled"] = run_profile is not None
+            run_span.set_attribute("cached", bool(result.get("cached")))
+            if "error" in result:
+                run_span.set_attribute("error", result["error"])
+            if calls and "error" not in result:
+                result["llm_calls"] = calls
+                result["llm_usage"] = summarize_calls(calls)
+            if not result.get("cached") and "error" not in result:
+                try:
+                    with span("report.archive"):
+                        report_archive.archive(result, prompt_name)
+                except Exception as e:
+                    print(f"⚠️ Failed to archive report: {e}")
+        return result
+    
+    def _generate_research_report(self, query: str, prompt_name: str, use_web_search: bool, use_cache: bool = True,
+                                  cache_ttl_hours: Optional[float] = None, refresh: bool = False) -> Dict:
+        # Background refresh of this report with the same options
+        def revalidate():
+            return self.generate_research_report(query, prompt_name, use_web_search,
+                                                 cache_ttl_hours=cache_ttl_hours, refresh=True)
         
         # Special handling for testprompt4 (data-driven approach)
         if prompt_name == "testprompt4":
-            return self._generate_data_driven_report(query)
+            return self._generate_data_driven_report(query, use_cache, cache_ttl_hours, refresh, revalidate)
         
-        # Check cache first
-        cached = self.get_cached_response(query)
-        if cached:
-            return cached
+        # Check cache first (keyed per prompt and prompt version); stale reports are served while refreshing
+        cache_namespace = f"{prompt_name}:{prompt_manager.prompt_version(prompt_name)}"
+        if use_cache and not refresh:
+            cached, state = research_cache.lookup(query, cache_namespace, cache_ttl_hours)
+            if cached:
+                cached["cached"] = True
+                if state == STALE:
+                    cached["stale"] = True
+                    research_cache.revalidate(query, cache_namespace, revalidate)
+                return cached
         
         # Get web sources if enabled
         sources = []
@@ -187,253 +229,96 @@ class PMMResearchAgent:
                 summary += f"Content: {source.get('content', '')[:200]}...\n"
                 source_summaries.append(summary)
         
+        # Same evidence as the cached report: keep it instead of calling the LLM again
+        fingerprint = source_fingerprint(sources)
+        if use_cache:
+            unchanged = research_cache.extend_if_unchanged(query, cache_namespace, fingerprint)
+            if unchanged:
+                unchanged["cached"] = True
+                return unchanged
+        
         # Get prompt from manager
         system_prompt = prompt_manager.get_prompt(prompt_name)
         
-        # Enhance user prompt with web sources if available
-        if source_summaries:
-            user_prompt = f"""Please research and analyze: {query}
+        if cache_friendly_enabled():
+            # Static instructions first so repeated requests share a cacheable prefix
+            variables = [("<user query>", "Research query", query)]
+            if source_summaries:
+                variables.append(("<web sources>", "Web sources", chr(10).join(source_summaries)))
+            messages = static_messages(system_prompt, "", variables, BASIC_INSTRUCTIONS)
+        else:
+            # Enhance user prompt with web sources if available
+            if source_summaries:
+                user_prompt = f"""Please research and analyze: {query}
 
 Use the following web sources to enhance your analysis:
 {chr(10).join(source_summaries)}
 
 Provide a comprehensive PMM-focused analysis with the exact structure specified above."""
-        else:
-            user_prompt = f"Please research and analyze: {query}\nProvide a comprehensive PMM-focused analysis with the exact structure specified above."
+            else:
+                user_prompt = f"Please research and analyze: {query}\nProvide a comprehensive PMM-focused analysis with the exact structure specified above."
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
 
-        # Try DeepSeek first (primary)
-        if self.deepseek_enabled:
-            try:
-                print("🔍 Using DeepSeek (primary) for research...")
-                completion = self.deepseek_client.chat.completions.create(
-                    model="deepseek-reasoner",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.7,
-                    # Let LLM decide appropriate length
-                    stream=False
-                )
-                
-                response_content = completion.choices[0].message.content
-                
-                # Structure the response
-                response = {
-                    "query": query,
-                    "timestamp": datetime.now().isoformat(),
-                    "content": response_content,
-                    "model": "deepseek-reasoner",
-                    "backend": "deepseek",
-                    "cached": False,
-                    "sources_used": len(sources),
-                    "tavily_enabled": self.tavily_enabled
-                }
-                
-                # Cache the response
-                self.cache_response(query, response)
-                
-                return response
-                
-            except Exception as e:
-                print(f"⚠️ DeepSeek failed: {str(e)}")
-                if self.groq_client:
-                    print("🔄 Falling back to Groq...")
-                else:
-                    return {
-                        "error": f"DeepSeek failed and no Groq fallback available: {str(e)}",
-                        "query": query,
-                        "timestamp": datetime.now().isoformat()
-                    }
-        
-        # Fallback to Groq (secondary)
-        if self.groq_client:
-            try:
-                print("🔍 Using Groq (secondary) for research...")
-                # Add retry logic for rate limiting
-                max_retries = 3
-                retry_delay = 5  # Start with 5 seconds
-                
-                for attempt in range(max_retries):
-                    try:
-                        completion = self.groq_client.chat.completions.create(
-                            model="compound-beta",
-                            messages=[
-                                {"role": "system", "content": system_prompt},
-                                {"role": "user", "content": user_prompt}
-                            ],
-                            temperature=0.7,
-                            top_p=1,
-                            stream=False,
-                            stop=None
-                        )
-                        break  # Success, exit retry loop
-                        
-                    except Exception as e:
-                        if "rate_limit" in str(e).lower() and attempt < max_retries - 1:
-                            print(f"Rate limit hit, waiting {retry_delay} seconds...")
-                            time.sleep(retry_delay)
-                            retry_delay *= 2  # Exponential backoff
-                            continue
-                        else:
-                            raise e
-                
-                response_content = completion.choices[0].message.content
-                
-                # Structure the response
-                response = {
-                    "query": query,
-                    "timestamp": datetime.now().isoformat(),
-                    "content": response_content,
-                    "model": "groq-compound-beta",
-                    "backend": "groq",
-                    "cached": False,
-                    "sources_used": len(sources),
-                    "tavily_enabled": self.tavily_enabled
-                }
-                
-                # Cache the response
-                self.cache_response(query, response)
-                
-                return response
-                
-            except Exception as e:
-                return {
-                    "error": f"Both DeepSeek and Groq failed: {str(e)}",
-                    "query": query,
-                    "timestamp": datetime.now().isoformat()
-                }
-        
-        return {
-            "error": "No available backends (DeepSeek or Groq)",
-            "query": query,
-            "timestamp": datetime.now().isoformat()
-        }
-    
-    def _generate_data_driven_report(self, query: str) -> Dict:
-        """Generate data-driven report using testprompt4 approach"""
-        print(f"📊 Starting data-driven research for: {query}")
-        
-        # Get web sources using Tavily
-        sources = []
-        if self.tavily_enabled:
-            try:
-                print("🔍 Gathering web sources via Tavily...")
-                search_result = self.tavily_client.search(
-                    query=query,
-                    search_depth="advanced",
-                    max_results=10,  # More results for data-driven analysis
-                    include_domains=[
-                        "g2.com", "capterra.com", "trustradius.com",
-                        "producthunt.com", "techcrunch.com", "venturebeat.com",
-                        "linkedin.com", "medium.com", "forbes.com",
-                        "bloomberg.com", "reuters.com", "wsj.com"
-                    ]
-                )
-                sources = search_result.get("results", [])
-                print(f"✅ Found {len(sources)} web sources")
-            except Exception as e:
-                print(f"⚠️ Tavily search failed: {e}")
-                sources = []
-        
-        # Prepare JSON data for testprompt4
-        results_data = []
-        for source in sources:
-            results_data.append({
-                "title": source.get('title', 'Unknown'),
-                "url": source.get('url', 'N/A'),
-                "snippet": source.get('content', '')[:300] + "..." if len(source.get('content', '')) > 300 else source.get('content', ''),
-                "date": source.get('published_date', 'Unknown'),
-                "annotation": "Web search result"
-            })
+        try:
+            completion = self.router.complete("basic", messages)
+        except Exception as e:
+            return {
+                "error": f"All research backends failed: {str(e)}",
+                "query": query,
+                "timestamp": datetime.now().isoformat()
+            }
         
-        # Prepare the JSON input for testprompt4
-        json_input = {
+        # Structure the response
+        response = {
             "query": query,
-            "num_results": len(results_data),
-            "results": results_data
+            "timestamp": datetime.now().isoformat(),
+            "content": completion["content"],
+            "model": completion["label"],
+            "backend": completion["backend"],
+            "cached": False,
+            "sources_used": len(sources),
+            "tavily_enabled": self.tavily_enabled
         }
         
-        # Get testprompt4
-        prompt4_content = prompt_manager.get_prompt("testprompt4")
-        
-        # Create the full prompt with JSON data
-        full_prompt = f"{prompt4_content}\n\n**Input JSON Schema:**\n```json\n{json.dumps(json_input, indent=2)}\n```"
+        # Cache the response
+        if use_cache:
+            self.cache_response(query, response, cache_namespace, fingerprint)
         
-        # Try DeepSeek first (primary)
-        if self.deepseek_enabled:
-            try:
-                print("🔍 Using DeepSeek (primary) for data-driven analysis...")
-                completion = self.deepseek_client.chat.completions.create(
-                    model="deepseek-reasoner",
-                    messages=[
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    temperature=0.7,
-                    # Let LLM decide appropriate length
-                    stream=False
-                )
-                
-                content = completion.choices[0].message.content
-                
-            except Exception as e:
-                print(f"⚠️ DeepSeek failed in data-driven research: {str(e)}")
-                if self.groq_client:
-                    print("🔄 Falling back to Groq for data-driven research...")
-                    content = self._fallback_data_driven_research(full_prompt)
-                else:
-                    content = f"Research failed: {str(e)}"
-        
-        # Fallback to Groq (secondary)
-        elif self.groq_client:
-            content = self._fallback_data_driven_research(full_prompt)
-        else:
-            content = "No AI backend available for data-driven research"
-        
-        return {
-            "query": query,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "model": "deepseek-reasoner" if self.deepseek_enabled else "groq-compound-beta",
-            "total_sources": len(sources),
-            "research_type": "data_driven",
-            "prompt_used": "testprompt4"
-        }
+        return response
     
-    def _fallback_data_driven_research(self, full_prompt: str) -> str:
-        """Fallback method for data-driven research using Groq"""
-        try:
-            print("🔍 Using Groq (secondary) for data-driven analysis...")
-            # Add retry logic for rate limiting
-            max_retries = 3
-            retry_delay = 5
-            
-            for attempt in range(max_retries):
-                try:
-                    completion = self.groq_client.chat.completions.create(
-                        model="compound-beta",
-                        messages=[
-                            {"role": "user", "content": full_prompt}
-                        ],
-                        temperature=0.7,
-                        top_p=1,
-                        stream=False,
-                        stop=None
-                    )
-                    return completion.choices[0].message.content
-                    
-                except Exception as e:
-                    if "rate_limit" in str(e).lower() and attempt < max_retries - 1:
-                        print(f"Rate limit hit, waiting {retry_delay} seconds...")
-                        time.sleep(retry_delay)
-                        retry_delay *= 2
-                        continue
-                    else:
-                        raise e
-                        
-        except Exception as e:
-            print(f"⚠️ Groq failed in data-driven research: {str(e)}")
-            return f"Data-driven research failed: {str(e)}"
+    def _generate_data_driven_report(self, query: str, use_cache: bool = True, cache_ttl_hours: Optional[float] = None,
+                                     refresh: bool = False, revalidate=None) -> Dict:
+        """Generate data-driven report using testprompt4 approach"""
+        return generate_data_driven_report(
+            self.router,
+            self.tavily_client if self.tavily_enabled else None,
+            query,
+            on_sources=self._store_sources,
+            use_cache=use_cache,
+            max_age_hours=cache_ttl_hours,
+            refresh=refresh,
+            revalidate=revalidate
+        )
+
+# Export for use in Streamlit app. The agent is built on first use (not at
+# import) so importing this module does not create API clients or databases.
+_research_agent: Optional[PMMResearchAgent] = None
+_research_agent_lock = threading.Lock()
+
+def get_research_agent() -> PMMResearchAgent:
+    """Process-wide research agent, constructed once on first call"""
+    global _research_agent
+    if _research_agent is None:
+        with _research_agent_lock:
+            if _research_agent is None:
+                _research_agent = PMMResearchAgent()
+    return _research_agent
 
-# Export for use in Streamlit app
-research_agent = PMMResearchAgent() 
\ No newline at end of file
+def __getattr__(name: str):
+    # `from deep_research import research_agent` keeps working and builds the agent lazily
+    if name == "research_agent":
+        return get_research_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,174 @@
+import hashlib
+import sqlite3
+from typing import Dict, List, Optional
+
+from config import settings
+from sqlite_store import SQLiteStore
+
+# Online prompt experiments. A traffic split such as
+#   PMM_EXPERIMENT_SPLIT="testprompt1=50,testprompt3=30,testprompt4=20"
+# assigns each session a sticky prompt variant (weights need not sum to 100),
+# and every request served in experiment mode is logged with its latency,
+# token usage, fallbacks and cache hit so variants can be compared on the
+# Experiments page. PMM_EXPERIMENT names the experiment (default "prompt-ab").
+
+
+def parse_split(value: str) -> Dict[str, float]:
+    """Parse "variant=weight,variant=weight" into positive weights"""
+    split = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        variant, _, weight = entry.partition("=")
+        try:
+            split[variant.strip()] = float(weight) if weight.strip() else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid traffic split entry '{entry}', expected variant=weight")
+        if split[variant.strip()] < 0:
+            raise ValueError(f"Negative weight for variant '{variant.strip()}'")
+    if not split or not sum(split.values()):
+        raise ValueError("Traffic split needs at least one variant with a positive weight")
+    return split
+
+
+def experiment_name() -> str:
+    return settings.get("PMM_EXPERIMENT", "prompt-ab")
+
+
+def assign_variant(unit: str, split: Dict[str, float], experiment: Optional[str] = None) -> str:
+    """Deterministic weighted variant for a unit (session or user id)"""
+    experiment = experiment or experiment_name()
+    digest = hashlib.sha256(f"{experiment}:{unit}".encode("utf-8")).hexdigest()
+    point = int(digest[:15], 16) / 16 ** 15 * sum(split.values())
+    for variant, weight in split.items():
+        if point < weight:
+            return variant
+        point -= weight
+    return list(split)[-1]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class ExperimentLog(SQLiteStore):
+    """Per-request outcomes of prompt variants, stored next to the research cache"""
+
+    def __init__(self, db_path: str = "pmm_research_cache.db"):
+        super().__init__(db_path)
+
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Create the experiment runs table"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS experiment_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                experiment TEXT,
+                variant TEXT,
+                unit TEXT,
+                query TEXT,
+                seconds REAL,
+                llm_calls INTEGER,
+                prompt_tokens INTEGER,
+                cached_tokens INTEGER,
+                completion_tokens INTEGER,
+                fallbacks INTEGER,
+                cache_hit INTEGER,
+                error TEXT,
+                run_id TEXT,
+                created_at DATETIME
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS experiment_runs_experiment ON experiment_runs (experiment, created_at)
+        ''')
+
+    def record(self, experiment: str, variant: str, result: Dict, seconds: float, unit: str = "") -> int:
+        """Log one served request; tokens and fallbacks come from the report's LLM call records"""
+        usage = result.get("llm_usage", {})
+        fallbacks = sum(1 for call in result.get("llm_calls", []) if call.get("fallback"))
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO experiment_runs (experiment, variant, unit, query, seconds, llm_calls, prompt_tokens,
+                                         cached_tokens, completion_tokens, fallbacks, cache_hit, error, run_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+        ''', (experiment, variant, unit, result.get("query", ""), seconds, usage.get("calls", 0),
+              usage.get("prompt_tokens", 0), usage.get("cached_tokens", 0), usage.get("completion_tokens", 0),
+              fallbacks, int(bool(result.get("cached"))), result.get("error"), result.get("run_id")))
+        run_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        return run_id
+
+    def experiments(self) -> List[str]:
+        """Experiment names, most recently active first"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT experiment FROM experiment_runs GROUP BY experiment ORDER BY MAX(id) DESC")
+        names = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return names
+
+    def runs(self, experiment: str, days: Optional[float] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Logged requests of an experiment, newest first"""
+        sql = "SELECT * FROM experiment_runs WHERE experiment = ?"
+        params: List = [experiment]
+        if days:
+            sql += " AND created_at >= datetime('now', ?)"
+            params.append(f"-{days} days")
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+        conn.close()
+        return rows
+
+    def summary(self, experiment: str, days: Optional[float] = None) -> List[Dict]:
+        """Per-variant latency percentiles, error, fallback and cache hit rates, and mean tokens.
+
+        Latency covers successful requests; fallback rate and tokens cover
+        generated (non-cached) reports, since cache hits make no LLM calls.
+        """
+        by_variant: Dict[str, List[Dict]] = {}
+        for run in self.runs(experiment, days):
+            by_variant.setdefault(run["variant"], []).append(run)
+
+        rows = []
+        for variant, runs in sorted(by_variant.items()):
+            ok = [r for r in runs if not r["error"]]
+            generated = [r for r in ok if not r["cache_hit"]]
+            latencies = [r["seconds"] for r in ok]
+            generated_latencies = [r["seconds"] for r in generated]
+
+            def mean(field: str) -> float:
+                return round(sum(r[field] for r in generated) / len(generated), 1) if generated else 0.0
+
+            rows.append({
+                "variant": variant,
+                "requests": len(runs),
+                "error_rate": round(1 - len(ok) / len(runs), 3),
+                "cache_hit_rate": round((len(ok) - len(generated)) / len(ok), 3) if ok else 0.0,
+                "p50_seconds": round(_percentile(latencies, 50), 2),
+                "p95_seconds": round(_percentile(latencies, 95), 2),
+                "generated_p50_seconds": round(_percentile(generated_latencies, 50), 2),
+                "fallback_rate": round(sum(1 for r in generated if r["fallbacks"]) / len(generated), 3) if generated else 0.0,
+                "llm_calls": mean("llm_calls"),
+                "prompt_tokens": mean("prompt_tokens"),
+                "cached_tokens": mean("cached_tokens"),
+                "completion_tokens": mean("completion_tokens")
+            })
+        return rows
+
+
+# Global experiment log instance
+experiment_log = ExperimentLog()
@@ -0,0 +1,266 @@
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from metrics import (
+    LLM_FALLBACKS, LLM_LATENCY, LLM_PROMPT_TOKENS, LLM_RATE_LIMIT_SECONDS,
+    LLM_RATE_LIMIT_WAITS, LLM_REQUESTS, LLM_TOKENS
+)
+from tracing import span
+
+# Per-stage model tiers. Each stage walks its fallback chain in order; a fast
+# non-reasoning model handles the planner and the execution fan-out while the
+# reasoner is reserved for synthesis. Override any stage via settings (environment,
+# .env or Streamlit secrets):
+#   PMM_MODEL_<STAGE>="deepseek:deepseek-chat,groq:compound-beta"
+#   PMM_MAX_TOKENS_<STAGE>=1500   PMM_TEMPERATURE_<STAGE>=0.3
+# The "repair" stage is a cheap model used to fix unparseable structured output.
+DEFAULT_STAGE_MODELS = {
+    "planner": {
+        "chain": [("deepseek", "deepseek-chat"), ("groq", "compound-beta")],
+        "max_tokens": 1024,
+        "temperature": 0.3
+    },
+    "execution": {
+        "chain": [("deepseek", "deepseek-chat"), ("groq", "compound-beta")],
+        "max_tokens": 1500,
+        "temperature": 0.5
+    },
+    "publisher": {
+        "chain": [("deepseek", "deepseek-reasoner"), ("groq", "compound-beta")],
+        "max_tokens": 4000,
+        "temperature": 0.7
+    },
+    "data_driven": {
+        "chain": [("deepseek", "deepseek-reasoner"), ("groq", "compound-beta")],
+        "max_tokens": 4000,
+        "temperature": 0.7
+    },
+    "basic": {
+        "chain": [("deepseek", "deepseek-reasoner"), ("groq", "compound-beta")],
+        "max_tokens": None,
+        "temperature": 0.7
+    },
+    "repair": {
+        "chain": [("deepseek", "deepseek-chat"), ("groq", "llama-3.1-8b-instant")],
+        "max_tokens": 1500,
+        "temperature": 0.0
+    }
+}
+
+# Models that reject the JSON response format; structured stages still
+# validate and repair their output locally when routed to these.
+JSON_MODE_UNSUPPORTED = {"deepseek-reasoner", "compound-beta", "compound-beta-mini"}
+
+BACKEND_NAMES = {"deepseek": "DeepSeek", "groq": "Groq"}
+
+
+# Calls made while a `track_calls()` block is active. Context variables are
+# copied into asyncio.to_thread workers, so calls routed from the research
+# pipeline's threads are recorded in the same list.
+_call_log: ContextVar[Optional[List[Dict]]] = ContextVar("llm_call_log", default=None)
+
+
+class LLMError(Exception):
+    """Raised when every backend in a stage's fallback chain failed"""
+
+
+def parse_chain(value: str) -> List[Tuple[str, str]]:
+    """Parse "backend:model,backend:model" into a fallback chain"""
+    chain = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        backend, _, model = entry.partition(":")
+        if not model:
+            raise ValueError(f"Invalid model chain entry '{entry}', expected backend:model")
+        chain.append((backend.strip().lower(), model.strip()))
+    return chain
+
+
+def get_stage_config(stage: str) -> Dict:
+    """Stage configuration with environment overrides applied"""
+    config = dict(DEFAULT_STAGE_MODELS.get(stage, DEFAULT_STAGE_MODELS["basic"]))
+    key = stage.upper()
+    if settings.get(f"PMM_MODEL_{key}"):
+        config["chain"] = parse_chain(settings.get(f"PMM_MODEL_{key}"))
+    if settings.get(f"PMM_MAX_TOKENS_{key}"):
+        max_tokens = int(settings.get(f"PMM_MAX_TOKENS_{key}"))
+        config["max_tokens"] = max_tokens if max_tokens > 0 else None
+    if settings.get(f"PMM_TEMPERATURE_{key}"):
+        config["temperature"] = float(settings.get(f"PMM_TEMPERATURE_{key}"))
+    return config
+
+
+def model_label(backend: str, model: str) -> str:
+    """Model name as reported in result metadata (e.g. deepseek-reasoner, groq-compound-beta)"""
+    return model if backend == "deepseek" else f"{backend}-{model}"
+
+
+def usage_record(completion: Any) -> Dict:
+    """Token usage of a completion, including provider-reported prompt cache hits.
+
+    DeepSeek reports `prompt_cache_hit_tokens`; OpenAI-compatible providers
+    report `prompt_tokens_details.cached_tokens`. Missing fields count as 0.
+    """
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": cached or 0
+    }
+
+
+@contextmanager
+def track_calls():
+    """Collect a record of every routed completion made inside the block"""
+    calls: List[Dict] = []
+    token = _call_log.set(calls)
+    try:
+        yield calls
+    finally:
+        _call_log.reset(token)
+
+
+def summarize_calls(calls: List[Dict]) -> Dict:
+    """Totals and prompt cache hit rate across call records"""
+    prompt_tokens = sum(c["prompt_tokens"] for c in calls)
+    cached_tokens = sum(c["cached_tokens"] for c in calls)
+    return {
+        "calls": len(calls),
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "completion_tokens": sum(c["completion_tokens"] for c in calls),
+        "cache_hit_rate": round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0
+    }
+
+
+class LLMRouter:
+    """Routes chat completions for a pipeline stage through its fallback chain"""
+
+    def __init__(self, deepseek_client: Any = None, groq_client: Any = None,
+                 max_retries: int = 3, retry_delay: float = 5):
+        self.clients = {"deepseek": deepseek_client, "groq": groq_client}
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def available(self) -> bool:
+        return any(self.clients.values())
+
+    def _create(self, backend: str, model: str, messages: List[Dict], config: Dict):
+        kwargs = {
+            "model": model,
+            "messages": messages,
+            "temperature": config["temperature"],
+            "stream": False
+        }
+        if config.get("max_tokens"):
+            kwargs["max_tokens"] = config["max_tokens"]
+        if config.get("json_mode") and model not in JSON_MODE_UNSUPPORTED:
+            kwargs["response_format"] = {"type": "json_object"}
+        if backend == "groq":
+            kwargs["top_p"] = 1
+            kwargs["stop"] = None
+        return self.clients[backend].chat.completions.create(**kwargs)
+
+    @staticmethod
+    def _record_success(stage: str, backend: str, model: str, position: int, seconds: float, usage: Dict):
+        LLM_LATENCY.observe(seconds, backend=backend, model=model)
+        LLM_REQUESTS.inc(stage=stage, backend=backend, model=model, outcome="success")
+        if position > 0:
+            LLM_FALLBACKS.inc(stage=stage)
+        for kind in ("prompt", "cached", "completion"):
+            LLM_TOKENS.inc(usage[f"{kind}_tokens"], stage=stage, kind=kind)
+        if usage["prompt_tokens"]:
+            LLM_PROMPT_TOKENS.observe(usage["prompt_tokens"], stage=stage)
+
+    def complete(self, stage: str, messages: List[Dict], **overrides) -> Dict:
+        """Run a completion for `stage`, falling back along its chain.
+
+        Rate-limited calls are retried with exponential backoff before moving
+        to the next backend. Pass json_mode=True to request the provider's JSON
+        response format where the model supports it. Returns the content, the
+        backend and model that produced it and its token usage (also recorded
+        in any active `track_calls()` block); raises LLMError when every
+        backend failed. The call is traced as an llm.route span with one
+        llm.completion child per attempt.
+        """
+        config = get_stage_config(stage)
+        config.update({k: v for k, v in overrides.items() if v is not None})
+        errors = []
+        chain = [(b, m) for b, m in config["chain"] if self.clients.get(b)]
+        if not chain:
+            raise LLMError(f"No available backends for stage '{stage}'")
+
+        request_bytes = len(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+        with span("llm.route", stage=stage, request_bytes=request_bytes) as route_span:
+            for position, (backend, model) in enumerate(chain):
+                name = BACKEND_NAMES.get(backend, backend)
+                if position == 0:
+                    print(f"🔍 Using {name} ({model}) for {stage}...")
+                else:
+                    print(f"🔄 Falling back to {name} ({model}) for {stage}...")
+                    route_span.add_to("fallbacks")
+
+                retry_delay = self.retry_delay
+                for attempt in range(self.max_retries):
+                    started = time.time()
+                    with span("llm.completion", stage=stage, backend=backend, model=model,
+                              attempt=attempt + 1, request_bytes=request_bytes) as call_span:
+                        try:
+                            completion = self._create(backend, model, messages, config)
+                            seconds = time.time() - started
+                            usage = usage_record(completion)
+                            if usage["prompt_tokens"]:
+                                print(f"💾 {stage}: {usage['cached_tokens']}/{usage['prompt_tokens']} prompt tokens served from cache")
+                            self._record_success(stage, backend, model, position, seconds, usage)
+                            content = completion.choices[0].message.content
+                            call_span.set_attributes(dict(
+                                usage, cache_hit=usage["cached_tokens"] > 0,
+                                response_bytes=len((content or "").encode("utf-8"))
+                            ))
+                            route_span.set_attributes({"backend": backend, "model": model, "fallback": position > 0})
+                            calls = _call_log.get()
+                            if calls is not None:
+                                calls.append(dict(
+                                    usage, stage=stage, backend=backend, model=model,
+                                    fallback=position > 0, seconds=round(seconds, 2)
+                                ))
+                            return {
+                                "content": content,
+                                "backend": backend,
+                                "model": model,
+                                "label": model_label(backend, model),
+                                "fallback": position > 0,
+                                "usage": usage
+                            }
+                        except Exception as e:
+                            call_span.record_error(e)
+                            LLM_LATENCY.observe(time.time() - started, backend=backend, model=model)
+                            rate_limited = "rate_limit" in str(e).lower() and attempt < self.max_retries - 1
+                            if not rate_limited:
+                                LLM_REQUESTS.inc(stage=stage, backend=backend, model=model, outcome="error")
+                                print(f"⚠️ {name} ({model}) failed in {stage}: {str(e)}")
+                                errors.append(f"{backend}/{model}: {str(e)}")
+                    if not rate_limited:
+                        break
+                    LLM_REQUESTS.inc(stage=stage, backend=backend, model=model, outcome="rate_limited")
+                    LLM_RATE_LIMIT_WAITS.inc(backend=backend)
+                    LLM_RATE_LIMIT_SECONDS.inc(retry_delay, backend=backend)
+                    route_span.add_to("retries")
+                    print(f"Rate limit hit, waiting {retry_delay} seconds...")
+                    with span("llm.rate_limit_wait", backend=backend, seconds=retry_delay):
+                        time.sleep(retry_delay)
+                    retry_delay *= 2  # Exponential backoff
+
+            raise LLMError("; ".join(errors))
@@ -0,0 +1,289 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import settings
+from tracing import span
+
+# Latency buckets (seconds) sized for LLM and search calls
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120, 300)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels.values())} {_format_value(value)}"
+                for labels, value in self.samples()]
+
+
+class Histogram(_Metric):
+    """Bucketed observations per label set, with sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, Dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0})
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the enclosed block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimate a quantile by linear interpolation within buckets"""
+        series = self._series.get(self._key(labels))
+        if not series or not series["count"]:
+            return None
+        return self._quantile(series, q)
+
+    def _quantile(self, series: Dict, q: float) -> float:
+        rank = q * series["count"]
+        cumulative = 0
+        for i, count in enumerate(series["counts"]):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i >= len(self.buckets):
+                    return lower  # Above the largest bucket: report its bound
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def summaries(self) -> List[Dict]:
+        """Count, mean and estimated p50/p95/p99 per label set"""
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._series.items())
+        rows = []
+        for key, series in items:
+            row = dict(zip(self.labelnames, key))
+            row.update({
+                "count": series["count"],
+                "mean": round(series["sum"] / series["count"], 4) if series["count"] else 0.0,
+                "p50": round(self._quantile(series, 0.50), 4),
+                "p95": round(self._quantile(series, 0.95), 4),
+                "p99": round(self._quantile(series, 0.99), 4)
+            })
+            rows.append(row)
+        return rows
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics with Prometheus text exposition"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _register(self, metric_class, name: str, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Start a background HTTP server answering GET /metrics (once per process)"""
+        if self._server:
+            return self._server
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes are frequent; keep stdout for research logs
+
+        self._server = ThreadingHTTPServer((addr, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="pmm-metrics").start()
+        print(f"📈 Metrics available at http://{addr}:{port}/metrics")
+        return self._server
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+
+def serve_from_settings() -> Optional[ThreadingHTTPServer]:
+    """Start the scrape endpoint when PMM_METRICS_PORT is configured"""
+    port = settings.get("PMM_METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return metrics.serve(int(port), settings.get("PMM_METRICS_ADDR", "127.0.0.1"))
+    except OSError as e:
+        print(f"⚠️ Could not start metrics endpoint on port {port}: {e}")
+        return None
+
+# Research requests
+RESEARCH_REQUESTS = metrics.counter("pmm_research_requests_total", "Research reports requested", ["mode", "prompt", "outcome"])
+RESEARCH_DURATION = metrics.histogram("pmm_research_duration_seconds", "End-to-end report generation time", ["mode"])
+STAGE_DURATION = metrics.histogram("pmm_stage_duration_seconds", "Time spent per pipeline stage", ["stage"])
+SUB_QUESTIONS = metrics.histogram("pmm_sub_questions", "Sub-questions per advanced report", ["phase"], buckets=COUNT_BUCKETS)
+
+# LLM backends
+LLM_REQUESTS = metrics.counter("pmm_llm_requests_total", "LLM completions by outcome", ["stage", "backend", "model", "outcome"])
+LLM_LATENCY = metrics.histogram("pmm_llm_latency_seconds", "LLM completion latency", ["backend", "model"])
+LLM_FALLBACKS = metrics.counter("pmm_llm_fallbacks_total", "Completions served by a fallback backend", ["stage"])
+LLM_RATE_LIMIT_WAITS = metrics.counter("pmm_llm_rate_limit_waits_total", "Rate-limit retries", ["backend"])
+LLM_RATE_LIMIT_SECONDS = metrics.counter("pmm_llm_rate_limit_wait_seconds_total", "Seconds slept waiting on rate limits", ["backend"])
+LLM_TOKENS = metrics.counter("pmm_llm_tokens_total", "Tokens by stage and kind (prompt, cached, completion)", ["stage", "kind"])
+LLM_PROMPT_TOKENS = metrics.histogram("pmm_llm_prompt_tokens", "Prompt tokens per completion", ["stage"], buckets=TOKEN_BUCKETS)
+
+# Search and caches
+SEARCH_REQUESTS = metrics.counter("pmm_search_requests_total", "Web/local source searches", ["source", "outcome"])
+SEARCH_LATENCY = metrics.histogram("pmm_search_latency_seconds", "Search latency", ["source"])
+SEARCH_RESULTS = metrics.histogram("pmm_search_results", "Results returned per search", ["source"], buckets=COUNT_BUCKETS)
+CACHE_LOOKUPS = metrics.counter("pmm_cache_lookups_total", "Cache lookups by result", ["cache", "result"])
+
+
+def search_with_metrics(search, source: str = "tavily", **kwargs) -> Dict:
+    """Call a Tavily-style search function, recording latency, outcome and result count"""
+    start = time.perf_counter()
+    with span(f"search.{source}", query=kwargs.get("query"), max_results=kwargs.get("max_results")) as search_span:
+        try:
+            result = search(**kwargs)
+        except Exception:
+            SEARCH_REQUESTS.inc(source=source, outcome="error")
+            raise
+        finally:
+            SEARCH_LATENCY.observe(time.perf_counter() - start, source=source)
+        results = result.get("results", [])
+        search_span.set_attributes({
+            "results": len(results),
+            "response_bytes": sum(len(str(r.get("content") or "").encode("utf-8")) for r in results)
+        })
+    SEARCH_REQUESTS.inc(source=source, outcome="success")
+    SEARCH_RESULTS.observe(len(results), source=source)
+    return result
+
+
+def record_research(mode: str, prompt: str, result: Dict, seconds: float):
+    """Count a finished report by outcome; latency is only observed for generated reports"""
+    if "error" in result:
+        outcome = "error"
+    elif result.get("cached"):
+        outcome = "cached"
+    else:
+        outcome = "success"
+    RESEARCH_REQUESTS.inc(mode=mode, prompt=prompt, outcome=outcome)
+    if outcome != "cached":
+        RESEARCH_DURATION.observe(seconds, mode=mode)
@@ -0,0 +1,66 @@
+import streamlit as st
+from metrics import (
+    CACHE_LOOKUPS, LLM_FALLBACKS, LLM_REQUESTS, LLM_TOKENS, Counter, Histogram,
+    metrics, serve_from_settings
+)
+
+st.set_page_config(page_title="Diagnostics - PMM Research Agent", page_icon="📈", layout="wide")
+
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Scrape endpoint shared by every session in this process"""
+    return serve_from_settings()
+
+
+def counter_total(counter: Counter, **match) -> float:
+    """Sum of a counter's samples whose labels include `match`"""
+    return sum(value for labels, value in counter.samples()
+               if all(labels.get(k) == v for k, v in match.items()))
+
+
+def ratio(part: float, whole: float) -> str:
+    return f"{part / whole:.0%}" if whole else "n/a"
+
+
+start_metrics_endpoint()
+
+st.title("📈 Diagnostics")
+st.caption("Metrics collected by this process since it started. Scrape them in Prometheus format "
+           "by setting PMM_METRICS_PORT (served at /metrics).")
+
+# Headline ratios for capacity planning
+research_hits = counter_total(CACHE_LOOKUPS, cache="research", result="hit")
+research_lookups = counter_total(CACHE_LOOKUPS, cache="research")
+store_hits = counter_total(CACHE_LOOKUPS, cache="source_store", result="hit")
+store_lookups = counter_total(CACHE_LOOKUPS, cache="source_store")
+llm_success = counter_total(LLM_REQUESTS, outcome="success")
+prompt_tokens = counter_total(LLM_TOKENS, kind="prompt")
+cached_tokens = counter_total(LLM_TOKENS, kind="cached")
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Report cache hit rate", ratio(research_hits, research_lookups), f"{int(research_lookups)} lookups")
+col2.metric("Source store hit rate", ratio(store_hits, store_lookups), f"{int(store_lookups)} lookups")
+col3.metric("LLM fallback rate", ratio(counter_total(LLM_FALLBACKS), llm_success), f"{int(llm_success)} completions")
+col4.metric("Prompt tokens cached", ratio(cached_tokens, prompt_tokens), f"{int(prompt_tokens)} prompt tokens")
+
+st.subheader("⏱️ Latency and distributions")
+for metric in metrics.metrics():
+    if isinstance(metric, Histogram):
+        rows = metric.summaries()
+        if rows:
+            st.markdown(f"**{metric.name}** — {metric.documentation}")
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+
+st.subheader("🔢 Counters")
+for metric in metrics.metrics():
+    if isinstance(metric, Counter):
+        rows = [dict(labels, value=value) for labels, value in metric.samples()]
+        if rows:
+            st.markdown(f"**{metric.name}** — {metric.documentation}")
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+
+exposition = metrics.render()
+with st.expander("Prometheus exposition"):
+    st.code(exposition, language="text")
+st.download_button("📥 Download metrics", exposition, file_name="pmm_metrics.prom", mime="text/plain")
@@ -0,0 +1,148 @@
+import html
+from datetime import datetime
+from typing import Dict, List
+
+import streamlit as st
+from tracing import STATUS_ERROR, trace_store
+
+st.set_page_config(page_title="Traces - PMM Research Agent", page_icon="🧭", layout="wide")
+
+# Bar colours by span family
+SPAN_COLORS = {
+    "research": "#6c757d",
+    "stage": "#0d6efd",
+    "llm": "#6f42c1",
+    "search": "#198754",
+    "cache": "#fd7e14",
+    "report": "#20c997",
+    "data_driven": "#0dcaf0"
+}
+ERROR_COLOR = "#dc3545"
+
+
+def span_depths(spans: List[Dict]) -> Dict[str, int]:
+    """Nesting depth of every span (roots are 0)"""
+    parents = {s["span_id"]: s["parent_id"] for s in spans}
+    depths = {}
+    for span_id in parents:
+        depth, parent = 0, parents[span_id]
+        while parent in parents:
+            depth, parent = depth + 1, parents[parent]
+        depths[span_id] = depth
+    return depths
+
+
+def ordered_tree(spans: List[Dict]) -> List[Dict]:
+    """Spans in depth-first order, children sorted by start time"""
+    children: Dict[str, List[Dict]] = {}
+    known = {s["span_id"] for s in spans}
+    roots = []
+    for s in spans:
+        if s["parent_id"] in known:
+            children.setdefault(s["parent_id"], []).append(s)
+        else:
+            roots.append(s)
+    ordered = []
+
+    def visit(s: Dict):
+        ordered.append(s)
+        for child in sorted(children.get(s["span_id"], []), key=lambda c: c["start_ns"]):
+            visit(child)
+
+    for root in sorted(roots, key=lambda r: r["start_ns"]):
+        visit(root)
+    return ordered
+
+
+def span_label(s: Dict) -> str:
+    """Short description from the most useful attributes"""
+    attrs = s["attributes"]
+    details = [str(attrs[k]) for k in ("stage", "backend", "model") if k in attrs]
+    if "attempt" in attrs and attrs["attempt"] > 1:
+        details.append(f"attempt {attrs['attempt']}")
+    if "cache_hit" in attrs:
+        details.append("hit" if attrs["cache_hit"] else "miss")
+    if "question" in attrs:
+        details.append(str(attrs["question"])[:60])
+    return s["name"] + (f" ({', '.join(details)})" if details else "")
+
+
+def render_waterfall(spans: List[Dict]) -> str:
+    """HTML waterfall: one row per span, bar offset and width relative to the trace"""
+    trace_start = min(s["start_ns"] for s in spans)
+    total = max(max(s["end_ns"] for s in spans) - trace_start, 1)
+    depths = span_depths(spans)
+    rows = []
+    for s in ordered_tree(spans):
+        offset = (s["start_ns"] - trace_start) / total * 100
+        width = max((s["end_ns"] - s["start_ns"]) / total * 100, 0.3)
+        seconds = (s["end_ns"] - s["start_ns"]) / 1e9
+        failed = s["status"] == STATUS_ERROR
+        color = ERROR_COLOR if failed else SPAN_COLORS.get(s["name"].split(".")[0], "#adb5bd")
+        tooltip = html.escape(s["status_message"] if failed else ", ".join(f"{k}={v}" for k, v in s["attributes"].items()))
+        rows.append(
+            f'<div style="display:flex;align-items:center;font-size:12px;line-height:20px" title="{tooltip}">'
+            f'<div style="width:38%;padding-left:{depths[s["span_id"]] * 14}px;white-space:nowrap;overflow:hidden;text-overflow:ellipsis">'
+            f'{"⚠️ " if failed else ""}{html.escape(span_label(s))}</div>'
+            f'<div style="width:52%;position:relative;height:14px;background:#f1f3f5">'
+            f'<div style="position:absolute;left:{offset:.2f}%;width:{width:.2f}%;height:14px;background:{color};border-radius:2px"></div></div>'
+            f'<div style="width:10%;text-align:right">{seconds:.2f}s</div></div>'
+        )
+    return "\n".join(rows)
+
+
+st.title("🧭 Traces")
+st.caption("Per-run spans for planning, sub-questions, searches, LLM attempts and caches. "
+           f"Stored as OTLP/JSON in `{trace_store.directory}/`; set PMM_TRACING=0 to disable.")
+
+traces = trace_store.list_traces()
+if not traces:
+    st.info("No traces recorded yet. Run a research report to record one.")
+    st.stop()
+
+slow_first = st.toggle("Slowest first", value=False)
+if slow_first:
+    traces = sorted(traces, key=lambda t: t["duration_seconds"], reverse=True)
+
+
+def trace_option(t: Dict) -> str:
+    started = datetime.fromtimestamp(t["start_ns"] / 1e9).strftime('%Y-%m-%d %H:%M:%S')
+    query = str(t["attributes"].get("query", ""))[:50]
+    flag = " ⚠️" if t["error"] else ""
+    return f"{started} · {t['duration_seconds']:.1f}s · {t['attributes'].get('prompt', t['name'])} · {query}{flag}"
+
+
+selected = st.selectbox("Run", traces, format_func=trace_option)
+spans = trace_store.load(selected["trace_id"])
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Duration", f"{selected['duration_seconds']:.1f}s")
+col2.metric("Spans", selected["span_count"])
+col3.metric("LLM attempts", sum(1 for s in spans if s["name"] == "llm.completion"))
+col4.metric("Searches", sum(1 for s in spans if s["name"].startswith("search.")))
+st.caption(f"Run id: `{selected['trace_id']}`")
+
+st.subheader("Waterfall")
+st.markdown(render_waterfall(spans), unsafe_allow_html=True)
+
+# Where the time went, by span name (self time is not separated from children)
+totals: Dict[str, Dict] = {}
+for s in spans:
+    entry = totals.setdefault(s["name"], {"span": s["name"], "count": 0, "seconds": 0.0})
+    entry["count"] += 1
+    entry["seconds"] += (s["end_ns"] - s["start_ns"]) / 1e9
+st.subheader("Time by span")
+st.dataframe(sorted(({**t, "seconds": round(t["seconds"], 2)} for t in totals.values()),
+                    key=lambda t: t["seconds"], reverse=True),
+             use_container_width=True, hide_index=True)
+
+with st.expander("Span attributes"):
+    st.dataframe([
+        dict(name=s["name"], seconds=round((s["end_ns"] - s["start_ns"]) / 1e9, 3),
+             status="error" if s["status"] == STATUS_ERROR else "ok",
+             attributes=", ".join(f"{k}={v}" for k, v in s["attributes"].items()))
+        for s in ordered_tree(spans)
+    ], use_container_width=True, hide_index=True)
+
+st.download_button("📥 Download OTLP/JSON", trace_store.raw(selected["trace_id"]) or "",
+                   file_name=f"trace_{selected['trace_id']}.json", mime="application/json")
@@ -0,0 +1,37 @@
+import os
+from datetime import datetime
+
+import streamlit as st
+from profiling import PROFILE_SUFFIXES, list_profiles, profile_dir
+
+st.set_page_config(page_title="Profiles - PMM Research Agent", page_icon="🔬", layout="wide")
+
+st.title("🔬 Profiles")
+st.caption("CPU profiles and memory snapshots of profiled requests, named by run id (matching the Traces page). "
+           "Enable with the sidebar switch, `cli.py --profile` or PMM_PROFILE=1. "
+           "Open `.prof` files with `python -m pstats` or snakeviz; load `.tracemalloc` files with "
+           "`tracemalloc.Snapshot.load()`.")
+
+profiles = list_profiles()
+if not profiles:
+    st.info(f"No profiles in `{profile_dir()}/` yet.")
+    st.stop()
+
+for entry in profiles:
+    modified = datetime.fromtimestamp(entry["modified"]).strftime('%Y-%m-%d %H:%M:%S')
+    with st.expander(f"{modified} · {entry['run_id']} · {entry['label']}"):
+        summary_path = entry["files"].get(".txt")
+        if summary_path:
+            with open(summary_path, 'r', encoding='utf-8') as f:
+                st.code(f.read(), language="text")
+        cols = st.columns(len(PROFILE_SUFFIXES))
+        for col, (suffix, description) in zip(cols, PROFILE_SUFFIXES.items()):
+            path = entry["files"].get(suffix)
+            if not path:
+                continue
+            with open(path, 'rb') as f:
+                col.download_button(
+                    f"📥 {description}", f.read(), file_name=os.path.basename(path),
+                    mime="text/plain" if suffix == ".txt" else "application/octet-stream",
+                    key=f"download_{os.path.basename(path)}"
+                )
@@ -0,0 +1,44 @@
+import streamlit as st
+from experiments import experiment_log, experiment_name
+
+st.set_page_config(page_title="Experiments - PMM Research Agent", page_icon="🧪", layout="wide")
+
+st.title("🧪 Experiments")
+st.caption("Per-variant performance of requests served in experiment mode (sidebar switch or PMM_EXPERIMENT_SPLIT). "
+           "Latency percentiles cover successful requests; tokens and fallback rate cover generated "
+           "(non-cached) reports.")
+
+experiments = experiment_log.experiments()
+if not experiments:
+    st.info("No experiment runs logged yet. Turn on experiment mode in the sidebar to start one.")
+    st.stop()
+
+col1, col2 = st.columns([2, 1])
+default = experiments.index(experiment_name()) if experiment_name() in experiments else 0
+experiment = col1.selectbox("Experiment", experiments, index=default)
+window = col2.selectbox("Period", ["All time", "Last 24 hours", "Last 7 days", "Last 30 days"])
+days = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30}.get(window)
+
+summary = experiment_log.summary(experiment, days)
+if not summary:
+    st.info("No runs in this period.")
+    st.stop()
+
+st.subheader("📊 Variant comparison")
+st.dataframe(summary, use_container_width=True, hide_index=True)
+
+fastest = min((row for row in summary if row["generated_p50_seconds"]), key=lambda row: row["generated_p50_seconds"], default=None)
+if fastest and len(summary) > 1:
+    st.caption(f"Fastest generated reports: **{fastest['variant']}** (p50 {fastest['generated_p50_seconds']}s). "
+               "Compare quality on the same queries with `python test_comparison.py` before retiring a variant.")
+
+col1, col2 = st.columns(2)
+with col1:
+    st.markdown("**Latency (seconds)**")
+    st.bar_chart({row["variant"]: {"p50": row["p50_seconds"], "p95": row["p95_seconds"]} for row in summary})
+with col2:
+    st.markdown("**Mean tokens per generated report**")
+    st.bar_chart({row["variant"]: {"prompt": row["prompt_tokens"], "completion": row["completion_tokens"]} for row in summary})
+
+with st.expander("Recent runs"):
+    st.dataframe(experiment_log.runs(experiment, days, limit=200), use_container_width=True, hide_index=True)
@@ -0,0 +1,120 @@
+import math
+from collections import Counter
+from typing import Dict, List
+
+from text_similarity import stem, tokenize
+
+
+def chunk_text(text: str, max_words: int = 80, overlap: int = 20) -> List[str]:
+    """Split source content into overlapping word windows"""
+    words = text.split()
+    if len(words) <= max_words:
+        return [" ".join(words)] if words else []
+    step = max(max_words - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
+
+
+def _terms(text: str) -> List[str]:
+    return [stem(t) for t in tokenize(text)]
+
+
+class BM25:
+    """In-memory Okapi BM25 over a small set of passages"""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(doc) for doc in documents]
+        self.lengths = [len(doc) for doc in documents]
+        self.average_length = (sum(self.lengths) / len(documents)) if documents else 0.0
+        document_frequency = Counter(term for doc in documents for term in set(doc))
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def scores(self, query_terms: List[str]) -> List[float]:
+        results = []
+        for frequencies, length in zip(self.term_frequencies, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.average_length) if self.average_length else self.k1
+            for term in query_terms:
+                tf = frequencies.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+def rank_passages(query: str, sources: List[Dict], top_k: int = 6, max_per_source: int = 2,
+                  max_words: int = 80, overlap: int = 20) -> List[Dict]:
+    """Score passages from all sources against the query and keep the best ones.
+
+    Returns passage dicts (title, url, passage, score, source_index) ordered
+    by score, with at most `max_per_source` passages from any one source.
+    Passages that share no terms with the query are dropped.
+    """
+    passages = []
+    for index, source in enumerate(sources):
+        content = source.get('content', '') or ''
+        for chunk in chunk_text(content, max_words, overlap):
+            passages.append({
+                "title": source.get('title', 'Unknown'),
+                "url": source.get('url', 'N/A'),
+                "passage": chunk,
+                "source_index": index
+            })
+    if not passages:
+        return []
+
+    ranker = BM25([_terms(p["passage"]) for p in passages])
+    query_terms = list(dict.fromkeys(_terms(query)))
+    for passage, score in zip(passages, ranker.scores(query_terms)):
+        passage["score"] = round(score, 3)
+
+    selected = []
+    per_source = Counter()
+    for passage in sorted(passages, key=lambda p: p["score"], reverse=True):
+        if passage["score"] <= 0 or per_source[passage["source_index"]] >= max_per_source:
+            continue
+        selected.append(passage)
+        per_source[passage["source_index"]] += 1
+        if len(selected) >= top_k:
+            break
+
+    # Nothing matched the query terms: fall back to the opening passage of each source
+    if not selected:
+        seen = set()
+        for passage in passages:
+            if passage["source_index"] not in seen:
+                seen.add(passage["source_index"])
+                selected.append(passage)
+        selected = selected[:top_k]
+    return selected
+
+
+def format_passages(passages: List[Dict]) -> List[str]:
+    """Group ranked passages by source into prompt-ready summaries"""
+    grouped: Dict[int, Dict] = {}
+    for passage in passages:
+        entry = grouped.setdefault(passage["source_index"], {
+            "title": passage["title"],
+            "url": passage["url"],
+            "passages": []
+        })
+        entry["passages"].append(passage["passage"])
+
+    summaries = []
+    for entry in grouped.values():
+        summary = f"Source: {entry['title']}\n"
+        summary += f"URL: {entry['url']}\n"
+        for text in entry["passages"]:
+            summary += f"Passage: {text}\n"
+        summaries.append(summary)
+    return summaries
@@ -0,0 +1,198 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+
+# One profiled request at a time: cProfile replaces any profiler already
+# active on a thread, so overlapping runs on the shared event loop would
+# corrupt each other's profiles.
+_profile_lock = threading.Lock()
+_active_profile: ContextVar[Optional["RunProfile"]] = ContextVar("pmm_active_profile", default=None)
+
+# From Python 3.12 cProfile is built on sys.monitoring: one profiler per
+# process, recording every thread, and enabling a second one raises.
+PROCESS_WIDE_PROFILER = sys.version_info >= (3, 12)
+
+PROFILE_SUFFIXES = {".prof": "CPU profile (pstats)", ".tracemalloc": "Memory snapshot (tracemalloc)", ".txt": "Summary"}
+
+
+def profiling_enabled() -> bool:
+    """Per-request profiling is opt-in via PMM_PROFILE=1"""
+    return settings.get("PMM_PROFILE", "0") not in ("0", "false", "False")
+
+
+def profile_dir() -> str:
+    return settings.get("PMM_PROFILE_DIR", "profiles")
+
+
+class RunProfile:
+    """CPU and memory profile of one request.
+
+    The calling thread is profiled directly; work sent to threads through
+    `profiled_to_thread` is profiled in the worker and merged in, so the
+    advanced pipeline's LLM calls, searches and cache I/O are included.
+    On Python 3.12+ the single process-wide profiler covers worker threads
+    itself and no per-worker profilers are used.
+
+    Profiles are not isolated per request: advanced research runs on the
+    shared research loop thread, so coroutines of other requests interleaved
+    with the profiled one are recorded too (on 3.12+, so is every other
+    thread). Profile under light load for clean numbers.
+    """
+
+    def __init__(self, run_id: str, label: str = "research"):
+        self.run_id = run_id
+        self.label = label
+        self.profiler = cProfile.Profile()
+        self._worker_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+        self.seconds = 0.0
+        self.peak_kb = 0
+
+    @property
+    def basename(self) -> str:
+        return os.path.join(profile_dir(), f"{self.run_id}.{self.label}")
+
+    def add(self, profiler: cProfile.Profile):
+        with self._lock:
+            self._worker_profiles.append(profiler)
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            raise
+
+    def stop(self) -> Dict:
+        """Stop profiling and write .prof, .tracemalloc and .txt files"""
+        self.profiler.disable()
+        self.seconds = time.perf_counter() - self._start
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")
+        ])
+        self.peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(profile_dir(), exist_ok=True)
+        stats = pstats.Stats(self.profiler)
+        with self._lock:
+            for worker in self._worker_profiles:
+                stats.add(worker)
+        stats.dump_stats(f"{self.basename}.prof")
+        snapshot.dump(f"{self.basename}.tracemalloc")
+        with open(f"{self.basename}.txt", 'w', encoding='utf-8') as f:
+            f.write(self.summary(stats, snapshot))
+        print(f"🔬 Profile saved to {self.basename}.prof ({self.seconds:.2f}s, peak {self.peak_kb} KB traced)")
+        return {"run_id": self.run_id, "label": self.label, "seconds": round(self.seconds, 3),
+                "peak_kb": self.peak_kb, "files": [f"{self.basename}{suffix}" for suffix in PROFILE_SUFFIXES]}
+
+    def summary(self, stats: pstats.Stats, snapshot: tracemalloc.Snapshot, limit: int = 30) -> str:
+        """Human-readable top functions and allocation sites"""
+        out = io.StringIO()
+        out.write(f"Run {self.run_id} ({self.label}): {self.seconds:.3f}s wall, "
+                  f"{len(self._worker_profiles)} worker-thread calls, peak traced memory {self.peak_kb} KB\n\n")
+        for sort_key, title in (("cumulative", "cumulative time"), ("tottime", "internal time")):
+            out.write(f"=== Top {limit} functions by {title} ===\n")
+            stats.stream = out
+            stats.sort_stats(sort_key).print_stats(limit)
+        out.write(f"=== Top {limit} allocation sites (live at end of run) ===\n")
+        for stat in snapshot.statistics("lineno")[:limit]:
+            out.write(f"{stat}\n")
+        return out.getvalue()
+
+
+@contextmanager
+def profile_run(run_id: str, enabled: Optional[bool] = None, label: str = "research"):
+    """Profile the enclosed block when enabled (argument, else PMM_PROFILE).
+
+    Yields the RunProfile, or None when profiling is off or another request is
+    already being profiled.
+    """
+    if enabled is None:
+        enabled = profiling_enabled()
+    if not enabled:
+        yield None
+        return
+    if not _profile_lock.acquire(blocking=False):
+        print("⚠️ Another request is being profiled; running this one unprofiled")
+        yield None
+        return
+    run = RunProfile(run_id, label)
+    try:
+        run.start()
+    except ValueError as e:
+        # Another profiler (a debugger or coverage tool on 3.12+) is already active
+        print(f"⚠️ Cannot profile this request: {e}")
+        _profile_lock.release()
+        yield None
+        return
+    token = _active_profile.set(run)
+    try:
+        yield run
+    finally:
+        _active_profile.reset(token)
+        try:
+            run.stop()
+        except Exception as e:
+            print(f"⚠️ Failed to save profile: {e}")
+        finally:
+            _profile_lock.release()
+
+
+def _thread_profiled(func: Callable) -> Callable:
+    run = _active_profile.get()
+    if run is None or PROCESS_WIDE_PROFILER:
+        return func
+
+    def wrapper(*args, **kwargs):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            run.add(profiler)
+    return wrapper
+
+
+async def profiled_to_thread(func: Callable, *args, **kwargs):
+    """asyncio.to_thread that includes the worker in the active run profile"""
+    return await asyncio.to_thread(_thread_profiled(func), *args, **kwargs)
+
+
+def list_profiles(directory: Optional[str] = None) -> List[Dict]:
+    """Saved profiles, newest first, with the files available for each run"""
+    directory = directory or profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    runs: Dict[str, Dict] = {}
+    for name in os.listdir(directory):
+        base, suffix = os.path.splitext(name)
+        if suffix not in PROFILE_SUFFIXES or "." not in base:
+            continue
+        path = os.path.join(directory, name)
+        run_id, label = base.split(".", 1)
+        entry = runs.setdefault(base, {"run_id": run_id, "label": label, "files": {}, "modified": 0.0})
+        entry["files"][suffix] = path
+        entry["modified"] = max(entry["modified"], os.path.getmtime(path))
+    return sorted(runs.values(), key=lambda r: r["modified"], reverse=True)
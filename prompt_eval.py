@@ -0,0 +1,220 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from data_driven import DATA_DRIVEN_DOMAINS
+from prompt_manager import prompt_manager
+
+# Prompt A/B evaluation: every variant runs against the same query set
+# concurrently, and each query gets one retrieval pass whose sources every
+# variant uses (including the 3-stage pipeline's sub-question searches), so
+# the comparison measures the prompts rather than differences in search results.
+
+# The broadest search any research mode makes for a query (the data-driven one)
+RETRIEVAL_MAX_RESULTS = 10
+
+_evaluation_query: ContextVar[Optional[str]] = ContextVar("pmm_evaluation_query", default=None)
+
+
+class SharedSearchClient:
+    """Tavily-style client serving every search made for an evaluation query from one retrieval pass.
+
+    Inside `for_query(query)`, the first search fetches the query's source set
+    (advanced depth, data-driven domains, RETRIEVAL_MAX_RESULTS results) and
+    every search after it, whatever its text, domains or result count, returns
+    that same set. Concurrent variants of a query wait for a single in-flight
+    call. Searches outside `for_query` go upstream unchanged.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._passes: Dict[str, Dict] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats = {"upstream": 0, "shared": 0}
+
+    def _query_lock(self, query: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(query, threading.Lock())
+
+    @contextmanager
+    def for_query(self, query: str):
+        """Serve searches made in this block (and the threads and tasks it starts) from `query`'s retrieval pass"""
+        token = _evaluation_query.set(query)
+        try:
+            yield
+        finally:
+            _evaluation_query.reset(token)
+
+    def retrieve(self, query: str) -> Dict:
+        """The retrieval pass for an evaluation query, fetched once"""
+        with self._query_lock(query):
+            response = self._passes.get(query)
+            fetched = response is None
+            if fetched:
+                response = self.client.search(query=query, search_depth="advanced", max_results=RETRIEVAL_MAX_RESULTS,
+                                              include_domains=DATA_DRIVEN_DOMAINS)
+                self._passes[query] = response
+        with self._lock:
+            self.stats["upstream" if fetched else "shared"] += 1
+        return response
+
+    def search(self, query: str, **kwargs) -> Dict:
+        evaluation_query = _evaluation_query.get()
+        if evaluation_query is None:
+            with self._lock:
+                self.stats["upstream"] += 1
+            return self.client.search(query=query, **kwargs)
+        return dict(self.retrieve(evaluation_query), query=query)
+
+
+def variant_mode(prompt_name: str) -> str:
+    if prompt_manager.is_staged(prompt_name):
+        return "advanced"
+    return "data_driven" if prompt_name == "testprompt4" else "basic"
+
+
+def summarize_run(query: str, variant: str, result: Dict, seconds: float) -> Dict:
+    """Latency, tokens, sources and output size of one report"""
+    usage = result.get("llm_usage", {})
+    content = result.get("content", "") if "error" not in result else ""
+    return {
+        "query": query,
+        "variant": variant,
+        "mode": variant_mode(variant),
+        "seconds": round(seconds, 3),
+        "error": result.get("error"),
+        "model": result.get("model", "none"),
+        "llm_calls": usage.get("calls", 0),
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "cached_tokens": usage.get("cached_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "sources": result.get("sources_used", result.get("total_sources", 0)),
+        "output_chars": len(content),
+        "output_words": len(content.split()),
+        "run_id": result.get("run_id"),
+        "content": content
+    }
+
+
+def aggregate(runs: List[Dict]) -> Dict[str, Dict]:
+    """Per-variant averages across queries (failed runs count only as errors)"""
+    variants = {}
+    for variant in dict.fromkeys(r["variant"] for r in runs):
+        ok = [r for r in runs if r["variant"] == variant and not r["error"]]
+        total = sum(1 for r in runs if r["variant"] == variant)
+
+        def mean(field: str) -> float:
+            return round(statistics.mean(r[field] for r in ok), 1) if ok else 0.0
+
+        latencies = [r["seconds"] for r in ok]
+        variants[variant] = {
+            "mode": variant_mode(variant),
+            "runs": total,
+            "errors": total - len(ok),
+            "median_seconds": round(statistics.median(latencies), 2) if latencies else 0.0,
+            "max_seconds": round(max(latencies), 2) if latencies else 0.0,
+            "llm_calls": mean("llm_calls"),
+            "prompt_tokens": mean("prompt_tokens"),
+            "completion_tokens": mean("completion_tokens"),
+            "sources": mean("sources"),
+            "output_words": mean("output_words")
+        }
+    return variants
+
+
+class PromptEvaluator:
+    """Runs prompt variants over a query set concurrently with shared retrieval"""
+
+    def __init__(self, concurrency: int = 4):
+        from deep_research import PMMResearchAgent
+        from advanced_research import AdvancedPMMResearcher
+        self.concurrency = concurrency
+        # Dedicated agents so the shared search client does not leak into the app's singletons
+        self.basic_agent = PMMResearchAgent()
+        self.advanced_agent = AdvancedPMMResearcher()
+        self.search = SharedSearchClient(self.basic_agent.tavily_client) if self.basic_agent.tavily_enabled else None
+        for agent in (self.basic_agent, self.advanced_agent):
+            agent.tavily_client = self.search
+            agent.tavily_enabled = self.search is not None
+        # Keep the local source store out of the comparison: no lookups, and no
+        # evaluation results written into the app's store
+        self.advanced_agent.source_store = None
+        self.basic_agent._store_sources = lambda sources: None
+
+    def run_variant(self, query: str, variant: str) -> Dict:
+        start = time.time()
+        try:
+            with self.search.for_query(query) if self.search else nullcontext():
+                if prompt_manager.is_staged(variant):
+                    result = self.advanced_agent.run_advanced_research(query, variant, use_cache=False)
+                else:
+                    result = self.basic_agent.generate_research_report(query, variant, use_cache=False)
+        except Exception as e:
+            result = {"error": str(e)}
+        run = summarize_run(query, variant, result, time.time() - start)
+        print(f"{'✅' if not run['error'] else '❌'} {variant} on '{query[:40]}...' in {run['seconds']:.1f}s")
+        return run
+
+    def evaluate(self, queries: List[str], variants: List[str]) -> Dict:
+        """Every variant on every query; reports are generated fresh (the research cache is bypassed)"""
+        start = time.time()
+        jobs = [(query, variant) for query in queries for variant in variants]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            runs = list(pool.map(lambda job: self.run_variant(*job), jobs))
+        return {
+            "created": datetime.now().isoformat(),
+            "queries": queries,
+            "variants": variants,
+            "concurrency": self.concurrency,
+            "wall_seconds": round(time.time() - start, 2),
+            "search": dict(self.search.stats) if self.search else {},
+            "runs": runs,
+            "summary": aggregate(runs)
+        }
+
+
+def comparison_report(evaluation: Dict, include_outputs: bool = True) -> str:
+    """Markdown comparison of an evaluation"""
+    search = evaluation["search"]
+    lines = [
+        "# PMM Research Agent - Prompt Comparison",
+        "",
+        f"**Run:** {evaluation['created'][:19]}  ",
+        f"**Queries:** {len(evaluation['queries'])}, **variants:** {', '.join(evaluation['variants'])}  ",
+        f"**Wall time:** {evaluation['wall_seconds']}s at concurrency {evaluation['concurrency']}  ",
+        f"**Searches:** {search.get('upstream', 0)} upstream, {search.get('shared', 0)} served from shared retrieval"
+        if search else "**Searches:** web search disabled",
+        "",
+        "## Summary (mean per query)",
+        "",
+        "| Variant | Mode | Runs | Errors | Median s | Max s | LLM calls | Prompt tokens | Completion tokens | Sources | Output words |",
+        "|---|---|---|---|---|---|---|---|---|---|---|"
+    ]
+    for variant, s in evaluation["summary"].items():
+        lines.append(f"| {variant} | {s['mode']} | {s['runs']} | {s['errors']} | {s['median_seconds']} | {s['max_seconds']} | "
+                     f"{s['llm_calls']} | {s['prompt_tokens']} | {s['completion_tokens']} | {s['sources']} | {s['output_words']} |")
+
+    lines += ["", "## Per Query", ""]
+    for query in evaluation["queries"]:
+        lines += [f"### {query}", "",
+                  "| Variant | Seconds | Model | Tokens (prompt/completion) | Sources | Words | Run id |",
+                  "|---|---|---|---|---|---|---|"]
+        for run in (r for r in evaluation["runs"] if r["query"] == query):
+            if run["error"]:
+                lines.append(f"| {run['variant']} | {run['seconds']} | ❌ {str(run['error'])[:80]} | | | | |")
+                continue
+            lines.append(f"| {run['variant']} | {run['seconds']} | {run['model']} | {run['prompt_tokens']}/{run['completion_tokens']} | "
+                         f"{run['sources']} | {run['output_words']} | {run['run_id'] or ''} |")
+        lines.append("")
+        if include_outputs:
+            for run in (r for r in evaluation["runs"] if r["query"] == query and not r["error"]):
+                lines += [f"<details><summary>{run['variant']} output</summary>", "", run["content"], "", "</details>", ""]
+
+    lines += ["---", "", "*Generated by PMM Research Agent Test Suite*", ""]
+    return "\n".join(lines)
@@ -0,0 +1,67 @@
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+
+# Providers with automatic prefix caching (DeepSeek, OpenAI-compatible APIs)
+# only reuse the longest byte-identical leading prefix of a request. Keep every
+# static prompt part in the leading system message and move per-request
+# values into a trailing user message so repeated calls share that prefix.
+
+
+def cache_friendly_enabled() -> bool:
+    """Static-prefix layout is on unless PMM_CACHE_FRIENDLY_LAYOUT=0"""
+    return settings.get("PMM_CACHE_FRIENDLY_LAYOUT", "1") != "0"
+
+
+def variable_marker(label: str) -> str:
+    """Stable stand-in for a value that is supplied at the end of the request"""
+    return f"[{label} - provided at the end of this request]"
+
+
+def static_messages(system_prompt: str, user_template: str,
+                    variables: List[Tuple[str, str, str]],
+                    instructions: str = "") -> List[Dict]:
+    """Build [static system, variable user] messages.
+
+    `variables` holds (placeholder, label, value) triples. Placeholders in the
+    user template are replaced by fixed markers so the template can join the
+    static prefix; the values follow in the final user message, in order.
+    """
+    template = user_template
+    for placeholder, label, _ in variables:
+        template = template.replace(placeholder, variable_marker(label))
+
+    static_parts = [part.strip() for part in (system_prompt, template, instructions) if part and part.strip()]
+    variable_parts = [f"**{label}:**\n{value}" for _, label, value in variables]
+    return [
+        {"role": "system", "content": "\n\n".join(static_parts)},
+        {"role": "user", "content": "\n\n".join(variable_parts)}
+    ]
+
+
+def inline_messages(system_prompt: str, user_template: str,
+                    variables: List[Tuple[str, str, str]],
+                    instructions: str = "") -> List[Dict]:
+    """Original layout: values substituted in place inside the user template"""
+    user_prompt = user_template
+    for placeholder, label, value in variables:
+        if placeholder in user_prompt:
+            user_prompt = user_prompt.replace(placeholder, value)
+        else:
+            user_prompt = f"{user_prompt}\n\n{label}: {value}" if label else f"{user_prompt}\n\n{value}"
+    if instructions:
+        user_prompt = f"{user_prompt}\n\n{instructions}"
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def build_messages(system_prompt: str, user_template: str,
+                   variables: List[Tuple[str, str, str]],
+                   instructions: str = "", cache_friendly: Optional[bool] = None) -> List[Dict]:
+    """Chat messages in the configured layout"""
+    if cache_friendly is None:
+        cache_friendly = cache_friendly_enabled()
+    builder = static_messages if cache_friendly else inline_messages
+    return builder(system_prompt, user_template, variables, instructions)
@@ -1,153 +1,229 @@
+import hashlib
 import os
-from typing import Dict, Optional
+import re
+from typing import Dict, List, Optional
+
+DEFAULT_PROMPT = "You are a Principal PMM Strategist. Provide structured analysis with trends, competitors, insights, recommendations, and citations."
+
+# Descriptions for the bundled prompts; other prompts are described by their first line
+PROMPT_DESCRIPTIONS = {
+    "testprompt1": "Basic research (fast, simple analysis)",
+    "testprompt2": "Clean 5-section approach",
+    "testprompt3": "Advanced 3-stage research (deep analysis)",
+    "testprompt4": "Data-driven reports (web sources + insights)"
+}
+
+PROMPT_EXTENSION = ".prompt"
+
+STAGES = {1: "planner", 2: "execution", 3: "publisher"}
+
+# Placeholders each stage fills in: (required, optional). Missing required
+# placeholders are reported at compile time; the value is then appended to
+# the request instead of substituted.
+STAGE_PLACEHOLDERS = {
+    "planner": (["<user query>"], []),
+    "execution": (["<sub-question>", "<source_summaries>"], []),
+    "publisher": (["<research_data>"], ["<user query>"])
+}
+
+# Alternate spellings used by prompt files, mapped to the canonical placeholder
+PLACEHOLDER_ALIASES = {
+    "{{user_query}}": "<user query>",
+    "{{query}}": "<user query>",
+    "{{stage1_question}}": "<sub-question>",
+    "{{sub_question}}": "<sub-question>",
+    "{{sources}}": "<source_summaries>",
+    "{{source_summaries}}": "<source_summaries>",
+    "{{research_data}}": "<research_data>"
+}
+
+_STAGE_HEADING_RE = re.compile(r"^#{1,3}\s.*?\bstage\s*(\d)\b", re.IGNORECASE | re.MULTILINE)
+_SYSTEM_MARKER_RE = re.compile(r"^###\s*(?:SYSTEM|System Prompt)\s*$", re.MULTILINE)
+_USER_MARKER_RE = re.compile(r"^###\s*(?:USER|User Prompt)\s*$", re.MULTILINE)
+_SECTION_END_RE = re.compile(r"^(?:---|</details>)\s*$", re.MULTILINE)
+_FENCE_LINE_RE = re.compile(r"^\s*`{3,}\w*\s*$")
+_PLACEHOLDER_RE = re.compile(r"\{\{\s*\w+\s*\}\}|<(?:user query|sub-question|source_summaries|research_data)>")
+
+
+def content_hash(text: str) -> str:
+    """Short stable hash of prompt text, used to version cached responses"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _clean_block(text: str) -> str:
+    """Drop markdown fence lines left over from prompts pasted inside code blocks"""
+    return "\n".join(line for line in text.splitlines() if not _FENCE_LINE_RE.match(line)).strip()
+
+
+def _normalize_placeholders(text: str) -> str:
+    for alias, canonical in PLACEHOLDER_ALIASES.items():
+        text = text.replace(alias, canonical)
+    return text
+
+
+class StageTemplate:
+    """Compiled system/user template for one pipeline stage"""
+
+    def __init__(self, stage: str, system: str, user: str):
+        self.stage = stage
+        self.system = system
+        self.user = user
+        self.placeholders = sorted(set(_PLACEHOLDER_RE.findall(user)))
+        self.content_hash = content_hash(f"{system}\n{user}")
+        required, optional = STAGE_PLACEHOLDERS[stage]
+        self.warnings = [f"{stage}: missing placeholder {p} (value will be appended)" for p in required if p not in self.placeholders]
+        self.warnings += [f"{stage}: unknown placeholder {p}" for p in self.placeholders if p not in required + optional]
+
+
+class PromptTemplate:
+    """A prompt file parsed once into its full text and optional stage templates"""
+
+    def __init__(self, name: str, path: str, mtime: float, content: str):
+        self.name = name
+        self.path = path
+        self.mtime = mtime
+        self.content = content
+        self.content_hash = content_hash(content)
+        self.stages = self._compile_stages(content)
+        self.warnings = [w for stage in self.stages.values() for w in stage.warnings]
+
+    @staticmethod
+    def _compile_stages(content: str) -> Dict[str, StageTemplate]:
+        """Parse "Stage N" sections with SYSTEM/USER blocks; all three stages or none"""
+        headings = list(_STAGE_HEADING_RE.finditer(content))
+        stages = {}
+        for i, heading in enumerate(headings):
+            stage = STAGES.get(int(heading.group(1)))
+            if not stage or stage in stages:
+                continue
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(content)
+            section = content[heading.end():end]
+
+            system_marker = _SYSTEM_MARKER_RE.search(section)
+            user_marker = _USER_MARKER_RE.search(section, system_marker.end() if system_marker else 0)
+            if not system_marker or not user_marker:
+                continue
+            user_end = _SECTION_END_RE.search(section, user_marker.end())
+            system = _clean_block(section[system_marker.end():user_marker.start()])
+            user = _clean_block(section[user_marker.end():user_end.start() if user_end else len(section)])
+            stages[stage] = StageTemplate(stage, system, _normalize_placeholders(user))
+
+        return stages if len(stages) == len(STAGES) else {}
+
+    @property
+    def is_staged(self) -> bool:
+        return bool(self.stages)
+
+    def description(self) -> str:
+        if self.name in PROMPT_DESCRIPTIONS:
+            return PROMPT_DESCRIPTIONS[self.name]
+        for line in self.content.splitlines():
+            line = line.strip().strip("#*`=- ").strip()
+            if line:
+                return line[:60] + "..." if len(line) > 60 else line
+        return self.name
+
 
 class PromptManager:
     def __init__(self, prompts_dir: str = "."):
         self.prompts_dir = prompts_dir
+        self.templates: Dict[str, PromptTemplate] = {}
         self.prompts = {}
         self.load_prompts()
-    
-    def load_prompts(self):
-        """Load all prompt files from the prompts directory"""
+
+    def discover_prompt_files(self) -> Dict[str, str]:
+        """Map prompt names to files: extensionless testprompt* files and *.prompt files"""
+        found = {}
         try:
-            # Load testprompt1
-            prompt1_path = os.path.join(self.prompts_dir, "testprompt1")
-            if os.path.exists(prompt1_path):
-                with open(prompt1_path, 'r', encoding='utf-8') as f:
-                    self.prompts["testprompt1"] = f.read().strip()
-            
-            # Load testprompt2
-            prompt2_path = os.path.join(self.prompts_dir, "testprompt2")
-            if os.path.exists(prompt2_path):
-                with open(prompt2_path, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:  # Only add if not empty
-                        self.prompts["testprompt2"] = content
-            
-            # Load testprompt3
-            prompt3_path = os.path.join(self.prompts_dir, "testprompt3")
-            if os.path.exists(prompt3_path):
-                with open(prompt3_path, 'r', encoding='utf-8') as f:
-                    self.prompts["testprompt3"] = f.read().strip()
-            
-            # Load testprompt4
-            prompt4_path = os.path.join(self.prompts_dir, "testprompt4")
-            if os.path.exists(prompt4_path):
-                with open(prompt4_path, 'r', encoding='utf-8') as f:
-                    self.prompts["testprompt4"] = f.read().strip()
-            
-            # Set testprompt2 as default if available
-            if "testprompt2" in self.prompts:
-                self.prompts["default"] = self.prompts["testprompt2"]
-            else:
-                # Fallback to a minimal default
-                self.prompts["default"] = "You are a Principal PMM Strategist. Provide structured analysis with trends, competitors, insights, recommendations, and citations."
-            
-        except Exception as e:
+            entries = sorted(os.listdir(self.prompts_dir))
+        except OSError as e:
             print(f"Error loading prompts: {e}")
-            # Fallback to minimal default
-            self.prompts["default"] = "You are a Principal PMM Strategist. Provide structured analysis with trends, competitors, insights, recommendations, and citations."
-    
+            return found
+        for entry in entries:
+            path = os.path.join(self.prompts_dir, entry)
+            if not os.path.isfile(path):
+                continue
+            stem, ext = os.path.splitext(entry)
+            if ext == PROMPT_EXTENSION:
+                found[stem] = path
+            elif not ext and entry.startswith("testprompt"):
+                found[entry] = path
+        return found
+
+    def load_prompts(self) -> List[str]:
+        """Load new or modified prompt files from the prompts directory; returns the names (re)compiled"""
+        files = self.discover_prompt_files()
+        changed = []
+
+        for name in list(self.templates):
+            if name not in files:
+                del self.templates[name]
+                changed.append(name)
+
+        for name, path in files.items():
+            try:
+                mtime = os.path.getmtime(path)
+                current = self.templates.get(name)
+                if current and current.path == path and current.mtime == mtime:
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read().strip()
+                if not content:  # Only add if not empty
+                    self.templates.pop(name, None)
+                    continue
+                template = PromptTemplate(name, path, mtime, content)
+                for warning in template.warnings:
+                    print(f"⚠️ Prompt {name}: {warning}")
+                self.templates[name] = template
+                changed.append(name)
+            except Exception as e:
+                print(f"Error loading prompt {name}: {e}")
+
+        self.prompts = {name: template.content for name, template in self.templates.items()}
+        # Set testprompt2 as default if available, else fall back to a minimal default
+        self.prompts["default"] = self.prompts.get("testprompt2", DEFAULT_PROMPT)
+        return changed
+
+    def get_template(self, prompt_name: str) -> Optional[PromptTemplate]:
+        """Compiled template for a prompt, if it exists"""
+        return self.templates.get(prompt_name)
+
+    def get_stage_template(self, prompt_name: str, stage: str) -> Optional[StageTemplate]:
+        """Compiled stage template for a 3-stage prompt"""
+        template = self.templates.get(prompt_name)
+        return template.stages.get(stage) if template else None
+
+    def is_staged(self, prompt_name: str) -> bool:
+        """Whether a prompt defines planner/execution/publisher stages"""
+        template = self.templates.get(prompt_name)
+        return bool(template and template.is_staged)
+
+    def prompt_version(self, prompt_name: str) -> str:
+        """Content hash of a prompt (or of the default prompt) for cache versioning"""
+        template = self.templates.get(prompt_name)
+        return template.content_hash if template else content_hash(self.prompts["default"])
+
     def get_prompt(self, prompt_name: str = "default") -> str:
         """Get a specific prompt by name"""
         return self.prompts.get(prompt_name, self.prompts["default"])
-    
+
     def get_system_prompt(self, prompt_name: str, stage: str = None) -> str:
         """Get system prompt for a specific stage (for 3-stage pipeline)"""
-        if stage and self._is_3stage_prompt(prompt_name):
-            return self._extract_system_prompt(prompt_name, stage)
-        return self.prompts.get(prompt_name, self.prompts["default"])
-    
+        stage_template = self.get_stage_template(prompt_name, stage) if stage else None
+        return stage_template.system if stage_template else self.get_prompt(prompt_name)
+
     def get_user_prompt(self, prompt_name: str, stage: str = None) -> str:
         """Get user prompt for a specific stage (for 3-stage pipeline)"""
-        if stage and self._is_3stage_prompt(prompt_name):
-            return self._extract_user_prompt(prompt_name, stage)
-        return self.prompts.get(prompt_name, self.prompts["default"])
-    
-    def _is_3stage_prompt(self, prompt_name: str) -> bool:
-        """Check if a prompt is a 3-stage pipeline prompt"""
-        if prompt_name not in self.prompts:
-            return False
-        
-        content = self.prompts[prompt_name]
-        # Check if it contains 3-stage structure markers
-        return ("STAGE 1:" in content and "STAGE 2:" in content and "STAGE 3:" in content)
-    
-    def _extract_system_prompt(self, prompt_name: str, stage: str) -> str:
-        """Extract system prompt for specific stage from any 3-stage prompt, robust to whitespace."""
-        if prompt_name not in self.prompts:
-            return "You are an AI assistant."
-        content = self.prompts[prompt_name]
-        
-        stage_headers = {
-            "planner": "# ===== STAGE 1: RESEARCH PLANNER =====",
-            "execution": "# ===== STAGE 2: EXECUTION AGENT =====",
-            "publisher": "# ===== STAGE 3: RESEARCH PUBLISHER ====="
-        }
-        header = stage_headers.get(stage)
-        if not header:
-            return "You are an AI assistant."
-        start = content.find(header)
-        if start == -1:
-            return "You are an AI assistant."
-        # Find the next '### System Prompt' after the header
-        sys_marker = content.find("### System Prompt", start)
-        if sys_marker == -1:
-            return "You are an AI assistant."
-        sys_start = content.find("\n", sys_marker) + 1
-        user_marker = content.find("### User Prompt", sys_start)
-        if user_marker == -1:
-            return "You are an AI assistant."
-        return content[sys_start:user_marker].strip()
-    
-    def _extract_user_prompt(self, prompt_name: str, stage: str) -> str:
-        """Extract user prompt for specific stage from any 3-stage prompt, robust to whitespace."""
-        if prompt_name not in self.prompts:
-            return ""
-        content = self.prompts[prompt_name]
-        stage_headers = {
-            "planner": "# ===== STAGE 1: RESEARCH PLANNER =====",
-            "execution": "# ===== STAGE 2: EXECUTION AGENT =====",
-            "publisher": "# ===== STAGE 3: RESEARCH PUBLISHER ====="
-        }
-        header = stage_headers.get(stage)
-        if not header:
-            return ""
-        start = content.find(header)
-        if start == -1:
-            return ""
-        user_marker = content.find("### User Prompt", start)
-        if user_marker == -1:
-            return ""
-        user_start = content.find("\n", user_marker) + 1
-        # End at next '---' or end of file
-        end = content.find("---", user_start)
-        if end == -1:
-            return content[user_start:].strip()
-        return content[user_start:end].strip()
-    
+        stage_template = self.get_stage_template(prompt_name, stage) if stage else None
+        return stage_template.user if stage_template else self.get_prompt(prompt_name)
+
     def get_available_prompts(self) -> Dict[str, str]:
         """Get all available prompts with descriptions"""
-        available_prompts = {}
-        
-        # Only include prompts that actually exist
-        if "testprompt1" in self.prompts:
-            available_prompts["testprompt1"] = "Basic research (fast, simple analysis)"
-        
-        if "testprompt2" in self.prompts:
-            available_prompts["testprompt2"] = "Clean 5-section approach"
-        
-        if "testprompt3" in self.prompts:
-            available_prompts["testprompt3"] = "Advanced 3-stage research (deep analysis)"
-        
-        if "testprompt4" in self.prompts:
-            available_prompts["testprompt4"] = "Data-driven reports (web sources + insights)"
-        
-        return available_prompts
-    
-    def reload_prompts(self):
-        """Reload prompts from files (useful for A/B testing)"""
-        self.load_prompts()
+        return {name: template.description() for name, template in self.templates.items()}
+
+    def reload_prompts(self) -> List[str]:
+        """Reload prompts whose files changed (useful for A/B testing)"""
+        return self.load_prompts()
 
 # Global prompt manager instance
-prompt_manager = PromptManager() 
\ No newline at end of file
+prompt_manager = PromptManager()
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import sqlite3
+from typing import Dict, List, Optional
+
+from sqlite_store import SQLiteStore
+from text_similarity import tokenize
+
+
+class ReportArchive(SQLiteStore):
+    """Permanent, full-text searchable archive of generated reports.
+
+    Unlike `research_cache`, entries never expire and are indexed by query
+    text and report content, so last week's answer can be found and reopened
+    instead of regenerated.
+    """
+
+    def __init__(self, db_path: str = "pmm_research_cache.db"):
+        super().__init__(db_path)
+
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Create the archive table and its full-text index"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS report_archive (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                content_hash TEXT UNIQUE,
+                query TEXT,
+                prompt_name TEXT,
+                model TEXT,
+                content TEXT,
+                metadata TEXT,
+                created_at DATETIME
+            )
+        ''')
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS report_archive_fts USING fts5(
+                query, content, content='report_archive', content_rowid='id',
+                tokenize='porter unicode61'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS report_archive_ai AFTER INSERT ON report_archive BEGIN
+                INSERT INTO report_archive_fts(rowid, query, content) VALUES (new.id, new.query, new.content);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS report_archive_ad AFTER DELETE ON report_archive BEGIN
+                INSERT INTO report_archive_fts(report_archive_fts, rowid, query, content) VALUES ('delete', old.id, old.query, old.content);
+            END
+        ''')
+
+    def archive(self, result: Dict, prompt_name: str = "default") -> Optional[int]:
+        """Store a successful report; identical content is only stored once"""
+        if "error" in result or not result.get("content"):
+            return None
+        content_hash = hashlib.sha256(result["content"].encode('utf-8')).hexdigest()
+        metadata = {k: v for k, v in result.items() if k not in ("content", "query")}
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO report_archive (content_hash, query, prompt_name, model, content, metadata, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+        ''', (content_hash, result.get("query", ""), prompt_name, result.get("model", "Unknown"),
+              result["content"], json.dumps(metadata, default=str)))
+        cursor.execute("SELECT id FROM report_archive WHERE content_hash = ?", (content_hash,))
+        report_id = cursor.fetchone()[0]
+        conn.commit()
+        conn.close()
+        return report_id
+
+    def search(self, text: str, limit: int = 10) -> List[Dict]:
+        """Find archived reports matching all search terms, best matches first"""
+        terms = list(dict.fromkeys(tokenize(text)))
+        if not terms:
+            return self.recent(limit)
+        expression = " AND ".join('"' + term.replace('"', '') + '"' for term in terms)
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT r.id, r.query, r.prompt_name, r.model, r.created_at,
+                   snippet(report_archive_fts, 1, '**', '**', ' … ', 16)
+            FROM report_archive_fts
+            JOIN report_archive r ON r.id = report_archive_fts.rowid
+            WHERE report_archive_fts MATCH ?
+            ORDER BY bm25(report_archive_fts, 2.0, 1.0)
+            LIMIT ?
+        ''', (expression, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return [{
+            "id": report_id,
+            "query": query,
+            "prompt_name": prompt_name,
+            "model": model,
+            "created_at": created_at,
+            "snippet": snippet
+        } for report_id, query, prompt_name, model, created_at, snippet in rows]
+
+    def recent(self, limit: int = 10) -> List[Dict]:
+        """Most recently archived reports"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, query, prompt_name, model, created_at, substr(content, 1, 160)
+            FROM report_archive ORDER BY id DESC LIMIT ?
+        ''', (limit,))
+        rows = cursor.fetchall()
+        conn.close()
+        return [{
+            "id": report_id,
+            "query": query,
+            "prompt_name": prompt_name,
+            "model": model,
+            "created_at": created_at,
+            "snippet": snippet
+        } for report_id, query, prompt_name, model, created_at, snippet in rows]
+
+    def get(self, report_id: int) -> Optional[Dict]:
+        """Load an archived report in the same shape the research agents return"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT query, prompt_name, model, content, metadata FROM report_archive WHERE id = ?
+        ''', (report_id,))
+        row = cursor.fetchone()
+        conn.close()
+        if not row:
+            return None
+        query, prompt_name, model, content, metadata = row
+        result = json.loads(metadata) if metadata else {}
+        result.update({
+            "query": query,
+            "content": content,
+            "model": model,
+            "prompt_used": prompt_name,
+            "archive_id": report_id,
+            "from_archive": True
+        })
+        return result
+
+
+# Global report archive instance
+report_archive = ReportArchive()
@@ -0,0 +1,213 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from background_loop import research_loop
+from config import settings
+from metrics import CACHE_LOOKUPS
+from sqlite_store import SQLiteStore
+from tracing import set_attributes, span
+
+# Cache states returned by ResearchCache.lookup
+FRESH, STALE, MISS = "fresh", "stale", "miss"
+
+
+def cache_ttl_hours() -> float:
+    """Age after which a cached report is stale (PMM_CACHE_TTL_HOURS, default 24)"""
+    return float(settings.get("PMM_CACHE_TTL_HOURS", "24"))
+
+
+def cache_grace_hours() -> float:
+    """How long past its TTL a stale report is still served while it is refreshed (PMM_CACHE_GRACE_HOURS, 0 disables)"""
+    return float(settings.get("PMM_CACHE_GRACE_HOURS", "24"))
+
+
+def source_fingerprint(sources: List[Dict]) -> Optional[str]:
+    """Order-independent hash of a source set (URLs plus content hashes); None without sources"""
+    if not sources:
+        return None
+    entries = sorted(
+        f"{source.get('url', '')}\t{hashlib.sha256((source.get('content') or '').encode('utf-8')).hexdigest()}"
+        for source in sources
+    )
+    return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()
+
+
+class ResearchCache(SQLiteStore):
+    """SQLite cache of generated reports keyed by query (and optional namespace).
+
+    The namespace separates prompt variants and encodings that would otherwise
+    share a key; the default namespace keeps the original `md5(query)` keys.
+    Reports past their TTL but within the grace window are served stale while
+    a single background refresh per key runs on the research loop. Each entry
+    can store a fingerprint of the sources it was generated from, so an
+    expired report whose sources are unchanged is kept instead of regenerated.
+    """
+
+    def __init__(self, db_path: str = "pmm_research_cache.db"):
+        super().__init__(db_path)
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Initialize SQLite cache database"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS research_cache (
+                query_hash TEXT PRIMARY KEY,
+                response TEXT,
+                timestamp DATETIME,
+                model_used TEXT,
+                source_fingerprint TEXT
+            )
+        ''')
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(research_cache)")]
+        if "source_fingerprint" not in columns:
+            cursor.execute("ALTER TABLE research_cache ADD COLUMN source_fingerprint TEXT")
+
+    def get_cache_key(self, query: str, namespace: str = "") -> str:
+        """Generate hash-based cache key for query"""
+        if namespace and namespace != "default":
+            query = f"{namespace}::{query}"
+        return hashlib.md5(query.encode()).hexdigest()
+
+    def get(self, query: str, namespace: str = "", max_age_hours: Optional[float] = None) -> Optional[Dict]:
+        """Retrieve cached response if available and not expired"""
+        response, _ = self.lookup(query, namespace, max_age_hours, grace_hours=0)
+        return response
+
+    def lookup(self, query: str, namespace: str = "", max_age_hours: Optional[float] = None,
+               grace_hours: Optional[float] = None) -> Tuple[Optional[Dict], str]:
+        """Cached response and its state: fresh, stale (past the TTL, within the grace window) or miss.
+
+        Stale responses carry `cache_age_hours`.
+        """
+        max_age_hours = cache_ttl_hours() if max_age_hours is None else max_age_hours
+        grace_hours = cache_grace_hours() if grace_hours is None else grace_hours
+        cache_key = self.get_cache_key(query, namespace)
+        with span("cache.lookup", cache="research", namespace=namespace):
+            conn = self._connect()
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                SELECT response, (julianday('now') - julianday(timestamp)) * 24 FROM research_cache
+                WHERE query_hash = ? AND timestamp > datetime('now', ?)
+            ''', (cache_key, f"-{max_age_hours + grace_hours} hours"))
+
+            result = cursor.fetchone()
+            conn.close()
+            state = MISS if not result else FRESH if result[1] < max_age_hours else STALE
+            set_attributes(cache_hit=state != MISS, cache_state=state, bytes=len(result[0]) if result else 0)
+
+        CACHE_LOOKUPS.inc(cache="research", result={FRESH: "hit", STALE: "stale", MISS: "miss"}[state])
+        if not result:
+            return None, MISS
+        response = json.loads(result[0])
+        if state == STALE:
+            response["cache_age_hours"] = round(result[1], 1)
+        return response, state
+
+    def revalidate(self, query: str, namespace: str, refresh: Callable[[], Any]) -> bool:
+        """Run `refresh` in the background unless a refresh of this entry is already running.
+
+        `refresh` regenerates and re-caches the entry; it may return a coroutine,
+        which is awaited on the research loop. Returns False if one was in flight.
+        """
+        cache_key = self.get_cache_key(query, namespace)
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return False
+            self._refreshing.add(cache_key)
+
+        async def run():
+            try:
+                result = await asyncio.to_thread(refresh)
+                if asyncio.iscoroutine(result):
+                    await result
+                print(f"🔄 Refreshed stale report: {query[:50]}")
+            except Exception as e:
+                print(f"⚠️ Background refresh failed for '{query[:50]}': {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+
+        print(f"♻️ Serving stale report, refreshing in the background: {query[:50]}")
+        # Empty context: the refresh must not join the current request's call log or trace
+        contextvars.Context().run(research_loop.submit, run())
+        return True
+
+    def is_refreshing(self, query: str, namespace: str = "") -> bool:
+        with self._refresh_lock:
+            return self.get_cache_key(query, namespace) in self._refreshing
+
+    def refreshes_in_flight(self) -> int:
+        with self._refresh_lock:
+            return len(self._refreshing)
+
+    def set(self, query: str, response: Dict, namespace: str = "", fingerprint: Optional[str] = None):
+        """Cache the response with timestamp and the fingerprint of its sources"""
+        cache_key = self.get_cache_key(query, namespace)
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO research_cache (query_hash, response, timestamp, model_used, source_fingerprint)
+            VALUES (?, ?, datetime('now'), ?, ?)
+        ''', (cache_key, json.dumps(response), response.get("model", "unknown"), fingerprint))
+
+        conn.commit()
+        conn.close()
+
+    def stored_fingerprint(self, query: str, namespace: str = "") -> Optional[str]:
+        """Source fingerprint of an entry of any age, or None"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT source_fingerprint FROM research_cache WHERE query_hash = ?",
+                       (self.get_cache_key(query, namespace),))
+        result = cursor.fetchone()
+        conn.close()
+        return result[0] if result else None
+
+    def extend_if_unchanged(self, query: str, namespace: str, fingerprint: Optional[str]) -> Optional[Dict]:
+        """Restart the TTL of an entry (of any age) generated from the same sources, and return it.
+
+        Called after the search and before the LLM when a report would be regenerated.
+        """
+        if not fingerprint:
+            return None
+        cache_key = self.get_cache_key(query, namespace)
+        with span("cache.revalidate", cache="research", namespace=namespace):
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT response FROM research_cache WHERE query_hash = ? AND source_fingerprint = ?
+            ''', (cache_key, fingerprint))
+            result = cursor.fetchone()
+            if result:
+                cursor.execute("UPDATE research_cache SET timestamp = datetime('now') WHERE query_hash = ?", (cache_key,))
+                conn.commit()
+            conn.close()
+            set_attributes(unchanged=bool(result))
+
+        if not result:
+            return None
+        CACHE_LOOKUPS.inc(cache="research", result="unchanged")
+        print(f"🧬 Sources unchanged, extended cached report: {query[:50]}")
+        response = json.loads(result[0])
+        response["sources_unchanged"] = True
+        return response
+
+    def clear(self):
+        """Delete every cached response"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM research_cache")
+        conn.commit()
+        conn.close()
+
+
+# Global research cache instance
+research_cache = ResearchCache()
@@ -0,0 +1,164 @@
+import hashlib
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from metrics import CACHE_LOOKUPS, SEARCH_LATENCY
+from sqlite_store import SQLiteStore
+from tracing import span
+from text_similarity import question_terms, tokenize
+
+
+class SourceStore(SQLiteStore):
+    """Content-addressed local store of web sources with an SQLite FTS5 index.
+
+    Every search result is stored once per content hash together with its URL,
+    title and published date, so later sub-questions about the same competitors
+    can be answered from disk instead of another Tavily call.
+    """
+
+    def __init__(self, db_path: str = "pmm_source_store.db"):
+        super().__init__(db_path)
+
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Create the source table and its full-text index"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sources (
+                content_hash TEXT PRIMARY KEY,
+                url TEXT,
+                title TEXT,
+                published_date TEXT,
+                content TEXT,
+                score REAL,
+                fetched_at DATETIME
+            )
+        ''')
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS sources_fts USING fts5(
+                title, content, content='sources', content_rowid='rowid',
+                tokenize='porter unicode61'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS sources_ai AFTER INSERT ON sources BEGIN
+                INSERT INTO sources_fts(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS sources_ad AFTER DELETE ON sources BEGIN
+                INSERT INTO sources_fts(sources_fts, rowid, title, content) VALUES ('delete', old.rowid, old.title, old.content);
+            END
+        ''')
+
+    @staticmethod
+    def content_hash(source: Dict) -> str:
+        """Hash of the URL and content, so identical pages are stored once"""
+        payload = f"{source.get('url', '')}\n{source.get('content', '')}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def ingest(self, sources: List[Dict]) -> int:
+        """Store search results; refreshes fetched_at for content already present"""
+        rows = []
+        for source in sources:
+            if not source.get('content'):
+                continue
+            rows.append((
+                self.content_hash(source),
+                source.get('url', 'N/A'),
+                source.get('title', 'Unknown'),
+                source.get('published_date', 'Unknown'),
+                source.get('content', ''),
+                source.get('score')
+            ))
+        if not rows:
+            return 0
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        inserted = 0
+        for row in rows:
+            cursor.execute('''
+                INSERT OR IGNORE INTO sources (content_hash, url, title, published_date, content, score, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+            ''', row)
+            if cursor.rowcount:
+                inserted += 1
+            else:
+                cursor.execute("UPDATE sources SET fetched_at = datetime('now') WHERE content_hash = ?", (row[0],))
+        conn.commit()
+        conn.close()
+        return inserted
+
+    @staticmethod
+    def _match_expression(query: str) -> Optional[str]:
+        terms = list(dict.fromkeys(t for t in tokenize(query) if len(t) > 1))
+        if not terms:
+            return None
+        # Quote every term so user text can never be parsed as FTS5 syntax
+        return " OR ".join('"' + re.sub(r'"', '', term) + '"' for term in terms)
+
+    def search(self, query: str, limit: int = 5, max_age_hours: Optional[float] = None) -> List[Dict]:
+        """Full-text search over stored sources, best BM25 matches first (Tavily result shape)"""
+        expression = self._match_expression(query)
+        if not expression:
+            return []
+
+        sql = '''
+            SELECT s.url, s.title, s.published_date, s.content, s.score, s.fetched_at
+            FROM sources_fts
+            JOIN sources s ON s.rowid = sources_fts.rowid
+            WHERE sources_fts MATCH ?
+        '''
+        params: list = [expression]
+        if max_age_hours is not None:
+            sql += " AND s.fetched_at > datetime('now', ?)"
+            params.append(f"-{max_age_hours} hours")
+        sql += " ORDER BY bm25(sources_fts) LIMIT ?"
+        params.append(limit)
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [{
+            "url": url,
+            "title": title,
+            "published_date": published_date,
+            "content": content,
+            "score": score,
+            "fetched_at": fetched_at,
+            "from_local_store": True
+        } for url, title, published_date, content, score, fetched_at in rows]
+
+    @staticmethod
+    def coverage(query: str, sources: List[Dict]) -> float:
+        """Share of the query's content terms that appear in the given sources"""
+        terms = question_terms(query)
+        if not terms:
+            return 0.0
+        found = set()
+        for source in sources:
+            found |= terms & question_terms(f"{source.get('title', '')} {source.get('content', '')}")
+        return len(found) / len(terms)
+
+    def lookup(self, query: str, min_results: int = 3, min_coverage: float = 0.8,
+               max_age_hours: float = 24 * 7, limit: int = 5) -> Optional[List[Dict]]:
+        """Fresh local sources for a query, or None when coverage is insufficient"""
+        start = time.perf_counter()
+        with span("search.local_store", query=query) as lookup_span:
+            sources = self.search(query, limit=limit, max_age_hours=max_age_hours)
+            hit = len(sources) >= min_results and self.coverage(query, sources) >= min_coverage
+            lookup_span.set_attributes({"results": len(sources), "cache_hit": hit})
+        SEARCH_LATENCY.observe(time.perf_counter() - start, source="local_store")
+        if not hit:
+            CACHE_LOOKUPS.inc(cache="source_store", result="miss")
+            return None
+        CACHE_LOOKUPS.inc(cache="source_store", result="hit")
+        return sources
+
+
+# Global source store instance
+source_store = SourceStore()
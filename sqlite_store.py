@@ -0,0 +1,36 @@
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """Base for the SQLite-backed stores: a connection per call, tables created on first use.
+
+    Subclasses define their schema in `_create_tables`. Creating tables lazily
+    keeps importing a module free of disk I/O; threads that connect while the
+    tables are being created wait until they exist.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        raise NotImplementedError
+
+    def init_tables(self):
+        """Create the store's tables if they do not exist"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            self._create_tables(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self.init_tables()
+                    self._initialized = True
+        return sqlite3.connect(self.db_path, timeout=30)
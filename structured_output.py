@@ -0,0 +1,172 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Minimal JSON schemas for the structured pipeline stages. Only the subset of
+# JSON Schema used here is validated locally (type, required, properties,
+# items, minItems), which keeps the check dependency-free.
+PLANNER_SCHEMA = {
+    "type": "object",
+    "required": ["questions"],
+    "properties": {
+        "questions": {"type": "array", "minItems": 1, "items": {"type": "string"}}
+    }
+}
+
+EXECUTION_SCHEMA = {
+    "type": "object",
+    "required": ["summary", "data_points", "citations"],
+    "properties": {
+        "summary": {"type": "string"},
+        "data_points": {"type": "array", "items": {"type": "string"}},
+        "contradictions": {"type": "array", "items": {"type": "string"}},
+        "citations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["title", "url"],
+                "properties": {"title": {"type": "string"}, "url": {"type": "string"}}
+            }
+        }
+    }
+}
+
+SCHEMA_EXAMPLES = {
+    "planner": '{"questions": ["What ...?", "How ...?"]}',
+    "execution": (
+        '{"summary": "2-4 sentence answer", "data_points": ["stat or quote (Source: title, YYYY-MM-DD)"], '
+        '"contradictions": ["where sources disagree"], "citations": [{"title": "...", "url": "https://..."}]}'
+    )
+}
+
+_TYPES = {"object": dict, "array": list, "string": str, "number": (int, float), "boolean": bool}
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_LIST_MARKER_RE = re.compile(r"^\s*(?:[-*•]|\d{1,2}[.)])\s*")
+
+
+def json_instructions(stage: str) -> str:
+    """Output-format instructions appended to a stage's system prompt"""
+    return (
+        "\n\nRespond with a single JSON object only, no markdown and no commentary. "
+        f"Use exactly this json shape:\n{SCHEMA_EXAMPLES[stage]}"
+    )
+
+
+def validate(data: Any, schema: Dict, path: str = "$") -> List[str]:
+    """Validate data against the supported JSON Schema subset; returns error messages"""
+    expected = _TYPES.get(schema.get("type"))
+    if expected and not isinstance(data, expected):
+        return [f"{path}: expected {schema['type']}"]
+
+    errors = []
+    if isinstance(data, dict):
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}: missing '{key}'")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in data:
+                errors.extend(validate(data[key], subschema, f"{path}.{key}"))
+    elif isinstance(data, list):
+        if len(data) < schema.get("minItems", 0):
+            errors.append(f"{path}: expected at least {schema['minItems']} items")
+        if "items" in schema:
+            for i, item in enumerate(data):
+                errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def extract_json(text: str) -> Any:
+    """Parse JSON from a model response, tolerating code fences, prose and trailing commas"""
+    candidate = text.strip()
+    fenced = _FENCE_RE.search(candidate)
+    if fenced:
+        candidate = fenced.group(1).strip()
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+
+    starts = [i for i in (candidate.find("{"), candidate.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON object found in response")
+    start = min(starts)
+    end = max(candidate.rfind("}"), candidate.rfind("]"))
+    if end <= start:
+        raise ValueError("No JSON object found in response")
+    snippet = _TRAILING_COMMA_RE.sub(r"\1", candidate[start:end + 1])
+    return json.loads(snippet)
+
+
+def parse_structured(text: str, schema: Dict) -> Tuple[Optional[Any], List[str]]:
+    """Extract and validate a structured response; returns (data, errors)"""
+    try:
+        data = extract_json(text)
+    except (ValueError, json.JSONDecodeError) as e:
+        return None, [f"invalid JSON: {e}"]
+    # Accept a bare list of questions for the planner
+    if isinstance(data, list) and schema is PLANNER_SCHEMA:
+        data = {"questions": data}
+    errors = validate(data, schema)
+    return (data if not errors else None), errors
+
+
+def repair_messages(text: str, stage: str, errors: List[str]) -> List[Dict]:
+    """Messages for one cheap repair pass that rewrites an invalid response as JSON"""
+    return [
+        {"role": "system", "content": "You convert text into valid JSON. Output the JSON object only." + json_instructions(stage)},
+        {"role": "user", "content": f"Validation errors: {'; '.join(errors)}\n\nText to convert:\n{text}"}
+    ]
+
+
+def parse_question_list(text: str) -> List[str]:
+    """Free-text fallback: one question per line with bullets and numbering stripped"""
+    questions = []
+    for line in text.strip().split('\n'):
+        question = _LIST_MARKER_RE.sub("", line).strip().strip('*').strip()
+        if question and not question.endswith(':'):
+            questions.append(question)
+    return questions
+
+
+def salvage_questions(text: str) -> List[str]:
+    """Questions from a planner response that failed validation.
+
+    JSON-looking responses contribute only their string values (question
+    fields when items are objects); JSON that cannot be parsed yields none,
+    so raw braces and keys never become questions. Plain text is read as a list.
+    """
+    candidate = text.strip()
+    try:
+        data = extract_json(candidate)
+    except (ValueError, json.JSONDecodeError):
+        data = None
+        if candidate.startswith(("{", "[", "```")):
+            return []
+    if data is None:
+        return parse_question_list(text)
+
+    if isinstance(data, dict):
+        data = data.get("questions", list(data.values()))
+    questions = []
+    for item in data if isinstance(data, list) else [data]:
+        if isinstance(item, dict):
+            item = item.get("question") or item.get("text") or next((v for v in item.values() if isinstance(v, str)), None)
+        if isinstance(item, str):
+            questions.append(item)
+    return questions
+
+
+def render_execution_markdown(data: Dict) -> str:
+    """Markdown view of a structured execution answer (for display, novelty and archives)"""
+    lines = [data.get("summary", "").strip()]
+    if data.get("data_points"):
+        lines.append("\n**Data Points**")
+        lines.extend(f"* {point}" for point in data["data_points"])
+    if data.get("contradictions"):
+        lines.append("\n**Contradictions & Nuances**")
+        lines.extend(f"* {item}" for item in data["contradictions"])
+    if data.get("citations"):
+        lines.append("\n**Citations**")
+        lines.extend(f"* [{c.get('title', 'Source')}]({c.get('url', '')})" for c in data["citations"])
+    return "\n".join(lines).strip()
@@ -0,0 +1,124 @@
+import math
+import re
+from typing import Dict, List, Tuple
+
+from text_similarity import tokenize
+
+# Optional NumPy import (compression is skipped without it)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9*\[(\"'])")
+_FIGURE_RE = re.compile(r"\d|%|\$|€|£")
+_CITATION_RE = re.compile(r"\(Source:|\[\d+\]|\]\(http|https?://|Credibility:", re.IGNORECASE)
+_HEADING_RE = re.compile(r"^\s*(#{1,6}\s|\*\*[^*]+\*\*\s*:?\s*$)")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split a markdown summary into sentences, keeping bullets and headings as units"""
+    sentences = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        sentences.extend(part.strip() for part in _SENTENCE_SPLIT_RE.split(line) if part.strip())
+    return sentences
+
+
+def is_evidence(sentence: str) -> bool:
+    """Sentences carrying figures or citations are kept preferentially"""
+    return bool(_FIGURE_RE.search(sentence) or _CITATION_RE.search(sentence))
+
+
+def _tfidf_matrix(sentences: List[str]) -> "np.ndarray":
+    """L2-normalised TF-IDF rows, one per sentence"""
+    tokenized = [tokenize(s) for s in sentences]
+    vocabulary: Dict[str, int] = {}
+    for tokens in tokenized:
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+
+    counts = np.zeros((len(sentences), max(len(vocabulary), 1)), dtype=np.float64)
+    rows = [i for i, tokens in enumerate(tokenized) for _ in tokens]
+    cols = [vocabulary[t] for tokens in tokenized for t in tokens]
+    np.add.at(counts, (rows, cols), 1.0)
+
+    document_frequency = (counts > 0).sum(axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1.0
+    lengths = counts.sum(axis=1, keepdims=True)
+    tfidf = np.divide(counts, lengths, out=np.zeros_like(counts), where=lengths > 0) * idf
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    return np.divide(tfidf, norms, out=np.zeros_like(tfidf), where=norms > 0)
+
+
+def compress_summaries(summaries: List[str], target_chars: int = 800,
+                       redundancy_threshold: float = 0.75, evidence_boost: float = 0.5) -> Tuple[List[str], Dict]:
+    """Extractively trim each summary to roughly `target_chars`.
+
+    Sentences are scored by TF-IDF similarity to their summary's centroid,
+    boosted when they contain figures or citations, and selected greedily
+    while skipping sentences that are near-duplicates of anything already
+    selected (across all summaries). Selected sentences keep their original
+    order. Returns the compressed summaries and compression statistics.
+    """
+    original_chars = sum(len(s) for s in summaries)
+    split = [split_sentences(s) for s in summaries]
+    all_sentences = [sentence for sentences in split for sentence in sentences]
+    if not NUMPY_AVAILABLE or not all_sentences:
+        return list(summaries), {
+            "original_chars": original_chars,
+            "compressed_chars": original_chars,
+            "ratio": 1.0,
+            "applied": False
+        }
+    matrix = _tfidf_matrix(all_sentences)
+
+    compressed = []
+    selected_rows: List[int] = []
+    offset = 0
+    for summary, sentences in zip(summaries, split):
+        rows = np.arange(offset, offset + len(sentences))
+        offset += len(sentences)
+        if len(summary) <= target_chars or not sentences:
+            compressed.append(summary)
+            selected_rows.extend(rows.tolist())
+            continue
+
+        block = matrix[rows]
+        centroid = block.mean(axis=0)
+        centroid_norm = np.linalg.norm(centroid)
+        if centroid_norm > 0:
+            centroid = centroid / centroid_norm
+        scores = block @ centroid
+        evidence = np.array([is_evidence(s) for s in sentences], dtype=bool)
+        scores = scores + evidence_boost * evidence
+        headings = np.array([bool(_HEADING_RE.match(s)) for s in sentences], dtype=bool)
+        scores[headings] = -math.inf
+
+        chosen: List[int] = []
+        used_chars = 0
+        for local in np.argsort(-scores, kind="stable"):
+            if scores[local] == -math.inf:
+                break
+            if used_chars >= target_chars:
+                break
+            row = rows[local]
+            if selected_rows and float(np.max(matrix[selected_rows] @ matrix[row])) >= redundancy_threshold:
+                continue
+            chosen.append(int(local))
+            selected_rows.append(int(row))
+            used_chars += len(sentences[local]) + 1
+
+        compressed.append("\n".join(sentences[i] for i in sorted(chosen)) if chosen else summary[:target_chars])
+
+    compressed_chars = sum(len(s) for s in compressed)
+    return compressed, {
+        "original_chars": original_chars,
+        "compressed_chars": compressed_chars,
+        "ratio": round(compressed_chars / original_chars, 3) if original_chars else 1.0,
+        "applied": True
+    }
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for stale-while-revalidate serving in the research cache
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+
+from benchmarks.fake_servers import FakeLLMServer, FakeTavilyServer
+from research_cache import FRESH, MISS, STALE, ResearchCache, research_cache, source_fingerprint
+from source_store import SourceStore
+
+
+def age_entries(db_path: str, hours: float):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE research_cache SET timestamp = datetime('now', ?)", (f"-{hours} hours",))
+    conn.commit()
+    conn.close()
+
+
+def test_stale_while_revalidate():
+    """Test fresh/stale/miss states and a single background refresh per entry"""
+    print("🧪 Testing stale-while-revalidate...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        cache = ResearchCache(db_path)
+        cache.set("query", {"content": "v1", "model": "test"}, "ns")
+        assert cache.lookup("query", "ns", max_age_hours=24, grace_hours=24)[1] == FRESH
+
+        age_entries(db_path, 30)
+        report, state = cache.lookup("query", "ns", max_age_hours=24, grace_hours=24)
+        assert state == STALE and report["content"] == "v1" and report["cache_age_hours"] >= 29.9
+        assert cache.get("query", "ns", max_age_hours=24) is None
+
+        release = threading.Event()
+        done = threading.Event()
+        calls = []
+
+        def refresh():
+            calls.append(1)
+            release.wait(5)
+            cache.set("query", {"content": "v2", "model": "test"}, "ns")
+            done.set()
+
+        assert cache.revalidate("query", "ns", refresh)
+        assert not cache.revalidate("query", "ns", refresh), "a second refresh must not start while one runs"
+        release.set()
+        assert done.wait(5)
+        report, state = cache.lookup("query", "ns", max_age_hours=24, grace_hours=24)
+        assert state == FRESH and report["content"] == "v2"
+        assert len(calls) == 1
+
+        age_entries(db_path, 50)
+        assert cache.lookup("query", "ns", max_age_hours=24, grace_hours=24) == (None, MISS)
+    print("✅ Stale reports are served once past the TTL and refreshed once")
+
+
+def test_source_fingerprint_extension():
+    """Test that an expired report is kept with a new TTL when its sources are unchanged"""
+    print("🧪 Testing source fingerprint revalidation...")
+    sources = [{"url": "https://g2.com/a", "content": "Pricing starts at $10"},
+               {"url": "https://forbes.com/b", "content": "Growth of 20%"}]
+    fingerprint = source_fingerprint(sources)
+    assert fingerprint == source_fingerprint(list(reversed(sources)))
+    assert fingerprint != source_fingerprint([dict(sources[0], content="Pricing starts at $12"), sources[1]])
+    assert source_fingerprint([]) is None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        cache = ResearchCache(db_path)
+        cache.set("query", {"content": "v1", "model": "test"}, "ns", fingerprint)
+        age_entries(db_path, 500)
+        assert cache.lookup("query", "ns", max_age_hours=24, grace_hours=24) == (None, MISS)
+
+        assert cache.extend_if_unchanged("query", "ns", "other-fingerprint") is None
+        assert cache.extend_if_unchanged("query", "ns", None) is None
+        report = cache.extend_if_unchanged("query", "ns", fingerprint)
+        assert report["content"] == "v1" and report["sources_unchanged"]
+        assert cache.lookup("query", "ns", max_age_hours=24, grace_hours=24)[1] == FRESH
+    print("✅ Unchanged sources extend the cached report")
+
+
+def test_advanced_refresh_searches_again():
+    """Test that an expired advanced report is revalidated against fresh search results,
+    not against the sources the local store kept from the previous run"""
+    print("🧪 Testing advanced report revalidation...")
+    llm = FakeLLMServer("fixed:0").start()
+    search = FakeTavilyServer("fixed:0").start()
+    saved_env = dict(os.environ)
+    saved_cache = (research_cache.db_path, research_cache._initialized)
+    try:
+        os.environ.update({"DEEPSEEK_API_KEY": "test", "GROQ_API_KEY": "test", "TAVILY_API_KEY": "test",
+                           "DEEPSEEK_BASE_URL": llm.url, "GROQ_BASE_URL": llm.url, "TAVILY_BASE_URL": search.url})
+        from advanced_research import AdvancedPMMResearcher
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "cache.db")
+            research_cache.db_path, research_cache._initialized = db_path, False
+            researcher = AdvancedPMMResearcher()
+            researcher.router.retry_delay = 0
+            researcher.source_store = SourceStore(os.path.join(tmp, "sources.db"))
+            query = "Compare ClickUp and Asana's onboarding for technical users"
+
+            assert not researcher.run_advanced_research(query, "testprompt3").get("cached")
+            age_entries(db_path, 100)
+            llm.reset_counts()
+            search.reset_counts()
+            report = researcher.run_advanced_research(query, "testprompt3")
+            assert report.get("cached") and report.get("sources_unchanged")
+            assert search.counts["requests"] > 0, "expired answers must be checked against fresh search results"
+            assert llm.counts["requests"] == 0
+
+            # Different evidence: the answers and the report are generated again
+            conn = sqlite3.connect(db_path)
+            conn.execute("UPDATE research_cache SET source_fingerprint = 'previous', timestamp = datetime('now', '-100 hours')")
+            conn.commit()
+            conn.close()
+            llm.reset_counts()
+            assert not researcher.run_advanced_research(query, "testprompt3").get("cached")
+            assert llm.counts["requests"] > 0
+    finally:
+        research_cache.db_path, research_cache._initialized = saved_cache
+        os.environ.clear()
+        os.environ.update(saved_env)
+        llm.stop()
+        search.stop()
+    print("✅ Expired advanced reports are revalidated with fresh searches")
+
+
+if __name__ == "__main__":
+    test_stale_while_revalidate()
+    test_source_fingerprint_extension()
+    test_advanced_refresh_searches_again()
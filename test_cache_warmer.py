@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for background cache warming
+"""
+
+import os
+import tempfile
+
+from cache_warmer import EXAMPLE_QUERIES, CacheWarmer, template_queries, user_request, warm_queries
+
+
+class RecordingWarmer(CacheWarmer):
+    """Warmer that records requests instead of generating reports"""
+
+    def __init__(self, outcomes, **kwargs):
+        super().__init__(**kwargs)
+        self.outcomes = outcomes
+        self.calls = []
+
+    def warm_one(self, query: str, prompt_name: str) -> str:
+        self.calls.append((query, prompt_name))
+        return self.outcomes.get(query, "warmed")
+
+
+def test_warm_queries():
+    """Test that template placeholders are skipped and queries are deduplicated"""
+    print("🧪 Testing warm query selection...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "templates.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('## Ideas\n- "Compare [Product A] and [Product B]"\n- "Compare Notion and Airtable\'s positioning strategies"\n\n1. **Tip**: "not a query"\n')
+        assert template_queries(path) == ["Compare Notion and Airtable's positioning strategies"]
+    queries = warm_queries()
+    assert queries[:len(EXAMPLE_QUERIES)] == EXAMPLE_QUERIES
+    assert len(queries) == len(set(queries)) and not any("[" in query for query in queries)
+    print(f"✅ {len(queries)} queries selected for warming")
+
+
+def test_rate_budget_and_priority():
+    """Test that only generated reports spend the budget and user requests are not competed with"""
+    print("🧪 Testing warming rate budget...")
+    warmer = RecordingWarmer({"cached": "fresh"}, queries=["cached", "new"], prompts=["testprompt1"],
+                             rate_per_hour=0, interval_hours=0)
+    assert warmer.run_pass() == {"fresh": 1, "warmed": 1, "failed": 0}
+
+    slow = RecordingWarmer({}, queries=["a", "b"], prompts=["testprompt1"], rate_per_hour=3600 / 60, interval_hours=0)
+    thread = slow.start()
+    thread.join(0.5)
+    assert slow.calls == [("a", "testprompt1")], "the second report must wait for the rate budget"
+    slow.stop(5)
+
+    waiting = RecordingWarmer({}, queries=["a"], prompts=["testprompt1"], rate_per_hour=0, interval_hours=0)
+    with user_request():
+        thread = waiting.start()
+        thread.join(0.5)
+        assert waiting.calls == [], "warming must wait while a user request runs"
+    thread.join(5)
+    assert waiting.calls == [("a", "testprompt1")]
+    print("✅ Rate budget and user-request priority respected")
+
+
+if __name__ == "__main__":
+    test_warm_queries()
+    test_rate_budget_and_priority()
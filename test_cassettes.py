@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for record-and-replay cassettes (no network access needed)
+"""
+
+import os
+import tempfile
+import time
+
+from openai import OpenAI
+from tavily import TavilyClient
+
+from benchmarks.fake_servers import FakeLLMServer, FakeTavilyServer
+from cassettes import Cassette, CassetteChatClient, CassetteMiss, CassetteSearchClient
+from llm_router import LLMError, LLMRouter
+
+MESSAGES = [
+    {"role": "system", "content": "You are a PMM research planner."},
+    {"role": "user", "content": "Research query: ClickUp vs Asana onboarding"}
+]
+
+
+def record_cassette(path: str):
+    """Record one completion and one search through the real SDKs against local fake servers"""
+    llm = FakeLLMServer("fixed:0.05").start()
+    search = FakeTavilyServer("fixed:0.01").start()
+    try:
+        with Cassette(path, "record") as cassette:
+            router = LLMRouter(CassetteChatClient(cassette, "deepseek", OpenAI(api_key="test", base_url=llm.url)))
+            completion = router.complete("planner", MESSAGES)
+            tavily = CassetteSearchClient(cassette, TavilyClient(api_key="test", api_base_url=search.url))
+            results = tavily.search(query="ClickUp onboarding", search_depth="advanced", max_results=3)
+            # Nothing is written until the cassette is closed
+            assert not os.path.exists(path)
+    finally:
+        llm.stop()
+        search.stop()
+    return completion, results
+
+
+def test_record_and_replay():
+    """Test that replayed responses match the recording, with scaled latency"""
+    print("🧪 Testing cassette record and replay...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cassette.json")
+        recorded, recorded_results = record_cassette(path)
+        assert len(Cassette(path, "replay").interactions) == 2
+
+        # Servers are gone: everything below is served from the cassette
+        cassette = Cassette(path, "replay", latency_scale=0)
+        router = LLMRouter(CassetteChatClient(cassette, "deepseek"))
+        replayed = router.complete("planner", MESSAGES)
+        assert replayed["content"] == recorded["content"]
+        assert replayed["usage"] == recorded["usage"]
+        results = CassetteSearchClient(cassette).search(query="ClickUp onboarding", search_depth="advanced", max_results=3)
+        assert results["results"] == recorded_results["results"]
+
+        # Original latency is reproduced when scaling is on
+        slow = LLMRouter(CassetteChatClient(Cassette(path, "replay", latency_scale=1.0), "deepseek"))
+        started = time.perf_counter()
+        slow.complete("planner", MESSAGES)
+        assert time.perf_counter() - started >= 0.04
+    print("✅ Replay matches the recording")
+
+
+def test_shape_matching():
+    """Test that changed requests fall back to a recording of the same shape unless exact matching is on"""
+    print("🧪 Testing cassette request matching...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cassette.json")
+        recorded, _ = record_cassette(path)
+        changed = [MESSAGES[0], {"role": "user", "content": "Research query: Notion vs Airtable"}]
+
+        cassette = Cassette(path, "replay", latency_scale=0)
+        replayed = LLMRouter(CassetteChatClient(cassette, "deepseek")).complete("planner", changed)
+        assert replayed["content"] == recorded["content"]
+        assert cassette.stats["shape_matches"] == 1
+
+        exact = Cassette(path, "replay", latency_scale=0, exact=True)
+        try:
+            exact.match("deepseek", {"model": "deepseek-chat", "messages": changed})
+            assert False, "exact matching should not fall back"
+        except CassetteMiss:
+            pass
+        try:
+            LLMRouter(CassetteChatClient(exact, "deepseek")).complete("planner", changed)
+            assert False, "router should fail when nothing matches"
+        except LLMError:
+            pass
+    print("✅ Shape fallback and exact matching work")
+
+
+if __name__ == "__main__":
+    test_record_and_replay()
+    test_shape_matching()
@@ -1,183 +1,93 @@
 #!/usr/bin/env python3
 """
-Test script to compare all three prompts with the same query
-"""
-
-import asyncio
-import json
-from datetime import datetime
-from deep_research import research_agent
-from advanced_research import advanced_researcher
-from prompt_manager import prompt_manager
-
-def test_all_prompts():
-    """Test all three prompts with the same query"""
-    
-    query = "Sage Intacct wants to focus on selling to SMB & Mid sized Healthcare companies. What is the competition that we could come across in this space"
-    
-    print("🧪 Testing all three prompts with the same query...")
-    print(f"Query: {query}")
-    print("=" * 80)
-    
-    results = {}
-    
-    # Test testprompt1 (basic research)
-    print("\n📋 Testing testprompt1 (Basic Research)...")
-    try:
-        result1 = research_agent.generate_research_report(query, "testprompt1")
-        results["testprompt1"] = result1
-        print("✅ testprompt1 completed")
-    except Exception as e:
-        print(f"❌ testprompt1 failed: {e}")
-        results["testprompt1"] = {"error": str(e)}
-    
-    # Test testprompt3 (advanced 3-stage)
-    print("\n📋 Testing testprompt3 (Advanced 3-Stage Research)...")
-    try:
-        result3 = asyncio.run(advanced_researcher.conduct_advanced_research(query, "testprompt3"))
-        results["testprompt3"] = result3
-        print("✅ testprompt3 completed")
-    except Exception as e:
-        print(f"❌ testprompt3 failed: {e}")
-        results["testprompt3"] = {"error": str(e)}
-    
-    # Test testprompt4 (data-driven)
-    print("\n📋 Testing testprompt4 (Data-Driven Research)...")
-    try:
-        result4 = research_agent.generate_research_report(query, "testprompt4")
-        results["testprompt4"] = result4
-        print("✅ testprompt4 completed")
-    except Exception as e:
-        print(f"❌ testprompt4 failed: {e}")
-        results["testprompt4"] = {"error": str(e)}
-    
-    return results
-
-def generate_comparison_markdown(results, query):
-    """Generate a markdown file comparing all three results"""
-    
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    markdown_content = f"""# PMM Research Agent - Prompt Comparison Test
-
-**Query:** {query}  
-**Test Date:** {timestamp}  
-**Purpose:** Compare output quality and approach across all three prompts
-
----
-
-## 📊 Test Overview
-
-This test compares the output of three different research prompts:
-- **testprompt1**: Basic research with structured 3-step approach
-- **testprompt3**: Advanced 3-stage pipeline with sophisticated orchestration  
-- **testprompt4**: Data-driven research using web sources
-
----
-
-## 🔍 Query Details
-
-**Original Query:** {query}
+Compare prompt variants on a query set.
 
-**Context:** Sage Intacct wants to focus on selling to SMB & Mid-sized Healthcare companies. We need to identify the competitive landscape in this space.
-
----
-
-## 📋 Results Comparison
+All variants run concurrently and share one retrieval pass per query; the
+comparison report records latency, tokens, sources and output size per variant:
 
+    python test_comparison.py --prompts testprompt1,testprompt3,testprompt4 --concurrency 6
+    python test_comparison.py --queries-file queries.txt --json comparison.json --no-outputs
 """
-    
-    # Add results for each prompt
-    for prompt_name, result in results.items():
-        markdown_content += f"### {prompt_name.upper()}\n\n"
-        
-        if "error" in result:
-            markdown_content += f"**Status:** ❌ Failed\n"
-            markdown_content += f"**Error:** {result['error']}\n\n"
-        else:
-            markdown_content += f"**Status:** ✅ Success\n"
-            markdown_content += f"**Model:** {result.get('model', 'Unknown')}\n"
-            markdown_content += f"**Sources Used:** {result.get('sources_used', result.get('total_sources', 'Unknown'))}\n"
-            markdown_content += f"**Research Type:** {result.get('research_type', 'standard')}\n\n"
-            
-            # Add the content
-            content = result.get('content', 'No content available')
-            markdown_content += f"**Output:**\n\n{content}\n\n"
-        
-        markdown_content += "---\n\n"
-    
-    # Add analysis section
-    markdown_content += """## 📈 Analysis & Observations
-
-### Key Differences Observed:
-
-1. **Approach & Methodology**
-   - testprompt1: 
-   - testprompt3: 
-   - testprompt4: 
-
-2. **Source Quality & Quantity**
-   - testprompt1: 
-   - testprompt3: 
-   - testprompt4: 
 
-3. **Output Structure & Format**
-   - testprompt1: 
-   - testprompt3: 
-   - testprompt4: 
-
-4. **Strategic Depth & Insights**
-   - testprompt1: 
-   - testprompt3: 
-   - testprompt4: 
-
-### Recommendations:
-
-- **Best for Quick Research:** 
-- **Best for Deep Analysis:** 
-- **Best for Executive Reports:** 
+import argparse
+import json
+import os
+from datetime import datetime
 
----
+from benchmarks.fake_servers import FakeLLMServer, FakeTavilyServer
+from prompt_eval import PromptEvaluator, comparison_report
+from prompt_manager import prompt_manager
 
-## 🎯 Production Readiness Assessment
+QUERY = "Sage Intacct wants to focus on selling to SMB & Mid sized Healthcare companies. What is the competition that we could come across in this space"
 
-- **Consistency:** 
-- **Citation Quality:** 
-- **Strategic Value:** 
-- **Format Standardization:** 
 
----
+def test_shared_retrieval():
+    """Test that each query gets one search, reused by every default variant"""
+    print("🧪 Testing shared retrieval across prompt variants...")
+    llm = FakeLLMServer("fixed:0").start()
+    search = FakeTavilyServer("fixed:0").start()
+    saved_env = dict(os.environ)
+    try:
+        os.environ.update({"DEEPSEEK_API_KEY": "test", "GROQ_API_KEY": "test", "TAVILY_API_KEY": "test",
+                           "DEEPSEEK_BASE_URL": llm.url, "GROQ_BASE_URL": llm.url, "TAVILY_BASE_URL": search.url})
+        evaluator = PromptEvaluator(concurrency=6)
+        queries = [QUERY, "Compare ClickUp and Asana's onboarding for technical users"]
+        evaluation = evaluator.evaluate(queries, ["testprompt1", "testprompt3", "testprompt4"])
+        assert not any(run["error"] for run in evaluation["runs"])
+        assert search.counts["requests"] == len(queries), "one retrieval pass per query"
+        assert evaluation["search"]["upstream"] == len(queries) and evaluation["search"]["shared"] > len(queries)
+        assert all(run["sources"] for run in evaluation["runs"])
+    finally:
+        os.environ.clear()
+        os.environ.update(saved_env)
+        llm.stop()
+        search.stop()
+    print(f"✅ {len(queries)} searches shared by {evaluation['search']['shared']} variant searches")
 
-*Generated by PMM Research Agent Test Suite*
-"""
-    
-    return markdown_content
 
 def main():
-    """Main test function"""
+    """Run the prompt comparison and save the markdown report"""
+    parser = argparse.ArgumentParser(description="Compare prompt variants on the same queries")
+    parser.add_argument("--prompts", default="testprompt1,testprompt3,testprompt4",
+                        help="Comma-separated prompt variants ('all' for every available prompt)")
+    parser.add_argument("--query", action="append", help="Query to evaluate (repeatable)")
+    parser.add_argument("--queries-file", help="File with one query per line")
+    parser.add_argument("--concurrency", type=int, default=4, help="Reports generated at the same time")
+    parser.add_argument("--output", help="Markdown report path (default: prompt_comparison_test_<timestamp>.md)")
+    parser.add_argument("--json", help="Also write the raw measurements to this file")
+    parser.add_argument("--no-outputs", action="store_true", help="Leave the generated reports out of the markdown")
+    args = parser.parse_args()
+
+    queries = list(args.query or [])
+    if args.queries_file:
+        with open(args.queries_file, 'r', encoding='utf-8') as f:
+            queries += [line.strip() for line in f if line.strip()]
+    queries = queries or [QUERY]
+    available = prompt_manager.get_available_prompts()
+    variants = list(available) if args.prompts == "all" else [p.strip() for p in args.prompts.split(",") if p.strip()]
+    unknown = [v for v in variants if v not in available]
+    if unknown:
+        parser.error(f"Unknown prompts: {', '.join(unknown)}")
+
     print("🚀 Starting PMM Research Agent Prompt Comparison Test")
+    print(f"📋 {len(variants)} variants × {len(queries)} queries at concurrency {args.concurrency}")
     print("=" * 60)
-    
-    # Run the tests
-    results = test_all_prompts()
-    
-    # Generate comparison markdown
-    query = "Sage Intacct wants to focus on selling to SMB & Mid sized Healthcare companies. What is the competition that we could come across in this space"
-    markdown_content = generate_comparison_markdown(results, query)
-    
-    # Save to file
-    filename = f"prompt_comparison_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
+    evaluation = PromptEvaluator(args.concurrency).evaluate(queries, variants)
+
+    filename = args.output or f"prompt_comparison_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write(markdown_content)
-    
-    print(f"\n✅ Test completed! Results saved to: {filename}")
-    print(f"📊 Generated comparison markdown with {len(results)} prompt results")
-    
-    # Print summary
+        f.write(comparison_report(evaluation, include_outputs=not args.no_outputs))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(evaluation, f, indent=2)
+
+    print(f"\n✅ Test completed in {evaluation['wall_seconds']}s! Results saved to: {filename}")
     print("\n📋 Summary:")
-    for prompt_name, result in results.items():
-        status = "✅ Success" if "error" not in result else "❌ Failed"
-        print(f"   {prompt_name}: {status}")
+    for variant, summary in evaluation["summary"].items():
+        status = "✅ Success" if not summary["errors"] else f"❌ {summary['errors']} failed"
+        print(f"   {variant}: {status}, median {summary['median_seconds']}s, "
+              f"{summary['prompt_tokens'] + summary['completion_tokens']:.0f} tokens, {summary['output_words']:.0f} words")
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
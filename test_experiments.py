@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for prompt experiment assignment and per-variant aggregation
+"""
+
+import os
+import tempfile
+from collections import Counter
+
+import groq
+from openai import OpenAI
+
+from benchmarks.fake_servers import FakeLLMServer
+from data_driven import generate_data_driven_report
+from experiments import ExperimentLog, assign_variant, parse_split
+from llm_router import LLMRouter, summarize_calls, track_calls
+
+
+def test_traffic_split():
+    """Test that assignment is sticky and follows the split weights"""
+    print("🧪 Testing traffic split assignment...")
+    split = parse_split("testprompt1=50,testprompt3=30,testprompt4=20")
+    assert assign_variant("session-1", split) == assign_variant("session-1", split)
+    counts = Counter(assign_variant(f"session-{i}", split) for i in range(5000))
+    assert abs(counts["testprompt1"] / 5000 - 0.5) < 0.03
+    assert abs(counts["testprompt4"] / 5000 - 0.2) < 0.03
+    assert assign_variant("session-1", parse_split("testprompt3=0,testprompt4=1")) == "testprompt4"
+    for invalid in ("", "testprompt1=fast", "testprompt1=0"):
+        try:
+            parse_split(invalid)
+            assert False, f"'{invalid}' should be rejected"
+        except ValueError:
+            pass
+    print(f"✅ Assignment is sticky and weighted: {dict(counts)}")
+
+
+def routed_report() -> dict:
+    """Report whose single completion fell back from a DeepSeek outage to Groq"""
+    deepseek = FakeLLMServer("fixed:0").start()
+    groq_server = FakeLLMServer("fixed:0").start()
+    deepseek.outage = True
+    try:
+        router = LLMRouter(OpenAI(api_key="test", base_url=deepseek.url, max_retries=0),
+                           groq.Groq(api_key="test", base_url=groq_server.url, max_retries=0))
+        with track_calls() as calls:
+            completion = router.complete("basic", [{"role": "user", "content": "Research query: ClickUp pricing"}])
+    finally:
+        deepseek.stop()
+        groq_server.stop()
+    assert completion["backend"] == "groq"
+    return {"query": "q", "llm_calls": calls, "llm_usage": summarize_calls(calls)}
+
+
+def test_variant_summary():
+    """Test per-variant latency, cache hit, fallback and token aggregation"""
+    print("🧪 Testing experiment summary...")
+    generated = routed_report()
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ExperimentLog(os.path.join(tmp, "experiments.db"))
+        log.record("ab", "testprompt1", generated, 4.0)
+        log.record("ab", "testprompt1", {"query": "q", "cached": True}, 0.5)
+        log.record("ab", "testprompt3", {"query": "q", "error": "All research backends failed"}, 1.0)
+        log.record("other", "testprompt1", generated, 9.0)
+
+        rows = {row["variant"]: row for row in log.summary("ab")}
+        assert rows["testprompt1"]["requests"] == 2
+        assert rows["testprompt1"]["cache_hit_rate"] == 0.5
+        assert rows["testprompt1"]["fallback_rate"] == 1.0
+        assert rows["testprompt1"]["prompt_tokens"] == generated["llm_usage"]["prompt_tokens"] > 0
+        assert rows["testprompt1"]["generated_p50_seconds"] == 4.0
+        assert rows["testprompt3"]["error_rate"] == 1.0
+        assert log.experiments() == ["other", "ab"]
+    print("✅ Variant summary aggregates correctly")
+
+
+def test_data_driven_failure_is_error():
+    """Test a data-driven report whose backends are all down is logged as an error"""
+    print("🧪 Testing data-driven failure outcome...")
+    deepseek = FakeLLMServer("fixed:0").start()
+    groq_server = FakeLLMServer("fixed:0").start()
+    deepseek.outage = groq_server.outage = True
+    try:
+        router = LLMRouter(OpenAI(api_key="test", base_url=deepseek.url, max_retries=0),
+                           groq.Groq(api_key="test", base_url=groq_server.url, max_retries=0))
+        report = generate_data_driven_report(router, None, "ClickUp pricing", use_cache=False)
+    finally:
+        deepseek.stop()
+        groq_server.stop()
+    assert "error" in report and "content" not in report
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ExperimentLog(os.path.join(tmp, "experiments.db"))
+        log.record("ab", "testprompt4", report, 1.0)
+        assert log.summary("ab")[0]["error_rate"] == 1.0
+    print("✅ Data-driven failures are reported as errors")
+
+
+if __name__ == "__main__":
+    test_traffic_split()
+    test_variant_summary()
+    test_data_driven_failure_is_error()
@@ -65,6 +65,41 @@ def test_prompt4_integration():
     print("✅ testprompt4 integration test passed")
     return True
 
+def test_incremental_reload():
+    """Test that only modified prompt files are recompiled on reload"""
+    import os
+    import tempfile
+    import time
+    from prompt_manager import PromptManager
+
+    print("🧪 Testing incremental prompt reload...")
+    with tempfile.TemporaryDirectory() as prompts_dir:
+        for name in ("alpha.prompt", "beta.prompt"):
+            with open(os.path.join(prompts_dir, name), 'w', encoding='utf-8') as f:
+                f.write(f"You are prompt {name}.")
+        manager = PromptManager(prompts_dir)
+        assert set(manager.get_available_prompts()) == {"alpha", "beta"}
+        alpha_hash = manager.prompt_version("alpha")
+
+        assert manager.reload_prompts() == []
+        beta_path = os.path.join(prompts_dir, "beta.prompt")
+        with open(beta_path, 'w', encoding='utf-8') as f:
+            f.write("You are an edited prompt.")
+        os.utime(beta_path, (time.time() + 5, time.time() + 5))
+        assert manager.reload_prompts() == ["beta"]
+        assert manager.prompt_version("alpha") == alpha_hash
+        assert manager.get_prompt("beta") == "You are an edited prompt."
+    print("✅ Only modified prompts were reloaded")
+
+def test_shipped_prompts_compile_cleanly():
+    """Test the shipped prompts fill every stage placeholder in place"""
+    print("🧪 Testing shipped prompt placeholders...")
+    for name, template in prompt_manager.templates.items():
+        assert template.warnings == [], f"{name}: {template.warnings}"
+    assert prompt_manager.is_staged("testprompt3")
+    print("✅ Shipped prompts compile without placeholder warnings")
+
 if __name__ == "__main__":
     test_prompt_loading()
-    test_prompt4_integration() 
\ No newline at end of file
+    test_prompt4_integration()
+    test_incremental_reload() 
\ No newline at end of file
@@ -3,7 +3,6 @@
 Test single prompt with the Sage Intacct query
 """
 
-import asyncio
 from datetime import datetime
 from deep_research import research_agent
 from advanced_research import advanced_researcher
@@ -58,7 +57,7 @@ def test_prompt3():
     print("=" * 60)
     
     try:
-        result = asyncio.run(advanced_researcher.conduct_advanced_research(query, "testprompt3"))
+        result = advanced_researcher.run_advanced_research(query, "testprompt3")
         
         # Save to file
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
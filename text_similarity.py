@@ -0,0 +1,109 @@
+import re
+from typing import List, Set, Tuple
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "has", "have", "how", "in", "into", "is", "it", "its", "of", "on",
+    "or", "that", "the", "their", "them", "these", "they", "this", "to", "use",
+    "uses", "was", "were", "what", "when", "where", "which", "who", "why", "will",
+    "with", "within", "you", "your"
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+
+
+def tokenize(text: str, drop_stopwords: bool = True) -> List[str]:
+    """Lowercase word tokens, optionally without stopwords"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if drop_stopwords:
+        tokens = [t for t in tokens if t not in STOPWORDS]
+    return tokens
+
+
+def shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    """Word n-gram shingles of a text (falls back to unigrams for short texts)"""
+    tokens = tokenize(text)
+    if len(tokens) < size:
+        return {(t,) for t in tokens}
+    return {tuple(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def jaccard(a: Set, b: Set) -> float:
+    """Jaccard similarity of two sets (0.0 when both are empty)"""
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def novelty(text: str, seen: Set[Tuple[str, ...]], size: int = 3) -> float:
+    """Fraction of a text's shingles that have not been seen before"""
+    current = shingles(text, size)
+    if not current:
+        return 0.0
+    return len(current - seen) / len(current)
+
+
+class NoveltyTracker:
+    """Tracks how much new content each completed sub-question contributes.
+
+    Once `patience` consecutive results (after the first `min_results`) fall
+    below `threshold`, further sub-questions are unlikely to add information
+    and the caller can stop executing them.
+    """
+
+    def __init__(self, threshold: float, min_results: int = 3, patience: int = 2, shingle_size: int = 3):
+        self.threshold = threshold
+        self.min_results = min_results
+        self.patience = patience
+        self.shingle_size = shingle_size
+        self.seen: Set[Tuple[str, ...]] = set()
+        self.scores: List[float] = []
+
+    def add(self, text: str) -> float:
+        """Score a new result against everything collected so far, then absorb it"""
+        score = novelty(text, self.seen, self.shingle_size)
+        self.seen |= shingles(text, self.shingle_size)
+        self.scores.append(round(score, 3))
+        return score
+
+    def should_stop(self) -> bool:
+        if len(self.scores) < max(self.min_results, self.patience):
+            return False
+        return all(score < self.threshold for score in self.scores[-self.patience:])
+
+
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ied", "es", "ed", "ly", "s", "e")
+
+
+def stem(token: str) -> str:
+    """Very light suffix stripping so that "price", "prices" and "pricing" match"""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def question_terms(question: str) -> Set[str]:
+    """Stemmed content terms of a question"""
+    return {stem(t) for t in tokenize(question)}
+
+
+def cluster_near_duplicates(questions: List[str], threshold: float = 0.6, min_shared: int = 2) -> List[List[int]]:
+    """Greedily group paraphrased questions.
+
+    Returns clusters of indices into `questions`; the first index of each
+    cluster is its representative. A question joins the first cluster whose
+    representative shares at least `min_shared` terms and has a term Jaccard
+    similarity of at least `threshold`.
+    """
+    terms = [question_terms(q) for q in questions]
+    clusters: List[List[int]] = []
+    for i, current in enumerate(terms):
+        for cluster in clusters:
+            representative = terms[cluster[0]]
+            if len(current & representative) >= min_shared and jaccard(current, representative) >= threshold:
+                cluster.append(i)
+                break
+        else:
+            clusters.append([i])
+    return clusters
@@ -0,0 +1,264 @@
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+SERVICE_NAME = "pmm-research-agent"
+SCOPE_NAME = "pmm.research"
+
+# OTLP enum values
+SPAN_KIND_INTERNAL = 1
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("pmm_current_span", default=None)
+
+
+class Span:
+    """One timed operation in a trace, with attributes and a parent link.
+
+    Spans of one trace share a list owned by the root span; when the root ends
+    the whole trace is exported. Context variables carry the current span into
+    asyncio tasks and asyncio.to_thread workers.
+    """
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict] = None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self._spans: List["Span"] = parent._spans if parent else []
+        self._lock = parent._lock if parent else threading.Lock()
+        self.set_attributes(attributes or {})
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent is None
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add_to(self, key: str, amount: float = 1):
+        """Increment a numeric attribute (e.g. retry counts)"""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def record_error(self, error: BaseException):
+        """Mark the span failed (for errors that are handled inside the span)"""
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self, error: Optional[BaseException] = None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.record_error(error)
+        elif self.status == STATUS_UNSET:
+            self.status = STATUS_OK
+        with self._lock:
+            self._spans.append(self)
+
+    @property
+    def duration_seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status}
+        }
+        if self.parent:
+            span["parentSpanId"] = self.parent.span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    return {"key": key, "value": _otlp_value(value)}
+
+
+def _from_otlp_value(value: Dict) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "arrayValue" in value:
+        return [_from_otlp_value(v) for v in value["arrayValue"].get("values", [])]
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def tracing_enabled() -> bool:
+    """Traces are exported unless PMM_TRACING=0"""
+    return settings.get("PMM_TRACING", "1") != "0"
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current_span.get()
+    return active.trace_id if active else None
+
+
+def set_attributes(**attributes):
+    """Attach attributes to the active span, if any"""
+    active = _current_span.get()
+    if active:
+        active.set_attributes(attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a child of the active span (or a new trace)"""
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end(error)
+        if current.is_root and tracing_enabled():
+            try:
+                trace_store.export(current._spans)
+            except Exception as e:
+                print(f"⚠️ Failed to export trace: {e}")
+
+
+class TraceStore:
+    """Local store of finished traces, one OTLP/JSON file per trace.
+
+    Files use the OTLP JSON encoding (resourceSpans/scopeSpans/spans), so they
+    can also be replayed into an OpenTelemetry collector or viewer.
+    """
+
+    def __init__(self, directory: str = "traces", retention: int = 200):
+        self.directory = directory
+        self.retention = retention
+
+    def _path(self, trace_id: str) -> str:
+        return os.path.join(self.directory, f"{trace_id}.json")
+
+    def export(self, spans: List[Span]):
+        if not spans:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": SCOPE_NAME},
+                    "spans": [s.to_otlp() for s in sorted(spans, key=lambda s: s.start_ns)]
+                }]
+            }]
+        }
+        with open(self._path(spans[0].trace_id), 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        self._prune()
+
+    def _prune(self):
+        """Keep only the newest `retention` traces"""
+        files = self._files()
+        for name in files[self.retention:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _files(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        files = [f for f in os.listdir(self.directory) if f.endswith(".json")]
+        return sorted(files, key=lambda f: os.path.getmtime(os.path.join(self.directory, f)), reverse=True)
+
+    def raw(self, trace_id: str) -> Optional[str]:
+        """OTLP/JSON text of a trace (for download)"""
+        path = self._path(trace_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def load(self, trace_id: str) -> List[Dict]:
+        """Spans of a trace as plain dicts, ordered by start time"""
+        text = self.raw(trace_id)
+        if not text:
+            return []
+        spans = []
+        for resource in json.loads(text).get("resourceSpans", []):
+            for scope in resource.get("scopeSpans", []):
+                for s in scope.get("spans", []):
+                    spans.append({
+                        "trace_id": s["traceId"],
+                        "span_id": s["spanId"],
+                        "parent_id": s.get("parentSpanId"),
+                        "name": s["name"],
+                        "start_ns": int(s["startTimeUnixNano"]),
+                        "end_ns": int(s["endTimeUnixNano"]),
+                        "attributes": {a["key"]: _from_otlp_value(a["value"]) for a in s.get("attributes", [])},
+                        "status": s.get("status", {}).get("code", STATUS_UNSET),
+                        "status_message": s.get("status", {}).get("message", "")
+                    })
+        return sorted(spans, key=lambda s: s["start_ns"])
+
+    def list_traces(self, limit: int = 50) -> List[Dict]:
+        """Newest traces with their root span name, start, duration and attributes"""
+        traces = []
+        for name in self._files()[:limit]:
+            spans = self.load(name[:-len(".json")])
+            roots = [s for s in spans if not s["parent_id"]]
+            if not roots:
+                continue
+            root = roots[0]
+            traces.append({
+                "trace_id": root["trace_id"],
+                "name": root["name"],
+                "start_ns": root["start_ns"],
+                "duration_seconds": (root["end_ns"] - root["start_ns"]) / 1e9,
+                "span_count": len(spans),
+                "error": any(s["status"] == STATUS_ERROR for s in spans),
+                "attributes": root["attributes"]
+            })
+        return traces
+
+
+# Global trace store instance
+trace_store = TraceStore(settings.get("PMM_TRACE_DIR", "traces"), int(settings.get("PMM_TRACE_RETENTION", "200")))